@@ -51,7 +51,20 @@ fi
 
 # 复制文件
 echo "📦 复制文件..."
-cp -r "$SOURCE_DIR"/* "$ASSETS_DIR/"
+if [ -f "$SOURCE_DIR/images.pack" ]; then
+  # 已打包图片（product-images-home/build-image-pack.py）：只复制 images.pack，不再复制几千个散装图片
+  echo "🗜  使用 images.pack，跳过 product-images-* 和 hero-featured-images 文件夹"
+  rm -rf "$ASSETS_DIR"/product-images-home "$ASSETS_DIR"/product-images-shop \
+         "$ASSETS_DIR"/product-images-points "$ASSETS_DIR"/hero-featured-images
+  for item in "$SOURCE_DIR"/*; do
+    case "$(basename "$item")" in
+      product-images-home|product-images-shop|product-images-points|hero-featured-images) ;;
+      *) cp -r "$item" "$ASSETS_DIR/" || exit 1 ;;
+    esac
+  done
+else
+  cp -r "$SOURCE_DIR"/* "$ASSETS_DIR/"
+fi
 
 if [ $? -eq 0 ]; then
   echo ""
@@ -0,0 +1,127 @@
+package com.koko.mall
+
+import android.content.res.AssetManager
+import android.util.Log
+import android.webkit.WebResourceResponse
+import java.io.FileInputStream
+import java.io.InputStream
+import java.nio.ByteBuffer
+import java.nio.ByteOrder
+import java.nio.MappedByteBuffer
+import java.nio.channels.FileChannel
+
+/**
+ * 读取 build-image-pack.py 生成的 images.pack（格式见 product-images-home/imagepack.py）
+ * 整个文件 mmap 一次，按路径在排序索引上二分查找，返回指向映射内存的流，不解压、不复制。
+ * images.pack 在 APK 中必须不压缩存放（build.gradle: androidResources { noCompress 'pack' }），
+ * 否则 openFd 会失败，open 抛出异常而不是退回散装图片。
+ */
+class ImagePack private constructor(private val map: MappedByteBuffer) {
+
+    private val count: Int
+    private val indexOffset: Int
+    private val namesOffset: Int
+
+    init {
+        map.order(ByteOrder.LITTLE_ENDIAN)
+        val magic = ByteArray(MAGIC.length) { map.get(it) }
+        require(String(magic, Charsets.US_ASCII) == MAGIC && map.getInt(8) == VERSION) { "images.pack 格式不支持" }
+        count = map.getInt(16)
+        indexOffset = map.getLong(24).toInt()
+        namesOffset = map.getLong(40).toInt()
+    }
+
+    /** 二分查找路径（如 product-images-shop/xxx.jpg），返回图片内容，不存在时返回 null */
+    fun find(path: String): ByteBuffer? {
+        val key = path.toByteArray(Charsets.UTF_8)
+        var low = 0
+        var high = count - 1
+        while (low <= high) {
+            val mid = (low + high) ushr 1
+            val entry = indexOffset + mid * ENTRY_SIZE
+            val cmp = compareName(entry, key)
+            when {
+                cmp < 0 -> low = mid + 1
+                cmp > 0 -> high = mid - 1
+                else -> {
+                    val offset = map.getLong(entry + 8).toInt()
+                    val length = map.getLong(entry + 16).toInt()
+                    val slice = map.duplicate()
+                    slice.position(offset).limit(offset + length)
+                    return slice.slice()
+                }
+            }
+        }
+        return null
+    }
+
+    /** WebView 请求 file:///android_asset/<path> 时调用；不在包里的路径返回 null，交给默认处理 */
+    fun response(path: String): WebResourceResponse? {
+        val data = find(path) ?: return null
+        val response = WebResourceResponse(mimeType(path), null, ByteBufferInputStream(data))
+        response.responseHeaders = mapOf("Content-Length" to data.remaining().toString())
+        return response
+    }
+
+    /** 按无符号字节比较索引中的路径和 key（与打包时的UTF-8字节序一致） */
+    private fun compareName(entry: Int, key: ByteArray): Int {
+        val start = namesOffset + map.getInt(entry)
+        val length = map.getShort(entry + 4).toInt() and 0xFFFF
+        val n = minOf(length, key.size)
+        for (i in 0 until n) {
+            val a = map.get(start + i).toInt() and 0xFF
+            val b = key[i].toInt() and 0xFF
+            if (a != b) return a - b
+        }
+        return length - key.size
+    }
+
+    /** 直接从映射内存读取的输入流 */
+    private class ByteBufferInputStream(private val buffer: ByteBuffer) : InputStream() {
+        override fun read(): Int = if (buffer.hasRemaining()) buffer.get().toInt() and 0xFF else -1
+
+        override fun read(b: ByteArray, off: Int, len: Int): Int {
+            if (!buffer.hasRemaining()) return -1
+            val n = minOf(len, buffer.remaining())
+            buffer.get(b, off, n)
+            return n
+        }
+
+        override fun available(): Int = buffer.remaining()
+    }
+
+    companion object {
+        const val ASSET_NAME = "images.pack"
+        private const val MAGIC = "KOKOPACK"
+        private const val VERSION = 1
+        private const val ENTRY_SIZE = 56
+        private const val TAG = "ImagePack"
+
+        /**
+         * 映射 assets 中的 images.pack；assets 里没有这个文件（仍使用散装图片）时返回 null。
+         * 文件存在却无法映射（通常是漏了 noCompress 'pack'，APK 中被压缩）时直接抛出异常：
+         * COPY_TO_PROJECT.sh 打包时不会复制散装图片，回退只会让所有图片静默失效。
+         */
+        fun open(assets: AssetManager): ImagePack? {
+            if (assets.list("")?.contains(ASSET_NAME) != true) return null
+            val fd = try {
+                assets.openFd(ASSET_NAME)
+            } catch (e: java.io.IOException) {
+                Log.e(TAG, "$ASSET_NAME 无法映射，检查 build.gradle 是否配置 noCompress 'pack'", e)
+                throw IllegalStateException("$ASSET_NAME 在 APK 中被压缩存放，无法 mmap（需要 noCompress 'pack'）", e)
+            }
+            return fd.use {
+                FileInputStream(it.fileDescriptor).channel.use { channel ->
+                    ImagePack(channel.map(FileChannel.MapMode.READ_ONLY, it.startOffset, it.length))
+                }
+            }
+        }
+
+        private fun mimeType(path: String): String = when (path.substringAfterLast('.').lowercase()) {
+            "png" -> "image/png"
+            "webp" -> "image/webp"
+            "gif" -> "image/gif"
+            else -> "image/jpeg"
+        }
+    }
+}
@@ -1,6 +1,8 @@
 package com.koko.mall
 
 import android.os.Bundle
+import android.webkit.WebResourceRequest
+import android.webkit.WebResourceResponse
 import android.webkit.WebView
 import android.webkit.WebViewClient
 import android.webkit.WebChromeClient
@@ -9,10 +11,14 @@ import androidx.appcompat.app.AppCompatActivity
 
 class MainActivity : AppCompatActivity() {
     private lateinit var webView: WebView
+    private var imagePack: ImagePack? = null
 
     override fun onCreate(savedInstanceState: Bundle?) {
         super.onCreate(savedInstanceState)
         
+        // 图片打包为 assets/images.pack 时从映射内存读取（见 build-image-pack.py），否则使用散装图片
+        imagePack = ImagePack.open(assets)
+
         webView = WebView(this)
         setContentView(webView)
 
@@ -36,6 +42,13 @@ class MainActivity : AppCompatActivity() {
             override fun shouldOverrideUrlLoading(view: WebView?, url: String?): Boolean {
                 return false // 在 WebView 中打开所有链接
             }
+
+            override fun shouldInterceptRequest(view: WebView?, request: WebResourceRequest?): WebResourceResponse? {
+                val url = request?.url ?: return null
+                val path = url.path ?: return null
+                if (url.scheme != "file" || !path.startsWith(ASSET_PREFIX)) return null
+                return imagePack?.response(path.removePrefix(ASSET_PREFIX))
+            }
         }
 
         // 设置 WebChromeClient（用于进度条等）
@@ -52,4 +65,8 @@ class MainActivity : AppCompatActivity() {
             super.onBackPressed()
         }
     }
+
+    companion object {
+        private const val ASSET_PREFIX = "/android_asset/"
+    }
 }
\ No newline at end of file
@@ -1,41 +1,237 @@
 #!/usr/bin/env python3
-"""Generate PWA icons from SVG or create simple icons"""
-try:
-    from PIL import Image, ImageDraw, ImageFont
-    import os
-    
-    def create_icon(size, output_path):
-        """Create a simple icon with KOKO text"""
-        # Create image with orange background
-        img = Image.new('RGB', (size, size), color='#FFA500')
-        draw = ImageDraw.Draw(img)
-        
-        # Try to use a bold font
+"""Generate PWA, maskable and Android launcher icons from the SVG logos.
+
+Each SVG is rasterized once at the largest size any output needs and cached
+under .icon-cache/ by content hash; every density is then resized from that
+master in parallel. Outputs are only rebuilt when the source SVG (or the
+output settings) change, and manifest.json is updated to list the icons.
+
+SVG rendering uses cairosvg when installed, otherwise rsvg-convert or inkscape.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'product-images-home'))
+import metrics  # noqa: E402
+
+CACHE_DIR = os.path.join(ROOT_DIR, '.icon-cache')
+STATE_FILE = os.path.join(CACHE_DIR, 'state.json')
+MANIFEST_FILE = os.path.join(ROOT_DIR, 'manifest.json')
+
+ICON_SVG = 'KOKO.svg'
+LOGO_SVG = 'koko-logo.svg'
+MASTER_SIZE = 1024
+
+# Safe zones: maskable icons keep content inside the central 80%,
+# Android adaptive foregrounds inside the central 72dp of 108dp.
+MASKABLE_SCALE = 0.8
+ADAPTIVE_SCALE = 72 / 108
+
+PWA_SIZES = [72, 96, 128, 144, 152, 192, 384, 512]
+MASKABLE_SIZES = [192, 512]
+ANDROID_DENSITIES = {'mdpi': 1, 'hdpi': 1.5, 'xhdpi': 2, 'xxhdpi': 3, 'xxxhdpi': 4}
+LOGO_DENSITIES = [1, 2, 3]
+
+
+def icon_outputs():
+    """Return [(relative output path, source svg, kind, width, height)]."""
+    outputs = []
+    for size in PWA_SIZES:
+        # 192/512 keep their historical names, sw.js precaches them
+        path = f'icon-{size}.png' if size in (192, 512) else f'icons/icon-{size}.png'
+        outputs.append((path, ICON_SVG, 'any', size, size))
+    for size in MASKABLE_SIZES:
+        outputs.append((f'icons/maskable-{size}.png', ICON_SVG, 'maskable', size, size))
+    outputs.append(('icons/apple-touch-icon.png', ICON_SVG, 'any', 180, 180))
+    outputs.append(('icons/favicon-32.png', ICON_SVG, 'any', 32, 32))
+    for density, scale in ANDROID_DENSITIES.items():
+        base = f'android-res/mipmap-{density}'
+        launcher = round(48 * scale)
+        outputs.append((f'{base}/ic_launcher.png', ICON_SVG, 'any', launcher, launcher))
+        outputs.append((f'{base}/ic_launcher_round.png', ICON_SVG, 'round', launcher, launcher))
+        foreground = round(108 * scale)
+        outputs.append((f'{base}/ic_launcher_foreground.png', ICON_SVG, 'adaptive', foreground, foreground))
+    for density in LOGO_DENSITIES:
+        suffix = '' if density == 1 else f'@{density}x'
+        outputs.append((f'icons/logo{suffix}.png', LOGO_SVG, 'logo', 200 * density, 60 * density))
+    return outputs
+
+
+def file_sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def render_svg(svg_path, width, height, out_path):
+    """Rasterize an SVG to a PNG of the given size."""
+    try:
+        import cairosvg
+    except (ImportError, OSError):
+        # OSError: cairosvg installed without the native cairo library
+        cairosvg = None
+    if cairosvg is not None:
+        cairosvg.svg2png(url=svg_path, write_to=out_path, output_width=width, output_height=height)
+        return
+    if shutil.which('rsvg-convert'):
+        subprocess.run(['rsvg-convert', '-w', str(width), '-h', str(height), '-o', out_path, svg_path], check=True)
+        return
+    if shutil.which('inkscape'):
+        subprocess.run(['inkscape', svg_path, '--export-type=png', f'--export-filename={out_path}',
+                        '-w', str(width), '-h', str(height)], check=True)
+        return
+    raise RuntimeError('No SVG renderer found. Install one with: pip3 install cairosvg')
+
+
+def master_png(svg_name, svg_hash, aspect):
+    """Render the SVG once at master resolution, cached by content hash."""
+    width = MASTER_SIZE
+    height = round(MASTER_SIZE / aspect)
+    path = os.path.join(CACHE_DIR, f'{svg_hash[:16]}-{width}x{height}.png')
+    if not os.path.exists(path):
+        tmp_path = path + '.tmp.png'
+        render_svg(os.path.join(ROOT_DIR, svg_name), width, height, tmp_path)
+        os.replace(tmp_path, path)
+    return path
+
+
+def render_output(master_path, out_path, kind, width, height):
+    """Worker: resize the master into one output file."""
+    from PIL import Image, ImageDraw
+
+    with Image.open(master_path) as src:
+        master = src.convert('RGBA')
+
+    if kind in ('maskable', 'adaptive'):
+        # Pad the artwork into the safe zone; maskable icons get the logo's
+        # own background colour so the padding is invisible once masked.
+        scale = MASKABLE_SCALE if kind == 'maskable' else ADAPTIVE_SCALE
+        inner = round(width * scale)
+        background = master.getpixel((0, 0)) if kind == 'maskable' else (0, 0, 0, 0)
+        img = Image.new('RGBA', (width, height), background)
+        art = master.resize((inner, inner), Image.LANCZOS)
+        offset = ((width - inner) // 2, (height - inner) // 2)
+        img.alpha_composite(art, offset)
+    else:
+        img = master.resize((width, height), Image.LANCZOS)
+        if kind == 'round':
+            # Draw the circle mask at 4x and downsample for an anti-aliased edge
+            mask = Image.new('L', (width * 4, height * 4), 0)
+            ImageDraw.Draw(mask).ellipse((0, 0, width * 4 - 1, height * 4 - 1), fill=255)
+            alpha = Image.composite(img.getchannel('A'), Image.new('L', img.size, 0),
+                                    mask.resize(img.size, Image.LANCZOS))
+            img.putalpha(alpha)
+
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    tmp_path = out_path + '.tmp'
+    img.save(tmp_path, 'PNG', optimize=True)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def load_state():
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state):
+    tmp_file = STATE_FILE + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=0, sort_keys=True)
+    os.replace(tmp_file, STATE_FILE)
+
+
+def signature(svg_hash, kind, width, height):
+    raw = f'{svg_hash}:{kind}:{width}x{height}:{MASKABLE_SCALE}:{ADAPTIVE_SCALE}:v1'
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def update_manifest():
+    """Rewrite the icons list in manifest.json, keeping every other field."""
+    with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    manifest_sizes = {('any', size) for size in PWA_SIZES} | {('maskable', size) for size in MASKABLE_SIZES}
+    icons = [{'src': path, 'sizes': f'{width}x{height}', 'type': 'image/png', 'purpose': kind}
+             for path, svg, kind, width, height in icon_outputs()
+             if svg == ICON_SVG and (kind, width) in manifest_sizes]
+    if manifest.get('icons') == icons:
+        return False
+    manifest['icons'] = icons
+    tmp_file = MANIFEST_FILE + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+    os.replace(tmp_file, MANIFEST_FILE)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate PWA/Android icons from the SVG logos')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='parallel worker processes')
+    parser.add_argument('--force', action='store_true', help='rebuild every output')
+    parser.add_argument('--no-manifest', action='store_true', help='do not update manifest.json')
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start('generate_icons', args)
+
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("PIL/Pillow not installed. Please install it with: pip3 install Pillow")
+        print("Or use the generate-icons.html file in a browser to generate icons.")
+        return
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    state = load_state()
+    outputs = icon_outputs()
+
+    svg_hashes = {svg: file_sha256(os.path.join(ROOT_DIR, svg)) for svg in {o[1] for o in outputs}}
+    pending = []
+    for path, svg, kind, width, height in outputs:
+        sig = signature(svg_hashes[svg], kind, width, height)
+        if not args.force and state.get(path) == sig and os.path.exists(os.path.join(ROOT_DIR, path)):
+            continue
+        pending.append((path, svg, kind, width, height, sig))
+
+    if pending:
+        masters = {}
         try:
-            font_size = int(size * 0.4)
-            font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", font_size)
-        except:
-            try:
-                font = ImageFont.truetype("/System/Library/Fonts/Arial Bold.ttf", font_size)
-            except:
-                font = ImageFont.load_default()
-        
-        # Draw KOKO text
-        text = "KOKO"
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        position = ((size - text_width) / 2, (size - text_height) / 2)
-        
-        draw.text(position, text, fill='#1C1C1C', font=font)
-        img.save(output_path, 'PNG')
-        print(f"Created {output_path}")
-    
-    # Generate icons
-    create_icon(192, 'icon-192.png')
-    create_icon(512, 'icon-512.png')
-    print("Icons generated successfully!")
-    
-except ImportError:
-    print("PIL/Pillow not installed. Please install it with: pip3 install Pillow")
-    print("Or use the generate-icons.html file in a browser to generate icons.")
+            with metrics.stage('render_masters'):
+                for path, svg, kind, width, height, _ in pending:
+                    aspect = 1.0 if kind != 'logo' else width / height
+                    if svg not in masters:
+                        masters[svg] = master_png(svg, svg_hashes[svg], aspect)
+        except (RuntimeError, subprocess.CalledProcessError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+        with metrics.stage('resize'), ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            futures = [(item, pool.submit(render_output, masters[item[1]], os.path.join(ROOT_DIR, item[0]),
+                                          item[2], item[3], item[4]))
+                       for item in pending]
+            for item, future in futures:
+                future.result()
+                state[item[0]] = item[5]
+                print(f"Created {item[0]}")
+        save_state(state)
+
+    metrics.count('icons_generated', len(pending))
+    metrics.count('icons_up_to_date', len(outputs) - len(pending))
+    print(f"{len(pending)} icons generated, {len(outputs) - len(pending)} up to date")
+    if not args.no_manifest:
+        with metrics.stage('manifest'):
+            if update_manifest():
+                print("Updated manifest.json icons")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+KOKO Mall 本地服务器压力测试（asyncio，仅用标准库）
+从首页开始抓取站内资源（HTML/CSS/manifest中引用的本地文件和 sw.js），
+产品图片取自 product-images-home/product-images-info.json 和三个图片文件夹，
+N 个并发客户端反复回放用户会话：首页 → 分类页 → 积分页。
+每个客户端像浏览器一样最多保持6个长连接；--warm 时重复访问带 If-None-Match（模拟浏览器缓存）。
+
+报告吞吐量、p50/p95/p99延迟（按资源类型）、每次页面浏览的字节数和耗时；
+--json 保存报告，--compare 与之前保存的报告对比，便于客观比较服务端改动。
+
+示例：
+  python3 serve.py 8000 --quiet &
+  python3 loadtest.py --clients 50 --duration 30 --json before.json
+  python3 loadtest.py --clients 50 --duration 30 --compare before.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import time
+from urllib.parse import quote, unquote, urljoin, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'product-images-home'))
+import metrics  # noqa: E402
+from imageutil import IMAGE_FOLDERS, ROOT_DIR, folder_path, is_image  # noqa: E402
+
+MAPPING_FILE = os.path.join(ROOT_DIR, 'product-images-home', 'product-images-info.json')
+
+# 浏览器对同一主机的并发连接数
+CONNECTIONS_PER_CLIENT = 6
+ACCEPT_ENCODING = 'br, gzip'
+PAGES = ['home', 'category', 'points']
+
+_REFERENCE = re.compile(r'''(?:src|href)\s*=\s*["']([^"']+)["']|url\(\s*["']?([^"')]+)["']?\s*\)'''
+                        r'''|register\(\s*["']([^"']+)["']''')
+_CRAWLABLE = ('.html', '.css', '.json', '.webmanifest', '/')
+
+
+class HTTPError(Exception):
+    pass
+
+
+class Connection:
+    """一个HTTP/1.1长连接，按顺序发送请求"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, path, headers):
+        """返回 (状态码, 响应头, 响应体)；连接被服务器关闭时重连一次"""
+        for attempt in range(2):
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                return await self._exchange(path, headers)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                if attempt:
+                    raise
+
+    async def _exchange(self, path, headers):
+        lines = [f'GET {path} HTTP/1.1', f'Host: {self.host}:{self.port}']
+        lines += [f'{name}: {value}' for name, value in headers.items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        await self.writer.drain()
+
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        status_line, *header_lines = head.decode('latin-1').split('\r\n')
+        parts = status_line.split(' ', 2)
+        if len(parts) < 2 or not parts[1].isdigit():
+            raise HTTPError(f'无效的响应: {status_line!r}')
+        status = int(parts[1])
+        response_headers = {}
+        for line in header_lines:
+            name, sep, value = line.partition(':')
+            if sep:
+                response_headers[name.strip().lower()] = value.strip()
+
+        if status in (204, 304) or 100 <= status < 200:
+            body = b''
+        elif response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunked()
+        elif 'content-length' in response_headers:
+            body = await self.reader.readexactly(int(response_headers['content-length']))
+        else:
+            body = await self.reader.read()
+            self.close()
+        if response_headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, response_headers, body
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            if size == 0:
+                await self.reader.readuntil(b'\r\n')
+                return b''.join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readexactly(2)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Stats:
+    """所有客户端共享的统计"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+        self.errors = 0
+        self.timeouts = 0
+        self.bytes = 0
+        self.page_views = {page: [] for page in PAGES}
+
+    def record(self, kind, status, size, seconds):
+        self.latencies.setdefault(kind, []).append(seconds)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.bytes += size
+
+
+def resource_kind(path):
+    ext = os.path.splitext(urlsplit(path).path)[1].lower()
+    if ext in ('', '.html'):
+        return 'html'
+    if ext in ('.js', '.css', '.json', '.webmanifest'):
+        return ext.lstrip('.').replace('webmanifest', 'json')
+    return 'image' if is_image(ext) or ext == '.svg' else 'other'
+
+
+def local_references(base, text):
+    """提取文本中引用的同源资源路径（已编码、去掉片段）"""
+    refs = []
+    for match in _REFERENCE.finditer(text):
+        ref = next(group for group in match.groups() if group)
+        if ref.startswith(('data:', 'blob:', 'javascript:', 'mailto:', '#', '//')) or '${' in ref:
+            continue
+        url = urlsplit(urljoin(base, ref))
+        if url.scheme or url.netloc:
+            continue
+        refs.append(quote(unquote(url.path), safe='/') + (f'?{url.query}' if url.query else ''))
+    return refs
+
+
+async def crawl_shell(conn, start='/'):
+    """从首页出发抓取页面外壳需要的本地资源，返回路径列表（不含产品图片）"""
+    seen = [start]
+    queue = [start]
+    image_prefixes = tuple(f'/{folder}/' for folder, _, _ in IMAGE_FOLDERS.values())
+    while queue:
+        path = queue.pop(0)
+        status, headers, body = await conn.request(path, {})
+        if status != 200 or not path.endswith(_CRAWLABLE) or 'content-encoding' in headers:
+            continue
+        for ref in local_references(path, body.decode('utf-8', 'replace')):
+            if ref not in seen and not ref.startswith(image_prefixes):
+                seen.append(ref)
+                queue.append(ref)
+    return seen
+
+
+def image_catalog():
+    """返回 (首页图片路径, {分类: 商城页图片路径}, 积分页图片路径)，只包含实际存在的文件"""
+    def existing(page_type):
+        folder = folder_path(page_type)
+        if not os.path.isdir(folder):
+            return set()
+        return {name for name in os.listdir(folder) if is_image(name) and not name.startswith('.')}
+
+    home, shop, points = existing('home'), existing('shop'), existing('points')
+    home_paths, categories = [], {}
+    try:
+        with open(MAPPING_FILE, 'r', encoding='utf-8') as f:
+            mapping = json.load(f)
+    except (OSError, ValueError):
+        mapping = []
+    for item in mapping:
+        filename = item.get('filename')
+        if filename in home:
+            home_paths.append(f"/{IMAGE_FOLDERS['home'][0]}/{quote(filename)}")
+        if filename in shop:
+            categories.setdefault(item.get('category') or '', []).append(
+                f"/{IMAGE_FOLDERS['shop'][0]}/{quote(filename)}")
+    if not home_paths:
+        home_paths = [f"/{IMAGE_FOLDERS['home'][0]}/{quote(name)}" for name in sorted(home)]
+    if not categories:
+        categories[''] = [f"/{IMAGE_FOLDERS['shop'][0]}/{quote(name)}" for name in sorted(shop)]
+    points_paths = [f"/{IMAGE_FOLDERS['points'][0]}/{quote(name)}" for name in sorted(points)]
+    return home_paths, categories, points_paths
+
+
+class Client:
+    """一个虚拟用户：固定数量的长连接，可选的浏览器缓存"""
+
+    def __init__(self, host, port, stats, warm, timeout):
+        self.connections = asyncio.Queue()
+        for _ in range(CONNECTIONS_PER_CLIENT):
+            self.connections.put_nowait(Connection(host, port))
+        self.stats = stats
+        self.warm = warm
+        self.timeout = timeout
+        self.etags = {}
+
+    async def fetch(self, path):
+        headers = {'Accept-Encoding': ACCEPT_ENCODING, 'Accept': 'image/avif,image/webp,*/*'}
+        if path in self.etags:
+            headers['If-None-Match'] = self.etags[path]
+        conn = await self.connections.get()
+        started = time.perf_counter()
+        try:
+            status, response_headers, body = await asyncio.wait_for(conn.request(path, headers), self.timeout)
+        except asyncio.TimeoutError:
+            # 连接可能停在半个响应上，不能再复用
+            conn.close()
+            self.stats.timeouts += 1
+            return 0
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, HTTPError, ValueError):
+            conn.close()
+            self.stats.errors += 1
+            return 0
+        finally:
+            self.connections.put_nowait(conn)
+        self.stats.record(resource_kind(path), status, len(body), time.perf_counter() - started)
+        if status >= 500:
+            self.stats.errors += 1
+        if self.warm and 'etag' in response_headers:
+            self.etags[path] = response_headers['etag']
+        return len(body)
+
+    async def page_view(self, page, paths):
+        started = time.perf_counter()
+        sizes = await asyncio.gather(*(self.fetch(path) for path in paths))
+        self.stats.page_views[page].append((sum(sizes), time.perf_counter() - started))
+
+    def close(self):
+        while not self.connections.empty():
+            self.connections.get_nowait().close()
+
+
+async def run_client(client, shell, images, args, deadline, rng):
+    home_paths, categories, points_paths = images
+    sessions = 0
+    while time.perf_counter() < deadline and (not args.sessions or sessions < args.sessions):
+        if not args.warm:
+            client.etags.clear()
+        views = [
+            ('home', shell + rng.sample(home_paths, min(args.home_images, len(home_paths)))),
+            ('category', categories[rng.choice(list(categories))][:args.category_images]),
+            ('points', rng.sample(points_paths, min(args.points_images, len(points_paths)))),
+        ]
+        for page, paths in views:
+            await client.page_view(page, paths)
+            if args.think:
+                await asyncio.sleep(rng.uniform(0, 2 * args.think) / 1000)
+        sessions += 1
+    client.close()
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(values):
+    values = sorted(values)
+    return {'count': len(values), **{f'p{p}': percentile(values, p) for p in (50, 95, 99)}}
+
+
+def build_report(stats, elapsed, args, shell):
+    requests = sum(len(values) for values in stats.latencies.values())
+    all_latencies = [value for values in stats.latencies.values() for value in values]
+    pages = {}
+    for page, views in stats.page_views.items():
+        if views:
+            pages[page] = {'views': len(views), 'bytes_per_view': sum(size for size, _ in views) / len(views),
+                           **summarize([seconds for _, seconds in views])}
+    return {
+        'url': args.url,
+        'clients': args.clients,
+        'warm': args.warm,
+        'seconds': elapsed,
+        'shell_resources': len(shell),
+        'requests': requests,
+        'errors': stats.errors,
+        'timeouts': stats.timeouts,
+        'requests_per_second': requests / elapsed if elapsed else 0,
+        'megabytes_per_second': stats.bytes / elapsed / 1048576 if elapsed else 0,
+        'page_views_per_second': sum(page['views'] for page in pages.values()) / elapsed if elapsed else 0,
+        'statuses': {str(status): count for status, count in sorted(stats.statuses.items())},
+        'latency': {'all': summarize(all_latencies),
+                    **{kind: summarize(values) for kind, values in sorted(stats.latencies.items())}},
+        'pages': pages,
+    }
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.1f}"
+
+
+def _change(current, baseline, lower_is_better=True):
+    if not baseline:
+        return ''
+    delta = (current - baseline) / baseline * 100
+    better = delta < 0 if lower_is_better else delta > 0
+    return f"  ({delta:+.1f}%{'，更好' if better and abs(delta) >= 1 else ''})"
+
+
+def print_report(report, baseline=None):
+    base = baseline or {}
+    print(f"\n{report['clients']} 个客户端，{report['seconds']:.1f} 秒，"
+          f"{'带缓存验证' if report['warm'] else '冷缓存'}，外壳资源 {report['shell_resources']} 个")
+    print(f"请求 {report['requests']}，错误 {report['errors']}，超时 {report['timeouts']}，状态码 "
+          + '，'.join(f'{status}×{count}' for status, count in report['statuses'].items()))
+    print(f"吞吐量 {report['requests_per_second']:.0f} 请求/秒"
+          f"{_change(report['requests_per_second'], base.get('requests_per_second'), False)}，"
+          f"{report['megabytes_per_second']:.1f} MB/秒，"
+          f"{report['page_views_per_second']:.1f} 页面浏览/秒"
+          f"{_change(report['page_views_per_second'], base.get('page_views_per_second'), False)}")
+
+    print(f"\n{'资源类型':<10}{'请求数':>9}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+    for kind, latency in report['latency'].items():
+        change = _change(latency['p95'], base.get('latency', {}).get(kind, {}).get('p95'))
+        print(f"{kind:<10}{latency['count']:>9}{_ms(latency['p50']):>10}{_ms(latency['p95']):>10}"
+              f"{_ms(latency['p99']):>10}{change}")
+
+    print(f"\n{'页面':<10}{'浏览次数':>9}{'KB/次':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+    for page, info in report['pages'].items():
+        change = _change(info['p95'], base.get('pages', {}).get(page, {}).get('p95'))
+        print(f"{page:<10}{info['views']:>9}{info['bytes_per_view'] / 1024:>10.1f}{_ms(info['p50']):>10}"
+              f"{_ms(info['p95']):>10}{_ms(info['p99']):>10}{change}")
+
+
+async def run(args):
+    url = urlsplit(args.url)
+    host, port = url.hostname or 'localhost', url.port or 80
+    start_path = url.path or '/'
+
+    conn = Connection(host, port)
+    try:
+        with metrics.stage('crawl_shell'):
+            shell = await crawl_shell(conn, start_path)
+    finally:
+        conn.close()
+    with metrics.stage('image_catalog'):
+        images = image_catalog()
+    print(f"页面外壳 {len(shell)} 个资源；首页图片 {len(images[0])}，"
+          f"分类 {len(images[1])} 个，积分页图片 {len(images[2])}")
+
+    stats = Stats()
+    rng = random.Random(args.seed)
+    clients = [Client(host, port, stats, args.warm, args.timeout) for _ in range(args.clients)]
+    started = time.perf_counter()
+    deadline = started + args.duration
+    with metrics.stage('replay'):
+        await asyncio.gather(*(run_client(client, shell, images, args, deadline, random.Random(rng.random()))
+                               for client in clients))
+    report = build_report(stats, time.perf_counter() - started, args, shell)
+    metrics.count('requests', report['requests'])
+    metrics.count('errors', stats.errors)
+    metrics.count('timeouts', stats.timeouts)
+    metrics.count('bytes_received', stats.bytes)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回放PWA用户会话，对本地服务器做并发压力测试')
+    parser.add_argument('--url', default='http://localhost:8000/', help='首页地址（默认 http://localhost:8000/）')
+    parser.add_argument('--clients', type=int, default=20, help='并发客户端数（默认20）')
+    parser.add_argument('--duration', type=float, default=20, help='测试时长，秒（默认20）')
+    parser.add_argument('--sessions', type=int, default=0, help='每个客户端最多回放的会话数（默认不限，按时长）')
+    parser.add_argument('--think', type=float, default=0, help='页面之间的平均停留时间，毫秒（默认0）')
+    parser.add_argument('--home-images', type=int, default=24, help='每次首页浏览加载的图片数（默认24）')
+    parser.add_argument('--category-images', type=int, default=40, help='每次分类页浏览加载的图片数（默认40）')
+    parser.add_argument('--points-images', type=int, default=30, help='每次积分页浏览加载的图片数（默认30）')
+    parser.add_argument('--warm', action='store_true', help='客户端保留ETag，重复访问时发送 If-None-Match')
+    parser.add_argument('--timeout', type=float, default=10, help='单个请求的超时时间，秒（默认10）')
+    parser.add_argument('--seed', type=int, default=1, help='随机种子（默认1，便于重复对比）')
+    parser.add_argument('--json', metavar='FILE', help='将报告写入JSON文件')
+    parser.add_argument('--compare', metavar='FILE', help='与之前 --json 保存的报告对比')
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start('loadtest', args)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    try:
+        report = asyncio.run(run(args))
+    except OSError as e:
+        print(f"错误: 无法连接 {args.url}（{e}），请先启动 python3 serve.py")
+        raise SystemExit(1)
+    print_report(report, baseline)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n已生成JSON报告: {args.json}")
+    if report['errors'] or report['timeouts']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
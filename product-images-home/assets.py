@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+前端构建产物共享模块
+内容哈希文件名、原子写入、预压缩的 .gz/.br 副本，以及JS/CSS压缩
+（安装了 rjsmin/rcssmin 时使用它们，否则使用这里保守的内置实现：
+JS只删除注释和多余空白、保留换行，不依赖自动分号插入的细节）
+"""
+
+import gzip
+import hashlib
+import os
+import re
+
+import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+# 小于该字节数的文件不生成压缩副本
+MIN_COMPRESS_SIZE = 256
+
+
+def content_hash(data, length=10):
+    """内容的sha256前length位"""
+    return hashlib.sha256(data).hexdigest()[:length]
+
+
+def hashed_name(filename, data):
+    """在扩展名前插入内容哈希：app.js -> app.3f2a9c1b0d.js"""
+    stem, ext = os.path.splitext(filename)
+    return f"{stem}.{content_hash(data)}{ext}"
+
+
+def write_atomic(path, data):
+    """先写临时文件再替换，避免写入中断导致文件损坏"""
+    tmp_file = path + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_file, path)
+    metrics.count('bytes_written', len(data))
+
+
+def write_precompressed(path, data):
+    """写入文件及其 .gz（和已安装brotli时的 .br）副本，返回写入的路径列表"""
+    write_atomic(path, data)
+    written = [path]
+    if len(data) < MIN_COMPRESS_SIZE:
+        return written
+    write_atomic(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+    written.append(path + '.gz')
+    if brotli is not None:
+        write_atomic(path + '.br', brotli.compress(data, quality=11))
+        written.append(path + '.br')
+    return written
+
+
+# 前一个有效字符是这些标点或关键字时，'/' 开始的是正则表达式而不是除号
+_REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw',
+                   'case', 'do', 'else', 'yield', 'await'}
+# 两侧任一为这些标点时，中间的空格可以删除
+_JS_TIGHT = set('{}()[];,:=<>!&|?*%^~')
+_WORD = re.compile(r'[\w$\\]')
+_TRAILING_WORD = re.compile(r'[\w$]+$')
+
+
+def _is_word(ch):
+    return bool(ch) and (ord(ch) > 127 or bool(_WORD.match(ch)))
+
+
+class _JSMinifier:
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+        self.out = []
+
+    def last(self):
+        return self.out[-1][-1] if self.out else ''
+
+    def last_significant(self):
+        """最后一个非空白字符，以及它所在的标识符（用于判断关键字）"""
+        for chunk in reversed(self.out):
+            stripped = chunk.rstrip()
+            if stripped:
+                match = _TRAILING_WORD.search(stripped)
+                return stripped[-1], match.group(0) if match else ''
+        return '', ''
+
+    def space(self, newline):
+        """把一段空白（或注释）压缩为一个换行、一个空格或什么都不留"""
+        prev = self.last()
+        nxt = self.text[self.pos:self.pos + 1]
+        if not prev or prev in ' \n' or not nxt:
+            return
+        if newline:
+            if prev not in '{([,;' and nxt not in '})],;':
+                self.out.append('\n')
+            return
+        if prev in _JS_TIGHT or nxt in _JS_TIGHT:
+            # 避免拼出 <!-- 和 -->（脚本中的HTML注释标记）
+            if not (prev == '<' and nxt == '!') and not (prev == '-' and nxt == '>'):
+                return
+        self.out.append(' ')
+
+    def quoted(self, quote):
+        text, start = self.text, self.pos
+        pos = start + 1
+        while pos < len(text) and text[pos] != quote:
+            pos += 2 if text[pos] == '\\' else 1
+        self.pos = pos + 1
+        self.out.append(text[start:self.pos])
+
+    def template(self):
+        text = self.text
+        start = self.pos
+        pos = start + 1
+        while pos < len(text):
+            ch = text[pos]
+            if ch == '\\':
+                pos += 2
+            elif ch == '`':
+                self.out.append(text[start:pos + 1])
+                self.pos = pos + 1
+                return
+            elif ch == '$' and text[pos + 1:pos + 2] == '{':
+                self.out.append(text[start:pos + 2])
+                self.pos = pos + 2
+                self.code(stop_at_brace=True)
+                self.out.append('}')
+                self.pos += 1
+                start = pos = self.pos
+                continue
+            else:
+                pos += 1
+        self.out.append(text[start:])
+        self.pos = len(text)
+
+    def regex(self):
+        text, start = self.text, self.pos
+        pos = start + 1
+        in_class = False
+        while pos < len(text):
+            ch = text[pos]
+            if ch == '\\':
+                pos += 2
+                continue
+            if ch == '\n':
+                break
+            if ch == '[':
+                in_class = True
+            elif ch == ']':
+                in_class = False
+            elif ch == '/' and not in_class:
+                pos += 1
+                while pos < len(text) and _is_word(text[pos]):
+                    pos += 1
+                break
+            pos += 1
+        self.pos = pos
+        self.out.append(text[start:pos])
+
+    def code(self, stop_at_brace=False):
+        text = self.text
+        depth = 0
+        while self.pos < len(text):
+            ch = text[self.pos]
+            if ch in ' \t\r\n\f\v\u00a0\ufeff':
+                end = self.pos
+                while end < len(text) and text[end] in ' \t\r\n\f\v\u00a0\ufeff':
+                    end += 1
+                newline = '\n' in text[self.pos:end]
+                self.pos = end
+                self.space(newline)
+            elif ch == '/' and text[self.pos + 1:self.pos + 2] == '/':
+                end = text.find('\n', self.pos)
+                self.pos = len(text) if end < 0 else end
+            elif ch == '/' and text[self.pos + 1:self.pos + 2] == '*':
+                end = text.find('*/', self.pos + 2)
+                end = len(text) if end < 0 else end + 2
+                comment = text[self.pos:end]
+                self.pos = end
+                if comment.startswith('/*!'):
+                    self.out.append(comment)
+                else:
+                    self.space('\n' in comment)
+            elif ch in '\'"':
+                self.quoted(ch)
+            elif ch == '`':
+                self.template()
+            elif ch == '/':
+                prev, word = self.last_significant()
+                if not prev or prev in _REGEX_AFTER or word in _REGEX_KEYWORDS:
+                    self.regex()
+                else:
+                    self.out.append(ch)
+                    self.pos += 1
+            else:
+                if stop_at_brace:
+                    if ch == '{':
+                        depth += 1
+                    elif ch == '}':
+                        if depth == 0:
+                            return
+                        depth -= 1
+                start = self.pos
+                self.pos += 1
+                if _is_word(ch):
+                    while self.pos < len(text) and _is_word(text[self.pos]):
+                        self.pos += 1
+                self.out.append(text[start:self.pos])
+
+
+def minify_js(text):
+    """压缩JS：删除注释和缩进，连续空白压缩为一个换行或空格；字符串、模板字符串和正则原样保留"""
+    if rjsmin is not None:
+        return rjsmin.jsmin(text)
+    minifier = _JSMinifier(text)
+    minifier.code()
+    return ''.join(minifier.out).strip()
+
+
+_CSS_TOKEN = re.compile(r'"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'|/\*.*?\*/|\s+|[^"\'/\s]+|/', re.S)
+# 两侧的空白可以删除的标点（不含 : + - 和括号，它们在选择器和calc()中两侧的空格有意义）
+_CSS_TIGHT = set('{};,>')
+
+
+def minify_css(text):
+    """压缩CSS：删除注释，压缩空白，去掉标点两侧和声明块中冒号后的空格，以及 } 前的分号"""
+    if rcssmin is not None:
+        return rcssmin.cssmin(text)
+    out = []
+    # 每层花括号是否为声明块（@media等条件规则的花括号内仍是规则）
+    blocks = []
+    prelude_is_at_rule = False
+    pending_space = False
+    for match in _CSS_TOKEN.finditer(text):
+        token = match.group(0)
+        if token.startswith('/*'):
+            if token.startswith('/*!'):
+                out.append(token)
+            else:
+                pending_space = True
+            continue
+        if token.isspace():
+            pending_space = True
+            continue
+        first = token[0]
+        prev = out[-1][-1] if out else ''
+        if pending_space and prev and prev not in _CSS_TIGHT and first not in _CSS_TIGHT \
+                and not (blocks and blocks[-1] and ':' in (prev, first)) and prev != '(' and first != ')':
+            out.append(' ')
+        pending_space = False
+        if first in '"\'':
+            out.append(token)
+            continue
+        for ch in re.split(r'([{};])', token):
+            if not ch:
+                continue
+            if ch == '{':
+                blocks.append(not prelude_is_at_rule or _declaration_at_rule(out))
+                prelude_is_at_rule = False
+            elif ch == '}':
+                if out and out[-1].endswith(';'):
+                    out[-1] = out[-1][:-1]
+                if blocks:
+                    blocks.pop()
+                prelude_is_at_rule = False
+            elif ch == ';':
+                prelude_is_at_rule = False
+            elif ch.startswith('@') and not (prev and prev not in '{};'):
+                prelude_is_at_rule = True
+            out.append(ch)
+    return ''.join(out).strip()
+
+
+def _declaration_at_rule(out):
+    """@font-face/@page等的花括号内是声明，@media/@supports等的花括号内是规则"""
+    for chunk in reversed(out):
+        if chunk.startswith('@'):
+            name = re.match(r'@([\w-]+)', chunk)
+            return bool(name) and name.group(1).lower() in ('font-face', 'page', 'property', 'counter-style',
+                                                             'font-palette-values', 'viewport')
+    return False
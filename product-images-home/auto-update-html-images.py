@@ -3,149 +3,354 @@
 """
 自动更新HTML文件中的图片路径
 检测product-images-home文件夹中的图片，自动更新到index.html
+同时写入占位属性 bg（主色）和 bh（BlurHash），图片加载前可立即显示占位
+使用 --watch 常驻运行，图片增删或HTML/映射文件变化时只处理变化的部分
+HTML以内存映射方式读取，只把修改过的产品字面量拼接进流式写出的新文件
+每次写回都在修改日志中追加一条可撤销的记录（见 html-history.py），不再整份复制 .backup
 """
 
+import argparse
+import bisect
 import json
 import os
-import re
-import glob
-from pathlib import Path
+import time
+
+import catalog
+import htmljournal
+import metrics
+import parsecache
+from watcher import Watcher
+
+MAPPING_FILE = 'product-images-info.json'
+
+# 支持的图片格式；同名多种格式时靠后的优先（与原glob扫描顺序一致）
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.webp', '.gif']
+
+def _load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
 
 def load_image_mapping():
-    """加载图片映射文件"""
-    mapping_file = 'product-images-info.json'
+    """加载图片映射文件（未变化时使用解析缓存）"""
+    mapping_file = MAPPING_FILE
     if os.path.exists(mapping_file):
-        with open(mapping_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return parsecache.cached('json', mapping_file, _load_json)
     return []
 
-def scan_image_files():
-    """扫描product-images-home文件夹中的图片文件"""
-    image_dir = '.'
-    image_extensions = ['*.jpg', '*.jpeg', '*.png', '*.webp', '*.gif']
+def scan_image_files(image_dir='.'):
+    """扫描product-images-home文件夹中的图片文件（目录未变化时使用缓存的清单）"""
     found_images = {}
+    ranks = {}
     
-    for ext in image_extensions:
-        for img_path in glob.glob(os.path.join(image_dir, ext)):
-            filename = os.path.basename(img_path)
-            # 移除扩展名，只保留基础名称
-            base_name = os.path.splitext(filename)[0]
-            found_images[base_name] = filename
+    for name, _, _ in parsecache.list_dir(image_dir):
+        # 移除扩展名，只保留基础名称
+        base_name, ext = os.path.splitext(name)
+        if ext not in IMAGE_EXTENSIONS or name.startswith('.'):
+            continue
+        rank = IMAGE_EXTENSIONS.index(ext)
+        if rank >= ranks.get(base_name, -1):
+            found_images[base_name] = name
+            ranks[base_name] = rank
     
     return found_images
 
-def update_html_file(html_file, image_mapping, found_images):
-    """更新HTML文件中的图片路径"""
-    with open(html_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    original_content = content
-    updated_count = 0
-    
-    # 更新getProductImagePath函数，使其优先查找product-images-home文件夹
-    # 首先检查函数是否存在
-    if 'function getProductImagePath(product)' in content:
-        # 查找函数定义
-        func_pattern = r'(function getProductImagePath\(product\) \{[\s\S]*?return `product-images/\$\{productId\}\.jpg`;)'
-        
-        new_func = '''function getProductImagePath(product) {
-                // 如果产品已有img属性，优先使用
-                if (product.img) {
-                    return product.img;
-                }
-                
-                // 尝试从product-images-home文件夹中查找图片
-                // 生成产品ID（基于品牌+名称）
-                const brand = (product.b || '').trim();
-                const name = (product.n || '').trim();
-                const productId = (brand + '_' + name).toLowerCase().replace(/[<>:"/\\\\|?*]/g, '').replace(/\\s+/g, '_');
-                if (!productId) return '';
-                
-                // 优先查找product-images-home文件夹
-                // 支持的图片格式（按优先级排序）
-                const extensions = ['jpg', 'jpeg', 'png', 'webp'];
-                for (let ext of extensions) {
-                    const testPath = `product-images-home/${productId}.${ext}`;
-                    // 注意：这里假设图片存在，浏览器会通过onerror处理加载失败
-                    // 实际文件存在性检查需要在服务器端或通过预加载列表完成
-                }
-                
-                // 回退到product-images文件夹
-                return `product-images-home/${productId}.jpg`; // 默认尝试jpg格式
-            }'''
-        
-        content = re.sub(func_pattern, new_func, content)
-        updated_count += 1
-        print("已更新 getProductImagePath 函数")
-    
-    # 方法2：直接更新产品数据中的img属性（如果图片存在）
-    # 查找SD对象并更新产品数据
+def pick_image_file(image_dir, base_name):
+    """返回某个基础名称当前对应的图片文件名，不存在时返回None"""
+    for ext in reversed(IMAGE_EXTENSIONS):
+        if os.path.isfile(os.path.join(image_dir, base_name + ext)):
+            return base_name + ext
+    return None
+
+def build_image_index(image_mapping, found_images):
+    """按 (品牌, 名称) 建立产品 -> 图片路径的索引"""
+    index = {}
     for item in image_mapping:
-        brand = item['brand']
-        name = item['name']
-        filename = item['filename']
+        filename = item.get('filename') or item.get('image_filename')
+        if not filename:
+            continue
         base_name = os.path.splitext(filename)[0]
         
         # 检查图片文件是否存在
         if base_name in found_images:
-            actual_filename = found_images[base_name]
-            img_path = f"product-images-home/{actual_filename}"
-            
-            # 构建产品匹配模式
-            # 匹配格式: { b: "Brand", n: "Name", ... }
-            pattern = rf'(\{{\s*b:\s*"{re.escape(brand)}",\s*n:\s*"{re.escape(name)}"[^}}]*?)(\}})'
-            
-            def replace_product(match):
-                product_str = match.group(1)
-                # 检查是否已有img属性
-                if 'img:' in product_str:
-                    # 替换现有的img值
-                    product_str = re.sub(r'img:\s*"[^"]*"', f'img: "{img_path}"', product_str)
-                else:
-                    # 在最后一个属性后添加img属性
-                    # 找到最后一个属性（通常是i:）
-                    if 'i:' in product_str:
-                        product_str = re.sub(r'(i:\s*"[^"]*")', rf'\1, img: "{img_path}"', product_str)
-                    else:
-                        # 如果没有i属性，在n属性后添加
-                        product_str = re.sub(r'(n:\s*"[^"]*")', rf'\1, img: "{img_path}"', product_str)
-                return product_str + match.group(2)
-            
-            new_content = re.sub(pattern, replace_product, content)
-            if new_content != content:
-                content = new_content
-                updated_count += 1
-    
-    if content != original_content:
-        # 备份原文件
-        backup_file = html_file + '.backup'
-        with open(backup_file, 'w', encoding='utf-8') as f:
-            f.write(original_content)
-        print(f"已创建备份文件: {backup_file}")
-        
-        # 写入更新后的内容
-        with open(html_file, 'w', encoding='utf-8') as f:
-            f.write(content)
-        print(f"已更新HTML文件: {html_file}")
+            index[(item['brand'], item['name'])] = f"product-images-home/{found_images[base_name]}"
+    return index
+
+def load_image_placeholders(image_index, image_dir='.'):
+    """计算已有图片的占位信息，返回 {图片路径: (主色, BlurHash)}；未安装Pillow时返回None"""
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("未安装Pillow，跳过占位信息（pip3 install Pillow）")
+        return None
+    import placeholders
+    
+    files = {img_path: os.path.join(image_dir, img_path.split('/', 1)[1])
+             for img_path in set(image_index.values())}
+    computed = placeholders.load_placeholders(list(files.values()))
+    return {img_path: computed[path] for img_path, path in files.items()}
+
+def product_changes(img_path, image_placeholders):
+    """产品对象应有的 img 及占位属性（bg 主色，bh BlurHash）"""
+    changes = {'img': img_path}
+    info = image_placeholders.get(img_path) if image_placeholders else None
+    if info:
+        changes['bg'], changes['bh'] = info
+    return changes
+
+def product_edits(content, image_index, image_placeholders=None, products=None):
+    """单次遍历SD中的产品对象，计算注入或替换img及占位属性所需的修改，返回 (修改列表, 更新数量)
+    content 可以是str或 catalog.map_html 的内存映射；
+    products 为 catalog.load_products 的结果时（字节偏移，需配合内存映射）不再重新解析"""
+    edits = []
+    updated_count = 0
+    
+    for product in products if products is not None else catalog.iter_products(content):
+        if product.source != 'SD':
+            continue
+        img_path = image_index.get((product.brand, product.name))
+        if not img_path:
+            continue
+        if product.img == img_path and not image_placeholders:
+            continue
+        product_edits = catalog.object_edits(content, product.start,
+                                             product_changes(img_path, image_placeholders))
+        if product_edits:
+            edits.extend(product_edits)
+            updated_count += 1
+    
+    return edits, updated_count
+
+def rewrite_products(content, image_index, image_placeholders=None):
+    """注入或替换img及占位属性，返回 (新内容, 更新数量)"""
+    edits, updated_count = product_edits(content, image_index, image_placeholders)
+    if not updated_count:
+        return content, 0
+    return catalog.apply_edits(content, edits), updated_count
+
+def touched_products(products, edits):
+    """修改位置所在的产品（按位置排序），返回 ['品牌 名称', ...]"""
+    starts = [product.start for product in products]
+    indexes = []
+    for edit_start, _, _ in edits:
+        idx = bisect.bisect_right(starts, edit_start) - 1
+        if idx >= 0 and edit_start < products[idx].end and (not indexes or indexes[-1] != idx):
+            indexes.append(idx)
+    return [f"{products[idx].brand} {products[idx].name}".strip() for idx in indexes]
+
+def save_html(html_file, edits, products=()):
+    """把修改（针对内存映射计算的字节偏移）流式写入HTML文件，并记入修改日志（可用 html-history.py 回滚）"""
+    record = htmljournal.write_edits(html_file, edits, touched_products(products, edits),
+                                     'auto-update-html-images')
+    print(f"已更新HTML文件: {html_file}（修改记录 #{record['id']}，{htmljournal.delta_size(record)} 字节）")
+
+def update_html_file(html_file, image_mapping, found_images, with_placeholders=True):
+    """更新HTML文件中的图片路径"""
+    image_index = build_image_index(image_mapping, found_images)
+    with metrics.stage('placeholders'):
+        image_placeholders = load_image_placeholders(image_index) if with_placeholders else None
+    products = catalog.load_products(html_file, source='SD')
+    with metrics.stage('rewrite'), catalog.map_html(html_file) as content:
+        edits, updated_count = product_edits(content, image_index, image_placeholders, products)
+    metrics.count('products_updated', updated_count)
+    
+    if updated_count:
+        with metrics.stage('write'):
+            save_html(html_file, edits, products)
         print(f"共更新 {updated_count} 个产品的图片路径")
     else:
         print("未发现需要更新的内容")
     
     return updated_count
 
+def shift_products(products, edits):
+    """按已应用的修改（按位置排序）平移产品记录的源码位置"""
+    result = []
+    shift = 0
+    j = 0
+    for product in products:
+        while j < len(edits) and edits[j][0] < product.start:
+            shift += len(edits[j][2]) - (edits[j][1] - edits[j][0])
+            j += 1
+        start = product.start + shift
+        while j < len(edits) and edits[j][0] < product.end:
+            shift += len(edits[j][2]) - (edits[j][1] - edits[j][0])
+            j += 1
+        result.append(product._replace(start=start, end=product.end + shift))
+    return result
+
+class ImageSync:
+    """监视模式下常驻内存的产品索引和图片索引；HTML内容每次处理时重新映射，不常驻内存"""
+    
+    def __init__(self, html_file, image_dir='.', with_placeholders=True):
+        self.html_file = html_file
+        self.image_dir = image_dir
+        self.with_placeholders = with_placeholders
+        self.image_placeholders = None
+        self.found_images = scan_image_files(image_dir)
+        self.reload_mapping()
+        self.reload_html()
+    
+    def reload_mapping(self):
+        """重新加载映射文件，建立 图片基础名称 -> (品牌, 名称) 索引"""
+        self.image_mapping = load_image_mapping()
+        self.base_to_keys = {}
+        for item in self.image_mapping:
+            filename = item.get('filename') or item.get('image_filename')
+            if filename:
+                base_name = os.path.splitext(filename)[0]
+                self.base_to_keys.setdefault(base_name, set()).add((item['brand'], item['name']))
+    
+    def reload_html(self):
+        """重新解析HTML（未变化时使用解析缓存）"""
+        self.html_stat = self.stat_html()
+        self.products = catalog.load_products(self.html_file, source='SD')
+        self.index_products()
+    
+    def index_products(self):
+        self.key_to_indexes = {}
+        for idx, product in enumerate(self.products):
+            self.key_to_indexes.setdefault((product.brand, product.name), []).append(idx)
+    
+    def stat_html(self):
+        st = os.stat(self.html_file)
+        return (st.st_size, st.st_mtime_ns)
+    
+    def html_changed_externally(self):
+        return os.path.exists(self.html_file) and self.stat_html() != self.html_stat
+    
+    def save(self, edits):
+        save_html(self.html_file, edits, self.products)
+        self.html_stat = self.stat_html()
+    
+    def full_sync(self):
+        """按当前映射和图片索引全量同步一次"""
+        image_index = build_image_index(self.image_mapping, self.found_images)
+        if self.with_placeholders:
+            self.image_placeholders = load_image_placeholders(image_index, self.image_dir)
+        with catalog.map_html(self.html_file) as content:
+            edits, updated_count = product_edits(content, image_index, self.image_placeholders, self.products)
+        if updated_count:
+            self.save(edits)
+            self.reload_html()
+        return updated_count
+    
+    def apply_image_changes(self, filenames):
+        """只处理新增/重命名/删除的图片所影响的产品"""
+        base_names = set()
+        for filename in filenames:
+            base_name = os.path.splitext(filename)[0]
+            picked = pick_image_file(self.image_dir, base_name)
+            if picked:
+                self.found_images[base_name] = picked
+            else:
+                self.found_images.pop(base_name, None)
+            base_names.add(base_name)
+        
+        if self.image_placeholders is not None:
+            added = {b: f"product-images-home/{self.found_images[b]}" for b in base_names if b in self.found_images}
+            self.image_placeholders.update(load_image_placeholders(added, self.image_dir) or {})
+        
+        edits = []
+        new_imgs = {}
+        with catalog.map_html(self.html_file) as content:
+            for base_name in base_names:
+                filename = self.found_images.get(base_name)
+                for key in self.base_to_keys.get(base_name, ()):
+                    for idx in self.key_to_indexes.get(key, ()):
+                        product = self.products[idx]
+                        if filename:
+                            img_path = f"product-images-home/{filename}"
+                            changes = product_changes(img_path, self.image_placeholders)
+                        elif product.img.startswith(f"product-images-home/{base_name}."):
+                            img_path = ''
+                            changes = {'img': None, 'bg': None, 'bh': None}
+                        else:
+                            continue
+                        product_edits = catalog.object_edits(content, product.start, changes)
+                        if product_edits:
+                            edits.extend(product_edits)
+                            new_imgs[idx] = img_path
+        
+        if not edits:
+            return 0
+        
+        edits.sort(key=lambda edit: (edit[0], edit[1]))
+        self.save(edits)
+        
+        self.products = shift_products(self.products, edits)
+        for idx, img_path in new_imgs.items():
+            self.products[idx] = self.products[idx]._replace(img=img_path)
+        return len(new_imgs)
+
+def watch(html_file, image_dir='.', debounce=0.3, force_polling=False, with_placeholders=True):
+    """常驻监视图片文件夹、映射文件和HTML文件，增量同步"""
+    sync = ImageSync(html_file, image_dir, with_placeholders)
+    updated_count = sync.full_sync()
+    print(f"初始同步完成，更新 {updated_count} 个产品的图片路径")
+    
+    html_path = os.path.abspath(html_file)
+    image_path = os.path.abspath(image_dir)
+    mapping_path = os.path.join(image_path, MAPPING_FILE)
+    watcher = Watcher([image_path, html_path], debounce=debounce, force_polling=force_polling)
+    print(f"正在监视 {image_path} 和 {html_path}（{watcher.kind}），按 Ctrl+C 退出")
+    
+    try:
+        for changed in watcher.batches():
+            started = time.perf_counter()
+            updated_count = 0
+            if html_path in changed and sync.html_changed_externally():
+                print("检测到HTML文件变化，重新解析")
+                sync.reload_html()
+                updated_count += sync.full_sync()
+            if mapping_path in changed:
+                print("检测到映射文件变化，重新加载")
+                sync.reload_mapping()
+                updated_count += sync.full_sync()
+            if image_path in changed:
+                # 事件队列溢出，重新扫描整个文件夹
+                sync.found_images = scan_image_files(image_dir)
+                updated_count += sync.full_sync()
+            images = [os.path.basename(p) for p in changed
+                      if os.path.dirname(p) == image_path and os.path.splitext(p)[1] in IMAGE_EXTENSIONS]
+            if images:
+                updated_count += sync.apply_image_changes(images)
+            if not updated_count:
+                continue
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"处理 {len(changed)} 个变化，更新 {updated_count} 个产品（{elapsed:.1f} ms）")
+    except KeyboardInterrupt:
+        print("\n已停止监视")
+    finally:
+        watcher.close()
+
 def main():
+    parser = argparse.ArgumentParser(description='检测product-images-home中的图片并更新index.html')
+    parser.add_argument('--watch', action='store_true', help='常驻监视文件变化并增量更新')
+    parser.add_argument('--poll', action='store_true', help='监视模式下使用轮询代替inotify')
+    parser.add_argument('--debounce', type=float, default=0.3, help='合并连续事件的等待秒数（默认0.3）')
+    parser.add_argument('--no-placeholders', action='store_true', help='不写入占位属性（bg 主色，bh BlurHash）')
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start('auto-update-html-images', args)
+    
     html_file = '../index.html'
     
     if not os.path.exists(html_file):
         print(f"错误: 找不到HTML文件 {html_file}")
         return
     
+    if args.watch:
+        watch(html_file, '.', args.debounce, args.poll, not args.no_placeholders)
+        return
+    
     print("正在加载图片映射信息...")
     image_mapping = load_image_mapping()
     print(f"加载了 {len(image_mapping)} 个产品的映射信息")
     
     print("\n正在扫描图片文件...")
-    found_images = scan_image_files()
+    with metrics.stage('scan'):
+        found_images = scan_image_files()
+    metrics.count('files_scanned', len(found_images))
     print(f"找到 {len(found_images)} 个图片文件")
     
     if found_images:
@@ -156,7 +361,7 @@ def main():
             print(f"  ... 还有 {len(found_images) - 10} 个文件")
     
     print("\n正在更新HTML文件...")
-    updated_count = update_html_file(html_file, image_mapping, found_images)
+    updated_count = update_html_file(html_file, image_mapping, found_images, not args.no_placeholders)
     
     print(f"\n完成！")
     if updated_count > 0:
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+产品数据/图片工具的性能基准测试
+按指定规模（默认1千、1万、10万个产品，可到100万）生成合成的index.html（SD/PD）和图片文件夹，
+分别测量各阶段的耗时和内存峰值：
+  extract  从HTML提取产品（generate-home-image-mapping.extract_products_from_html）
+  mapping  生成图片映射并写出JSON（build_mapping）
+  rewrite  注入图片路径并流式写回HTML（auto-update-html-images.product_edits + catalog.write_edits）
+  audit    检查图片文件头（check-images.check_images）
+每个阶段在独立子进程中运行；结果追加到历史记录JSON，
+与本机最近几次的中位数相比变慢（或内存增长）超过阈值时以非零状态退出。
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import catalog
+from imageutil import IMAGE_FOLDERS, ROOT_DIR
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(ROOT_DIR, '.benchmark-data')
+HISTORY_FILE = os.path.join(ROOT_DIR, '.benchmark-history.json')
+
+STAGES = ['extract', 'mapping', 'rewrite', 'audit']
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# 与历史中位数比较时参与计算的最近记录数，以及低于该值的差异视为噪声
+BASELINE_RUNS = 5
+MIN_SECONDS_DELTA = 0.02
+MIN_MEMORY_DELTA_MB = 1.0
+
+CATEGORIES = ['ph', 'sp', 'fa', 'li', 'di', 'be', 'ho', 'ba', 'sn', 'dr', 'fr', 'pe',
+              'bo', 'ga', 'mu', 'ca', 'tr', 'he', 'je', 'of', 'gr', 'art', 'tool', 'sh2']
+BRANDS = ['Apple', 'Nike', 'Adidas', 'Sony', '华为', '小米', 'Dyson', 'LEGO', '李宁', '安踏',
+          'Canon', 'Nintendo', '361', 'Aesop', 'Alessi', '52TOYS', '飞利浦', 'Zara', 'Uniqlo', 'ECCO']
+WORDS = ['Air', 'Pro', 'Max', 'Ultra', 'Lite', '经典', '限量', '旗舰', '智能', '便携',
+         'Mini', 'Plus', '运动', '家用', 'Elite', 'Series']
+ICONS = ['📱', '👟', '🎧', '💻', '🧸', '🍵', '🎮', '📷']
+
+# 最小的渐进式JPEG文件头：SOI、APP0(JFIF)、SOF2、EOI；只用于文件头检查
+_JFIF = b'\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x48\x00\x48\x00\x00'
+
+
+def _jpeg_stub(width, height):
+    sof = b'\xff\xc2\x00\x11\x08' + height.to_bytes(2, 'big') + width.to_bytes(2, 'big') \
+        + b'\x03\x01\x22\x00\x02\x11\x01\x03\x11\x01'
+    return b'\xff\xd8' + _JFIF + sof + b'\xff\xd9'
+
+
+def load_script(filename):
+    """按文件路径导入带连字符的脚本"""
+    name = os.path.splitext(filename)[0].replace('-', '_')
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPT_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _js_string(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+def generate_dataset(size, max_images):
+    """生成（或复用）指定规模的合成数据，返回数据目录"""
+    workdir = os.path.join(DATA_DIR, str(size))
+    marker = os.path.join(workdir, '.complete')
+    if os.path.exists(marker):
+        return workdir
+
+    print(f"正在生成 {size} 个产品的合成数据...")
+    rng = random.Random(size)
+    os.makedirs(workdir, exist_ok=True)
+    html_file = os.path.join(workdir, 'index.html')
+
+    products = []
+    with open(html_file, 'w', encoding='utf-8') as f:
+        f.write('<!DOCTYPE html>\n<html><head><meta charset="UTF-8"></head><body>\n<script>\n')
+        f.write('            const PD = [\n')
+        for i in range(max(1, size // 10)):
+            f.write(f"                {{ id: {i + 1}, n: {_js_string(f'积分商品{i}')}, "
+                    f"p: {rng.randint(100, 90000)}, i: {_js_string(rng.choice(ICONS))} }},\n")
+        f.write('            ];\n            const SD = {\n')
+        per_category = -(-size // len(CATEGORIES))
+        remaining = size
+        for category in CATEGORIES:
+            count = min(per_category, remaining)
+            remaining -= count
+            f.write(f"                {category}: [\n")
+            for _ in range(count):
+                brand = rng.choice(BRANDS)
+                name = f"{rng.choice(WORDS)} {rng.choice(WORDS)} {len(products)}"
+                product = {'category': category, 'brand': brand, 'name': name, 'price': rng.randint(10, 99999),
+                           'tag': rng.choice(['热卖', '新品', '']), 'icon': rng.choice(ICONS), 'existing_img': ''}
+                products.append(product)
+                f.write(f"                    {{ b: {_js_string(brand)}, n: {_js_string(name)}, "
+                        f"p: {product['price']}, t: {_js_string(product['tag'])}, i: {_js_string(product['icon'])} }},\n")
+            f.write('                ],\n')
+        f.write('            };\n</script>\n</body></html>\n')
+
+    mapping = load_script('generate-home-image-mapping.py').build_mapping(products)
+    with open(os.path.join(workdir, 'product-images-info.json'), 'w', encoding='utf-8') as f:
+        json.dump(mapping, f, ensure_ascii=False)
+
+    # 首页文件夹约80%的产品有图片，商城和积分文件夹各取其中十分之一；约5%尺寸错误
+    filenames = [item['filename'] for item in mapping if rng.random() < 0.8][:max_images]
+    for page_type, (folder, width, height) in IMAGE_FOLDERS.items():
+        folder_dir = os.path.join(workdir, folder)
+        os.makedirs(folder_dir, exist_ok=True)
+        names = filenames if page_type == 'home' else filenames[::10]
+        good, bad = _jpeg_stub(width, height), _jpeg_stub(width, height + 1)
+        for filename in names:
+            with open(os.path.join(folder_dir, filename), 'wb') as f:
+                f.write(bad if rng.random() < 0.05 else good)
+
+    open(marker, 'w').close()
+    return workdir
+
+
+def _stage_extract(workdir):
+    module = load_script('generate-home-image-mapping.py')
+    html_file = os.path.join(workdir, 'index.html')
+    return lambda: len(module.extract_products_from_html(html_file))
+
+
+def _stage_mapping(workdir):
+    module = load_script('generate-home-image-mapping.py')
+    products = module.extract_products_from_html(os.path.join(workdir, 'index.html'))
+    output = os.path.join(workdir, 'mapping-output.json')
+
+    def run():
+        mapping = module.build_mapping(products)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(mapping, f, ensure_ascii=False, indent=2)
+        return len(mapping)
+    return run
+
+
+def _stage_rewrite(workdir):
+    module = load_script('auto-update-html-images.py')
+    html_file = os.path.join(workdir, 'index.html')
+    with open(os.path.join(workdir, 'product-images-info.json'), 'r', encoding='utf-8') as f:
+        mapping = json.load(f)
+    output = os.path.join(workdir, 'rewrite-output.html')
+
+    def run():
+        found = module.scan_image_files(os.path.join(workdir, IMAGE_FOLDERS['home'][0]))
+        image_index = module.build_image_index(mapping, found)
+        with catalog.map_html(html_file) as content:
+            edits, updated_count = module.product_edits(content, image_index)
+        catalog.write_edits(html_file, edits, output)
+        return updated_count
+    return run
+
+
+def _stage_audit(workdir):
+    module = load_script('check-images.py')
+    info_file = os.path.join(workdir, 'product-images-info.json')
+    return lambda: module.check_images(root_dir=workdir, info_file=info_file)['summary']['files']
+
+
+STAGE_FACTORIES = {
+    'extract': _stage_extract,
+    'mapping': _stage_mapping,
+    'rewrite': _stage_rewrite,
+    'audit': _stage_audit,
+}
+
+
+def run_stage(stage, workdir, repeat):
+    """子进程：运行一个阶段，输出JSON结果"""
+    run = STAGE_FACTORIES[stage](workdir)
+    times = []
+    items = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        items = run()
+        times.append(time.perf_counter() - started)
+
+    # 单独运行一次统计Python分配的内存峰值（tracemalloc会拖慢速度，不计入耗时）
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    json.dump({
+        'seconds': round(min(times), 4),
+        'peak_mb': round(peak / 1024 / 1024, 2),
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'items': items,
+    }, sys.stdout)
+
+
+def measure(stage, workdir, repeat):
+    # 禁用解析缓存，测量的是实际解析和扫描的耗时
+    env = dict(os.environ, PARSE_CACHE='0')
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-stage', stage,
+                             '--workdir', workdir, '--repeat', str(repeat)],
+                            cwd=SCRIPT_DIR, capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(f"{stage} 阶段失败:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def load_history(history_file):
+    if os.path.exists(history_file):
+        with open(history_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return []
+
+
+def save_history(history_file, history):
+    tmp_file = history_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(history, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, history_file)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def find_regressions(history, host, results, tolerance):
+    """与本机最近BASELINE_RUNS次未回退记录的中位数比较，返回回退列表"""
+    previous = [run for run in history if run['host'] == host and not run.get('regressions')]
+    regressions = []
+    for stage, by_size in results.items():
+        for size, result in by_size.items():
+            past = [run['results'][stage][size] for run in previous
+                    if size in run['results'].get(stage, {})][-BASELINE_RUNS:]
+            if not past:
+                continue
+            for metric, floor in (('seconds', MIN_SECONDS_DELTA), ('peak_mb', MIN_MEMORY_DELTA_MB)):
+                baseline = statistics.median(p[metric] for p in past)
+                value = result[metric]
+                if value > baseline * (1 + tolerance) and value - baseline > floor:
+                    regressions.append({'stage': stage, 'size': int(size), 'metric': metric,
+                                        'baseline': baseline, 'value': value})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='产品数据/图片工具的性能基准测试')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='产品数量，逗号分隔（默认 1000,10000,100000；可加 1000000）')
+    parser.add_argument('--stages', default=','.join(STAGES), help=f"要运行的阶段（默认 {','.join(STAGES)}）")
+    parser.add_argument('--repeat', type=int, default=3, help='每个阶段重复次数，取最快一次（默认3）')
+    parser.add_argument('--max-images', type=int, default=100000, help='每个规模最多生成的图片数（默认100000）')
+    parser.add_argument('--history', default=HISTORY_FILE, help='历史记录JSON文件')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='允许的变慢/内存增长比例（默认0.25）')
+    parser.add_argument('--no-record', action='store_true', help='只比较，不写入历史记录')
+    parser.add_argument('--run-stage', choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage:
+        run_stage(args.run_stage, args.workdir, args.repeat)
+        return
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    stages = [s for s in args.stages.split(',') if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"未知阶段: {', '.join(sorted(unknown))}")
+
+    results = {stage: {} for stage in stages}
+    for size in sizes:
+        workdir = generate_dataset(size, args.max_images)
+        for stage in stages:
+            # 大规模数据只运行一次
+            repeat = args.repeat if size <= 100000 else 1
+            result = measure(stage, workdir, repeat)
+            results[stage][str(size)] = result
+            print(f"  {stage:<8} {size:>8} 个产品  {result['seconds']:>8.3f} 秒  "
+                  f"峰值 {result['peak_mb']:>8.1f} MB  RSS {result['max_rss_mb']:>8.1f} MB")
+
+    host = f"{platform.node()}/{platform.python_implementation()}-{platform.python_version()}"
+    history = load_history(args.history)
+    regressions = find_regressions(history, host, results, args.tolerance)
+
+    if not args.no_record:
+        history.append({
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'revision': git_revision(),
+            'host': host,
+            'results': results,
+            'regressions': regressions,
+        })
+        save_history(args.history, history)
+        print(f"\n已写入历史记录: {args.history}")
+
+    if regressions:
+        print(f"\n发现 {len(regressions)} 项性能回退（阈值 {args.tolerance:.0%}）：")
+        for r in regressions:
+            print(f"  {r['stage']} {r['size']} 个产品 {r['metric']}: {r['baseline']} -> {r['value']}")
+        sys.exit(1)
+    print("\n未发现性能回退")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+把index.html中内联的SD/PD产品数据拆分为按分类的JSON分片
+输出到 ../dist：
+  dist/index.html                   只保留一个很小的加载器，先加载商城显示的分类，再并行加载其余分类
+  dist/data/sd-<分类>.<哈希>.json    每个分类一个分片（另有 .gz/.br 预压缩副本）
+  dist/data/pd.<哈希>.json           积分商品
+其余静态资源（图片文件夹、manifest.json、sw.js、图标等）以符号链接放入dist，
+源文件 index.html 保持不变，仍是其他脚本读取产品数据的来源。
+build-frontend.py 会先执行同样的拆分，再压缩脚本和样式；两者只需运行其一。
+"""
+
+import argparse
+import glob
+import json
+import os
+
+import catalog
+import metrics
+from assets import brotli, hashed_name, write_precompressed
+from imageutil import ROOT_DIR
+
+DIST_DIR = os.path.join(ROOT_DIR, 'dist')
+DATA_DIR_NAME = 'data'
+
+# 链接到dist中的静态资源（相对ROOT_DIR的glob模式）
+PUBLIC_ASSETS = [
+    'manifest.json', 'sw.js', 'image-manifest.json', 'search-index', '*.png', '*.svg',
+    'product-images-home', 'product-images-shop', 'product-images-points', 'hero-featured-images',
+]
+
+LOADER_TEMPLATE = '''const SD = {{}};
+            // 产品数据按分类分片加载（由 product-images-home/build-catalog-shards.py 生成）
+            const CATALOG_SHARDS = {shards};
+            (function loadCatalogShards() {{
+                // 先按原顺序占好分类（空数组），分片到达的先后不影响SD的分类顺序（搜索索引按顺序校验）
+                Object.keys(CATALOG_SHARDS.sd).forEach(function(k) {{ SD[k] = []; }});
+                const fetchShard = (url) => fetch(url).then(function(r) {{
+                    if (!r.ok) throw new Error('加载产品数据失败: ' + url);
+                    return r.json();
+                }});
+                const loadSD = (keys) => Promise.all(keys.map(function(k) {{
+                    return fetchShard(CATALOG_SHARDS.sd[k]).then(function(items) {{ SD[k] = items; searchIndex.catalogHash = null; }});
+                }}));
+                const renderSD = function() {{
+                    window.dispatchEvent(new CustomEvent('productsUpdated', {{ detail: {{}} }}));
+                }};
+                // 全部分片到达后才合并卖家数据：loadSellerProducts 会先把当前SD保存为原始数据（供卖家版本使用），
+                // 提前调用会保存不完整或已混入卖家数据的SD（init() 在分片加载时跳过这两步）
+                // 先加载商城显示的分类：已渲染时取 .cat-btn.active，否则为 init() 中 renderShop 的默认分类；
+                // 首页按全部分类混排，其余分类到达后随 productsUpdated 整体刷新
+                const activeBtn = document.querySelector('.cat-btn.active');
+                const activeMatch = activeBtn && (activeBtn.getAttribute('onclick') || '').match(/'([^']+)'/);
+                const visible = activeMatch ? activeMatch[1] : 'ph';
+                const keys = Object.keys(CATALOG_SHARDS.sd);
+                const first = CATALOG_SHARDS.sd[visible] ? [visible] : keys.slice(0, 1);
+                loadSD(first).then(renderSD)
+                    .then(function() {{ return loadSD(keys.filter(function(k) {{ return first.indexOf(k) < 0; }})); }})
+                    .then(function() {{ loadSellerProducts(); renderSD(); }})
+                    .catch(function(e) {{ console.warn('catalog', e); }});
+                fetchShard(CATALOG_SHARDS.pd).then(function(items) {{
+                    PD.length = 0;
+                    Array.prototype.push.apply(PD, items);
+                    if (document.getElementById('pts-items')) renderPts();
+                }}).catch(function(e) {{ console.warn('catalog', e); }});
+            }})();'''
+
+
+SHARDS_MARKER = b'__CATALOG_SHARDS__'
+
+
+def encode_json(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def write_shard(data_dir, filename, value):
+    """写入一个内容哈希命名的分片，返回 (相对URL, 写入的文件列表)"""
+    data = encode_json(value)
+    name = hashed_name(filename, data)
+    written = write_precompressed(os.path.join(data_dir, name), data)
+    return f"{DATA_DIR_NAME}/{name}", written
+
+
+def build_shell(content, decls):
+    """生成加载器版本的index.html（bytes）：PD替换为空数组，SD替换为加载器
+    分片地址在写出分片后才确定，先以 SHARDS_MARKER 占位"""
+    pd, sd = decls['PD'], decls['SD']
+    loader = LOADER_TEMPLATE.format(shards=SHARDS_MARKER.decode()).encode('utf-8')
+    edits = [(pd.value_start, pd.value_end, b'[]'), (sd.start, sd.end, loader)]
+    edits.sort()
+    return catalog.apply_edits(content, edits)
+
+
+def link_public_assets(dist_dir):
+    """把静态资源以相对符号链接放入dist"""
+    linked = 0
+    for pattern in PUBLIC_ASSETS:
+        for source in glob.glob(os.path.join(ROOT_DIR, pattern)):
+            target = os.path.join(dist_dir, os.path.basename(source))
+            if os.path.lexists(target):
+                if os.path.islink(target):
+                    os.remove(target)
+                else:
+                    continue
+            os.symlink(os.path.relpath(source, dist_dir), target)
+            linked += 1
+    return linked
+
+
+def write_catalog_shards(html_file, dist_dir):
+    """写出分片并删除旧版本，返回 (加载器版本的HTML bytes, 原HTML大小, 分片地址, 删除的旧文件数)
+    未找到SD/PD时返回None"""
+    with catalog.map_html(html_file) as content:
+        with metrics.stage('parse_catalog'):
+            decls = {decl.name: decl for decl in catalog.iter_declarations(content)}
+        if 'SD' not in decls or 'PD' not in decls:
+            return None
+        shell, original_size = build_shell(content, decls), len(content)
+
+    data_dir = os.path.join(dist_dir, DATA_DIR_NAME)
+    os.makedirs(data_dir, exist_ok=True)
+
+    print("正在生成产品数据分片...")
+    written = []
+    shards = {'sd': {}, 'pd': ''}
+    for category, items in decls['SD'].value.items():
+        url, files = write_shard(data_dir, f"sd-{category}.json", items)
+        shards['sd'][category] = url
+        written.extend(files)
+        print(f"  {category}: {len(items)} 个产品 -> {url}")
+    shards['pd'], files = write_shard(data_dir, 'pd.json', decls['PD'].value)
+    written.extend(files)
+    print(f"  积分商品: {len(decls['PD'].value)} 个 -> {shards['pd']}")
+
+    # 删除旧版本分片
+    keep = {os.path.abspath(p) for p in written}
+    removed = 0
+    for path in glob.glob(os.path.join(data_dir, '*')):
+        if os.path.abspath(path) not in keep:
+            os.remove(path)
+            removed += 1
+
+    return shell.replace(SHARDS_MARKER, encode_json(shards)), original_size, shards, removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='把SD/PD产品数据拆分为按分类的JSON分片并生成加载器')
+    parser.add_argument('--html', default=catalog.HTML_FILE, help='源HTML文件（默认 ../index.html）')
+    parser.add_argument('--dist', default=DIST_DIR, help='输出目录（默认 ../dist）')
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start('build-catalog-shards', args)
+
+    result = write_catalog_shards(args.html, args.dist)
+    if result is None:
+        print("错误: 未找到SD/PD产品数据")
+        return
+    shell, original_size, shards, removed = result
+    with metrics.stage('write_shell'):
+        write_precompressed(os.path.join(args.dist, 'index.html'), shell)
+
+    linked = link_public_assets(args.dist)
+
+    print(f"\n已生成: {os.path.join(args.dist, 'index.html')}")
+    print(f"HTML大小: {original_size / 1024:.0f} KB -> {len(shell) / 1024:.0f} KB")
+    print(f"共 {len(shards['sd'])} 个分类分片，删除 {removed} 个旧文件，链接 {linked} 个静态资源")
+    if brotli is None:
+        print("提示: 未安装brotli，只生成了 .gz 副本（pip3 install brotli）")
+
+
+if __name__ == '__main__':
+    main()
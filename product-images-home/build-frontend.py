@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+前端构建：压缩脚本和样式、内容哈希文件名、关键CSS内联，输出到 ../dist
+  1. 与 build-catalog-shards.py 相同，先把SD/PD产品数据拆分为JSON分片（--no-shards 跳过）
+  2. 压缩所有内联和本地外部的JS/CSS；HTML去掉注释和缩进（<pre>/<textarea>原样保留）
+  3. 最大的内联脚本写成 app.<哈希>.js，最大的内联样式写成 styles.<哈希>.css，
+     页面中只内联首屏可见元素（初始显示的页面和页面之外的公共部分）用到的规则，完整样式表异步加载
+  4. 本地引用的 *.js/*.css 同样改为带内容哈希的文件名并更新引用
+  5. 所有产物写出 .gz/.br 预压缩副本
+  6. 生成 dist/sw.js：urlsToCache 使用带哈希的文件名，CACHE_VERSION 随内容变化，旧缓存在激活时自动清除
+源文件（index.html、sw.js等）保持不变。
+"""
+
+import argparse
+import glob
+import gzip
+import importlib.util
+import json
+import os
+import re
+from html.parser import HTMLParser
+
+import metrics
+from assets import brotli, content_hash, hashed_name, minify_css, minify_js, write_precompressed
+from imageutil import ROOT_DIR
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DIST_DIR = os.path.join(ROOT_DIR, 'dist')
+SW_FILE = os.path.join(ROOT_DIR, 'sw.js')
+
+# 内联脚本/样式外置后的文件名（哈希插在扩展名前）
+APP_SCRIPT = 'app.js'
+APP_STYLES = 'styles.css'
+
+# 除了HTML中带 active 的页面外，首屏也可能直接显示的页面
+CRITICAL_PAGES = ['page-home']
+
+_RAW_ELEMENT = re.compile(r'<(script|style|pre|textarea)\b([^>]*)>(.*?)</\1\s*>', re.S | re.I)
+_ATTR = re.compile(r'''([\w:-]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?''')
+_STYLESHEET_LINK = re.compile(r'''<link\b[^>]*\brel=["']?stylesheet["']?[^>]*>''', re.I)
+_HREF = re.compile(r'''\bhref=(["'])([^"']+)\1''', re.I)
+_HTML_COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.S)
+_JS_TYPES = ('', 'text/javascript', 'application/javascript', 'module')
+_HASHED = re.compile(r'\.[0-9a-f]{10}\.(?:js|css)(?:\.gz|\.br)?$')
+_VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param',
+                  'source', 'track', 'wbr'}
+
+
+def load_module(filename):
+    spec = importlib.util.spec_from_file_location(filename[:-3].replace('-', '_'),
+                                                  os.path.join(SCRIPT_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def parse_attrs(attrs):
+    return {m.group(1).lower(): next((g for g in m.groups()[1:] if g is not None), '')
+            for m in _ATTR.finditer(attrs)}
+
+
+def is_local(url):
+    return bool(url) and not re.match(r'^(?:[a-z][\w+.-]*:|//|#)', url, re.I)
+
+
+def minify_markup(html):
+    """删除HTML注释和行首缩进（只用于 script/style/pre/textarea 之外的部分）"""
+    html = _HTML_COMMENT.sub('', html)
+    html = re.sub(r'\n[ \t]+', '\n', html)
+    return re.sub(r'\n{2,}', '\n', html)
+
+
+class _MarkupCollector(HTMLParser):
+    """收集首屏可见部分用到的标签、class和id；跳过未显示的 .page 页面"""
+
+    def __init__(self, critical_pages):
+        super().__init__(convert_charrefs=True)
+        self.critical_pages = set(critical_pages)
+        self.tags = {'html', 'head', 'body'}
+        self.classes = set()
+        self.ids = set()
+        self.depth = 0
+        self.skip_depth = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get('class') or '').split()
+        void = tag in _VOID_ELEMENTS
+        if self.skip_depth is None and 'page' in classes and 'active' not in classes \
+                and attrs.get('id') not in self.critical_pages:
+            self.skip_depth = self.depth
+        if self.skip_depth is None:
+            self.tags.add(tag)
+            self.classes.update(classes)
+            if attrs.get('id'):
+                self.ids.add(attrs['id'])
+        if not void:
+            self.depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        if self.skip_depth is None:
+            self.handle_starttag(tag, attrs)
+            if tag not in _VOID_ELEMENTS:
+                self.depth -= 1
+
+    def handle_endtag(self, tag):
+        if tag in _VOID_ELEMENTS:
+            return
+        self.depth -= 1
+        if self.skip_depth is not None and self.depth <= self.skip_depth:
+            self.skip_depth = None
+
+
+def selector_is_critical(selector, collector):
+    """选择器中的每个标签、class、id都出现在首屏元素中（忽略伪类和属性选择器）"""
+    selector = re.sub(r'::?[\w-]+(?:\([^()]*(?:\([^()]*\)[^()]*)*\))?', '', selector)
+    selector = re.sub(r'\[[^\]]*\]', '', selector)
+    for compound in re.split(r'[\s>+~]+', selector.strip()):
+        if not compound or compound == '*':
+            continue
+        tag = re.match(r'[a-zA-Z][\w-]*', compound)
+        if tag and tag.group(0).lower() not in collector.tags:
+            return False
+        if any(name not in collector.classes for name in re.findall(r'\.([\w-]+)', compound)):
+            return False
+        if any(name not in collector.ids for name in re.findall(r'#([\w-]+)', compound)):
+            return False
+    return True
+
+
+def _split_top_level(text, sep):
+    """按不在括号和引号中的分隔符切分"""
+    parts, depth, quote, start = [], 0, None, 0
+    for i, ch in enumerate(text):
+        if quote:
+            if ch == quote and text[i - 1] != '\\':
+                quote = None
+        elif ch in '"\'':
+            quote = ch
+        elif ch in '([':
+            depth += 1
+        elif ch in ')]':
+            depth -= 1
+        elif ch == sep and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def css_rules(css):
+    """把压缩后的CSS切分为顶层规则 [(前导, 块内容或None)]"""
+    rules = []
+    pos, n = 0, len(css)
+    while pos < n:
+        i, quote, depth = pos, None, 0
+        while i < n:
+            ch = css[i]
+            if quote:
+                if ch == quote and css[i - 1] != '\\':
+                    quote = None
+            elif ch in '"\'':
+                quote = ch
+            elif ch == '(':
+                depth += 1
+            elif ch == ')':
+                depth -= 1
+            elif depth == 0 and ch in '{;':
+                break
+            i += 1
+        prelude = css[pos:i].strip()
+        if i >= n or css[i] == ';':
+            if prelude:
+                rules.append((prelude, None))
+            pos = i + 1
+            continue
+        j, level, quote = i + 1, 1, None
+        while j < n and level:
+            ch = css[j]
+            if quote:
+                if ch == quote and css[j - 1] != '\\':
+                    quote = None
+            elif ch in '"\'':
+                quote = ch
+            elif ch == '{':
+                level += 1
+            elif ch == '}':
+                level -= 1
+            j += 1
+        rules.append((prelude, css[i + 1:j - 1]))
+        pos = j
+    return rules
+
+
+def critical_css(css, collector):
+    """只保留首屏元素用到的规则（连同所在的@media等条件块、@font-face和用到的@keyframes）"""
+    keyframes = {}
+    out = []
+    for prelude, block in css_rules(css):
+        lower = prelude.lower()
+        if block is None:
+            if lower.startswith('@import'):
+                out.append(prelude + ';')
+        elif lower.startswith(('@media', '@supports', '@layer', '@container')):
+            inner = critical_css(block, collector)
+            if inner:
+                out.append(f'{prelude}{{{inner}}}')
+        elif lower.startswith('@font-face'):
+            out.append(f'{prelude}{{{block}}}')
+        elif re.match(r'@(?:-[\w]+-)?keyframes', lower):
+            keyframes[prelude.split(None, 1)[-1].strip()] = f'{prelude}{{{block}}}'
+        elif lower.startswith('@'):
+            continue
+        elif any(selector_is_critical(sel, collector) for sel in _split_top_level(prelude, ',')):
+            out.append(f'{prelude}{{{block}}}')
+    result = ''.join(out)
+    used = [rule for name, rule in keyframes.items() if re.search(rf'(?<![\w-]){re.escape(name)}(?![\w-])', result)]
+    return result + ''.join(used)
+
+
+def write_asset(dist_dir, filename, data, written):
+    """写出内容哈希命名的资源及其压缩副本，返回文件名"""
+    name = hashed_name(filename, data)
+    path = os.path.join(dist_dir, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written.extend(write_precompressed(path, data))
+    return name.replace(os.sep, '/')
+
+
+def build_html(html, dist_dir, critical_pages, written):
+    """处理HTML中的脚本、样式和本地资源引用，返回 (新HTML, 带哈希的资源文件名列表, 大小统计)"""
+    raw = list(_RAW_ELEMENT.finditer(html))
+    inline = [m for m in raw if m.group(1).lower() in ('script', 'style') and 'src' not in parse_attrs(m.group(2))]
+    main_script = max((m for m in inline if m.group(1).lower() == 'script'
+                       and parse_attrs(m.group(2)).get('type', '').lower() in _JS_TYPES),
+                      key=lambda m: len(m.group(3)), default=None)
+    main_style = max((m for m in inline if m.group(1).lower() == 'style'),
+                     key=lambda m: len(m.group(3)), default=None)
+
+    collector = _MarkupCollector(critical_pages)
+    collector.feed(html)
+    collector.close()
+
+    assets = []
+    stats = {'js': [0, 0], 'css': [0, 0], 'critical_css': 0}
+
+    def local_asset(url, minify, kind):
+        path = os.path.join(ROOT_DIR, url.split('?')[0].split('#')[0])
+        if not is_local(url) or not os.path.isfile(path):
+            return url
+        with open(path, 'r', encoding='utf-8') as f:
+            source = f.read()
+        data = minify(source).encode('utf-8')
+        stats[kind][0] += len(source.encode('utf-8'))
+        stats[kind][1] += len(data)
+        name = write_asset(dist_dir, url.split('?')[0].split('#')[0], data, written)
+        assets.append(name)
+        return name
+
+    def markup(text):
+        text = _STYLESHEET_LINK.sub(
+            lambda m: _HREF.sub(lambda h: f'href={h.group(1)}{local_asset(h.group(2), minify_css, "css")}'
+                                f'{h.group(1)}', m.group(0)), text)
+        return minify_markup(text)
+
+    out = []
+    pos = 0
+    for match in raw:
+        out.append(markup(html[pos:match.start()]))
+        pos = match.end()
+        tag, attrs, body = match.group(1).lower(), match.group(2), match.group(3)
+        parsed = parse_attrs(attrs)
+        if tag in ('pre', 'textarea'):
+            out.append(match.group(0))
+        elif tag == 'script' and 'src' in parsed:
+            src = parsed['src']
+            name = local_asset(src, minify_js, 'js')
+            out.append(match.group(0).replace(src, name, 1) if name != src else match.group(0))
+        elif tag == 'script' and parsed.get('type', '').lower() not in _JS_TYPES:
+            out.append(match.group(0))
+        elif tag == 'script':
+            code = minify_js(body)
+            stats['js'][0] += len(body.encode('utf-8'))
+            stats['js'][1] += len(code.encode('utf-8'))
+            if match is main_script:
+                name = write_asset(dist_dir, APP_SCRIPT, code.encode('utf-8'), written)
+                assets.append(name)
+                out.append(f'<script{attrs} src="{name}"></script>')
+            else:
+                out.append(f'<script{attrs}>{code}</script>')
+        else:
+            css = minify_css(body)
+            stats['css'][0] += len(body.encode('utf-8'))
+            stats['css'][1] += len(css.encode('utf-8'))
+            if match is main_style:
+                name = write_asset(dist_dir, APP_STYLES, css.encode('utf-8'), written)
+                assets.append(name)
+                critical = critical_css(css, collector)
+                stats['critical_css'] = len(critical.encode('utf-8'))
+                out.append(f'<style{attrs}>{critical}</style>\n'
+                           f'<link rel="preload" href="{name}" as="style" '
+                           f'onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+                           f'<noscript><link rel="stylesheet" href="{name}"></noscript>')
+            else:
+                out.append(f'<style{attrs}>{css}</style>')
+    out.append(markup(html[pos:]))
+    return ''.join(out).strip() + '\n', assets, stats
+
+
+def build_service_worker(precache, version):
+    """生成dist中的sw.js：保留原 urlsToCache 中的外部地址，本地资源改为本次构建的文件名"""
+    with open(SW_FILE, 'r', encoding='utf-8') as f:
+        source = f.read()
+    match = re.search(r'const urlsToCache = \[(.*?)\];', source, re.S)
+    if not match:
+        return minify_js(source)
+    listed = re.findall(r'''['"]([^'"]+)['"]''', match.group(1))
+    local = [url for url in listed if not re.match(r'^https?://', url)]
+    external = [url for url in listed if re.match(r'^https?://', url)]
+    urls = list(dict.fromkeys(local + [f'./{name}' for name in precache])) + external
+    text = (source[:match.start()] + 'const urlsToCache = ' + json.dumps(urls, ensure_ascii=False, indent=2)
+            + ';' + source[match.end():])
+    text = re.sub(r"(const CACHE_VERSION = ')([^']*?)(?:-[0-9a-f]{10})?(';)", rf"\g<1>\g<2>-{version}\g<3>", text,
+                  count=1)
+    return minify_js(text)
+
+
+def remove_stale(dist_dir, written):
+    """删除之前构建留下的、本次未生成的带哈希脚本和样式"""
+    keep = {os.path.abspath(path) for path in written}
+    removed = 0
+    for path in glob.glob(os.path.join(dist_dir, '*')):
+        if _HASHED.search(path) and os.path.abspath(path) not in keep and not os.path.islink(path):
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def _kb(size):
+    return f"{size / 1024:.0f} KB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='压缩JS/CSS、内容哈希文件名、内联关键CSS并生成sw.js，输出到dist')
+    parser.add_argument('--html', default=os.path.join(ROOT_DIR, 'index.html'), help='源HTML文件（默认 ../index.html）')
+    parser.add_argument('--dist', default=DIST_DIR, help='输出目录（默认 ../dist）')
+    parser.add_argument('--no-shards', action='store_true', help='不拆分产品数据（产品数据留在app.js中）')
+    parser.add_argument('--critical-pages', default=','.join(CRITICAL_PAGES),
+                        help=f"除带active的页面外，关键CSS还要覆盖的页面id，逗号分隔（默认 {','.join(CRITICAL_PAGES)}）")
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start('build-frontend', args)
+
+    shards_module = load_module('build-catalog-shards.py')
+    os.makedirs(args.dist, exist_ok=True)
+    shard_urls = []
+    if args.no_shards:
+        with open(args.html, 'rb') as f:
+            source = f.read()
+        original_size = len(source)
+    else:
+        result = shards_module.write_catalog_shards(args.html, args.dist)
+        if result is None:
+            print("错误: 未找到SD/PD产品数据")
+            return
+        source, original_size, shards, _ = result
+        shard_urls = list(shards['sd'].values()) + [shards['pd']]
+    with open(args.html, 'rb') as f:
+        original_gzip = len(gzip.compress(f.read(), compresslevel=9, mtime=0))
+
+    written = []
+    with metrics.stage('minify'):
+        html, assets, stats = build_html(source.decode('utf-8'), args.dist,
+                                         [p for p in args.critical_pages.split(',') if p], written)
+    data = html.encode('utf-8')
+    index_path = os.path.join(args.dist, 'index.html')
+    with metrics.stage('write'):
+        write_precompressed(index_path, data)
+        precache = assets + shard_urls
+        version = content_hash(data + '\n'.join(precache).encode('utf-8'))
+        sw_path = os.path.join(args.dist, 'sw.js')
+        if os.path.islink(sw_path):
+            os.remove(sw_path)
+        write_precompressed(sw_path, build_service_worker(precache, version).encode('utf-8'))
+    removed = remove_stale(args.dist, written)
+    linked = shards_module.link_public_assets(args.dist)
+
+    def gz_size(name):
+        path = os.path.join(args.dist, name)
+        return os.path.getsize(path + '.gz') if os.path.exists(path + '.gz') else os.path.getsize(path)
+
+    startup = gz_size('index.html') + sum(gz_size(name) for name in assets if name.endswith('.js'))
+    print(f"\n已生成: {index_path}（缓存版本 {version}）")
+    for name in ['index.html'] + assets:
+        print(f"  {name:<28}{_kb(os.path.getsize(os.path.join(args.dist, name))):>9}  gzip {_kb(gz_size(name)):>7}")
+    print(f"HTML: {_kb(original_size)} -> {_kb(len(data))}")
+    print(f"JS: {_kb(stats['js'][0])} -> {_kb(stats['js'][1])}，CSS: {_kb(stats['css'][0])} -> {_kb(stats['css'][1])}"
+          f"（内联关键CSS {_kb(stats['critical_css'])}，其余异步加载）")
+    print(f"首屏阻塞传输（gzip）: {_kb(original_gzip)} -> {_kb(startup)}")
+    print(f"sw.js 预缓存 {len(precache)} 个带哈希的资源；删除 {removed} 个旧文件，链接 {linked} 个静态资源")
+    metrics.count('startup_bytes', startup)
+    if brotli is None:
+        print("提示: 未安装brotli，只生成了 .gz 副本（pip3 install brotli）")
+
+
+if __name__ == '__main__':
+    main()
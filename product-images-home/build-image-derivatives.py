@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+从产品主图批量生成三种尺寸的产品图片
+每个产品ID一张主图（product-images-master/<产品ID>.jpg），输出：
+  product-images-home/<产品ID>.jpg    600×252
+  product-images-shop/<产品ID>.jpg    600×472
+  product-images-points/<产品ID>.jpg  600×600
+以及对应的 .webp 版本。多进程并行，主图内容和参数均未变化的输出自动跳过。
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import metrics
+from imageutil import IMAGE_FOLDERS, ROOT_DIR, HashCache, folder_path, is_image
+
+MASTER_DIR = os.path.join(ROOT_DIR, 'product-images-master')
+STATE_FILE = '.derivatives-state.json'
+HASH_CACHE_FILE = '.hash-cache.json'
+
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+
+def output_settings(page_type, fmt):
+    """单个输出文件的生成参数（参与签名计算）"""
+    _, width, height = IMAGE_FOLDERS[page_type]
+    quality = JPEG_QUALITY if fmt == 'jpg' else WEBP_QUALITY
+    return {'w': width, 'h': height, 'fmt': fmt, 'q': quality, 'v': 1}
+
+
+def signature(source_hash, settings):
+    """主图哈希 + 生成参数 -> 输出签名"""
+    raw = source_hash + json.dumps(settings, sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def render_master(master_path, outputs):
+    """子进程：打开一次主图，生成该产品的全部输出文件"""
+    from PIL import Image, ImageOps
+
+    with Image.open(master_path) as src:
+        img = ImageOps.exif_transpose(src).convert('RGB')
+
+    written = []
+    for out_path, settings in outputs:
+        size = (settings['w'], settings['h'])
+        resized = ImageOps.fit(img, size, Image.LANCZOS, centering=(0.5, 0.5))
+        tmp_path = out_path + '.tmp'
+        if settings['fmt'] == 'jpg':
+            resized.save(tmp_path, 'JPEG', quality=settings['q'], optimize=True, progressive=True)
+        else:
+            resized.save(tmp_path, 'WEBP', quality=settings['q'], method=4)
+        os.replace(tmp_path, out_path)
+        written.append(out_path)
+    return written
+
+
+def load_state(master_dir):
+    state_file = os.path.join(master_dir, STATE_FILE)
+    if os.path.exists(state_file):
+        with open(state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(master_dir, state):
+    state_file = os.path.join(master_dir, STATE_FILE)
+    tmp_file = state_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=0, sort_keys=True)
+    os.replace(tmp_file, state_file)
+
+
+def plan_jobs(master_dir, page_types, formats, state, force=False):
+    """计算需要（重新）生成的输出，返回 {主图路径: [(输出路径, 参数), ...]} 和新签名"""
+    hash_cache = HashCache(os.path.join(master_dir, HASH_CACHE_FILE))
+    jobs = {}
+    signatures = {}
+    total = 0
+
+    with os.scandir(master_dir) as it:
+        entries = [e for e in it if e.is_file() and is_image(e.name)]
+
+    for entry in sorted(entries, key=lambda e: e.name):
+        product_id = os.path.splitext(entry.name)[0]
+        source_hash = hash_cache.sha256(entry.path, entry.stat())
+        for page_type in page_types:
+            for fmt in formats:
+                settings = output_settings(page_type, fmt)
+                out_path = os.path.join(folder_path(page_type), f"{product_id}.{fmt}")
+                rel_path = os.path.relpath(out_path, ROOT_DIR)
+                sig = signature(source_hash, settings)
+                signatures[rel_path] = sig
+                total += 1
+                if not force and state.get(rel_path) == sig and os.path.exists(out_path):
+                    continue
+                jobs.setdefault(entry.path, []).append((out_path, settings))
+
+    hash_cache.save()
+    return jobs, signatures, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='从主图生成首页/商城/积分三种尺寸的产品图片')
+    parser.add_argument('--masters', default=MASTER_DIR, help='主图文件夹（默认 ../product-images-master）')
+    parser.add_argument('--only', default='', help='只生成指定页面类型，逗号分隔：home,shop,points')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='并行进程数')
+    parser.add_argument('--no-webp', action='store_true', help='不生成WebP版本')
+    parser.add_argument('--force', action='store_true', help='忽略缓存，全部重新生成')
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start('build-image-derivatives', args)
+
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("PIL/Pillow not installed. Please install it with: pip3 install Pillow")
+        return
+
+    if not os.path.isdir(args.masters):
+        print(f"错误: 找不到主图文件夹 {args.masters}")
+        return
+
+    page_types = [t for t in args.only.split(',') if t] or list(IMAGE_FOLDERS)
+    unknown = [t for t in page_types if t not in IMAGE_FOLDERS]
+    if unknown:
+        print(f"错误: 未知的页面类型 {', '.join(unknown)}")
+        return
+    formats = ['jpg'] if args.no_webp else ['jpg', 'webp']
+
+    for page_type in page_types:
+        os.makedirs(folder_path(page_type), exist_ok=True)
+
+    print("正在检查主图...")
+    state = load_state(args.masters)
+    with metrics.stage('plan'):
+        jobs, signatures, total = plan_jobs(args.masters, page_types, formats, state, args.force)
+    pending = sum(len(outputs) for outputs in jobs.values())
+    print(f"共 {total} 个输出文件，需要生成 {pending} 个，跳过 {total - pending} 个")
+
+    if not jobs:
+        print("所有图片均为最新")
+        return
+
+    done = 0
+    failed = []
+    with metrics.stage('render'), ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = {pool.submit(render_master, master, outputs): (master, outputs)
+                   for master, outputs in jobs.items()}
+        for future in as_completed(futures):
+            master, outputs = futures[future]
+            try:
+                written = future.result()
+            except Exception as e:
+                failed.append((master, e))
+                continue
+            for out_path in written:
+                rel_path = os.path.relpath(out_path, ROOT_DIR)
+                state[rel_path] = signatures[rel_path]
+            done += len(written)
+            if done % 500 < len(written):
+                print(f"  已生成 {done}/{pending}")
+
+    save_state(args.masters, state)
+    metrics.count('masters_rendered', len(jobs) - len(failed))
+    metrics.count('files_written', done)
+
+    print(f"\n完成！共生成 {done} 个图片文件")
+    if failed:
+        print(f"失败 {len(failed)} 个主图：")
+        for master, e in failed[:20]:
+            print(f"  - {os.path.basename(master)}: {e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+把 product-images-home/shop/points 和 hero-featured-images 打成 Android 用的单文件图片包
+（格式见 imagepack.py）。App 端 mmap 后按路径二分查找，WebView 直接读映射内存，
+APK 里只有一个不压缩的大文件，安装和首次启动不再逐个解压几千个JPEG。
+
+默认增量打包：按内容哈希（.image-hash-cache.json，stat未变化的文件不重新读取）对比已有的包，
+未变化的图片原地保留，只把新增/修改的图片和新索引追加到文件末尾，最后改写头部；
+废弃空间（被替换的旧图片、旧索引）超过 --max-garbage 时自动整包重写。
+
+示例：
+  python3 build-image-pack.py                    # 输出 ../dist/android/images.pack
+  python3 build-image-pack.py --full --align 16  # 整包重写，只按16字节对齐（包更小）
+  python3 build-image-pack.py --verify           # 校验包里每个图片的哈希
+  python3 build-image-pack.py --list
+"""
+
+import argparse
+import hashlib
+import os
+
+import imagepack
+import metrics
+from imageutil import IMAGE_FOLDERS, ROOT_DIR, HashCache, is_image
+
+PACK_FILE = os.path.join(ROOT_DIR, 'dist', 'android', 'images.pack')
+HASH_CACHE_FILE = os.path.join(ROOT_DIR, '.image-hash-cache.json')
+PACK_FOLDERS = [folder for folder, _, _ in IMAGE_FOLDERS.values()] + ['hero-featured-images']
+
+
+def scan_images(root_dir, hash_cache):
+    """返回按路径UTF-8字节序排序的 [(相对路径, 绝对路径, 大小, 哈希)]"""
+    images = []
+    for folder in PACK_FOLDERS:
+        path = os.path.join(root_dir, folder)
+        if not os.path.isdir(path):
+            print(f"⚠️  跳过不存在的文件夹: {folder}")
+            continue
+        with os.scandir(path) as it:
+            for entry in it:
+                if not entry.is_file() or not is_image(entry.name):
+                    continue
+                st = entry.stat()
+                images.append((f'{folder}/{entry.name}', entry.path, st.st_size,
+                               hash_cache.sha256(entry.path, st)))
+    images.sort(key=lambda image: image[0].encode('utf-8'))
+    return images
+
+
+def _copy_file(src, out):
+    with open(src, 'rb') as f:
+        while True:
+            chunk = f.read(1024 * 1024)
+            if not chunk:
+                return
+            out.write(chunk)
+
+
+def _finish(out, entries, end, align):
+    """在 end 处写索引和文件名区，最后写头部，返回文件总大小"""
+    index, names = imagepack.encode_index(entries)
+    index_offset = imagepack.align_up(end, 8)
+    names_offset = index_offset + len(index)
+    out.seek(end)
+    out.write(b'\0' * (index_offset - end))
+    out.write(index)
+    out.write(names)
+    total = out.tell()
+    out.truncate()
+    out.flush()
+    os.fsync(out.fileno())
+    out.seek(0)
+    out.write(imagepack.encode_header(align, len(entries), index_offset, len(index),
+                                      names_offset, len(names)))
+    out.flush()
+    os.fsync(out.fileno())
+    return total
+
+
+def write_full(pack_file, images, align):
+    """整包重写（临时文件 + 原子替换），返回 (条目, 文件大小)"""
+    tmp_file = pack_file + '.tmp'
+    entries = []
+    with open(tmp_file, 'wb') as out:
+        out.write(b'\0' * imagepack.PAGE_SIZE)
+        end = imagepack.PAGE_SIZE
+        for rel_path, path, size, digest in images:
+            offset = imagepack.align_up(end, align)
+            out.write(b'\0' * (offset - end))
+            _copy_file(path, out)
+            end = out.tell()
+            if end - offset != size:
+                raise imagepack.PackError(f'{rel_path} 在打包过程中被修改，请重新运行')
+            entries.append((rel_path, offset, size, digest))
+        total = _finish(out, entries, end, align)
+    os.replace(tmp_file, pack_file)
+    metrics.count('pack_bytes_written', total)
+    return entries, total
+
+
+def write_incremental(pack_file, images, old_entries, old_end, align):
+    """保留未变化的图片，新增/修改的追加到 old_end 之后，返回 (条目, 文件大小, 追加的图片数)"""
+    old = {rel_path: (offset, length, digest) for rel_path, offset, length, digest in old_entries}
+    entries = []
+    appended = 0
+    with open(pack_file, 'r+b') as out:
+        end = old_end
+        for rel_path, path, size, digest in images:
+            kept = old.get(rel_path)
+            if kept and kept[1] == size and kept[2] == digest:
+                entries.append((rel_path, kept[0], size, digest))
+                continue
+            offset = imagepack.align_up(end, align)
+            out.seek(end)
+            out.write(b'\0' * (offset - end))
+            _copy_file(path, out)
+            end = out.tell()
+            if end - offset != size:
+                raise imagepack.PackError(f'{rel_path} 在打包过程中被修改，请重新运行')
+            entries.append((rel_path, offset, size, digest))
+            appended += 1
+            metrics.count('pack_bytes_written', size)
+        total = _finish(out, entries, end, align)
+    return entries, total, appended
+
+
+def plan_incremental(pack_file, images, align, max_garbage):
+    """能增量打包时返回 (旧条目, 追加起点)，否则打印原因并返回 None"""
+    try:
+        with imagepack.ImagePack(pack_file) as pack:
+            if pack.align != align:
+                print(f"对齐方式改变（{pack.align} -> {align}），整包重写")
+                return None
+            old_entries = pack.entries()
+            # 旧索引和文件名区之后才能追加，头部切换之前旧包始终完整
+            old_end = pack.end
+    except FileNotFoundError:
+        return None
+    except imagepack.PackError as e:
+        print(f"⚠️  {e}，整包重写")
+        return None
+
+    old = {rel_path: (length, digest) for rel_path, _, length, digest in old_entries}
+    live = sum(imagepack.align_up(size, align) for rel_path, _, size, digest in images
+               if old.get(rel_path) == (size, digest))
+    added = sum(imagepack.align_up(size, align) for rel_path, _, size, digest in images
+                if old.get(rel_path) != (size, digest))
+    total = imagepack.align_up(old_end, align) + added
+    garbage = total - imagepack.PAGE_SIZE - live - added
+    if total and garbage / total > max_garbage:
+        print(f"废弃空间 {garbage / 1024 / 1024:.1f}MB（{garbage / total:.1%}）超过 "
+              f"{max_garbage:.0%}，整包重写")
+        return None
+    return old_entries, old_end
+
+
+def verify(pack_file):
+    """逐个重新计算哈希并通过二分查找取回，返回出错的条目数"""
+    errors = 0
+    with imagepack.ImagePack(pack_file) as pack:
+        entries = pack.entries()
+        names = [rel_path.encode('utf-8') for rel_path, *_ in entries]
+        if names != sorted(names) or len(set(names)) != len(names):
+            print("❌ 索引没有按路径排序或有重复路径")
+            errors += 1
+        for rel_path, offset, length, digest in entries:
+            if offset % pack.align or offset + length > pack.data_end:
+                print(f"❌ {rel_path}: 偏移 {offset} 未对齐或越界")
+                errors += 1
+                continue
+            data = pack.lookup(rel_path)
+            try:
+                if data is None or hashlib.sha256(data).hexdigest() != digest:
+                    print(f"❌ {rel_path}: 内容与索引中的哈希不一致")
+                    errors += 1
+            finally:
+                if data is not None:
+                    data.release()
+        print(f"校验 {len(entries)} 个图片，{errors} 个错误")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成Android WebView用的单文件图片包')
+    parser.add_argument('--output', default=PACK_FILE, help='输出文件（默认 ../dist/android/images.pack）')
+    parser.add_argument('--root', default=ROOT_DIR, help='项目根目录（默认 ..）')
+    parser.add_argument('--align', type=int, default=imagepack.PAGE_SIZE,
+                        help=f'每个图片的起始对齐字节数（默认{imagepack.PAGE_SIZE}，即页对齐）')
+    parser.add_argument('--full', action='store_true', help='不做增量，整包重写')
+    parser.add_argument('--max-garbage', type=float, default=0.25,
+                        help='增量打包后废弃空间超过该比例时整包重写（默认0.25）')
+    parser.add_argument('--verify', action='store_true', help='只校验已有的包')
+    parser.add_argument('--list', action='store_true', help='只列出已有包的索引')
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start('build-image-pack', args)
+
+    if args.align < 1 or args.align > imagepack.PAGE_SIZE or args.align & (args.align - 1):
+        parser.error(f'--align 必须是 1 到 {imagepack.PAGE_SIZE} 之间的2的幂')
+
+    if args.verify or args.list:
+        try:
+            if args.list:
+                with imagepack.ImagePack(args.output) as pack:
+                    for rel_path, offset, length, digest in pack.entries():
+                        print(f"{offset:>12} {length:>10}  {digest[:16]}  {rel_path}")
+            if args.verify and verify(args.output):
+                raise SystemExit(1)
+        except (FileNotFoundError, imagepack.PackError) as e:
+            print(f"错误: {e}")
+            raise SystemExit(1)
+        return
+
+    print("正在扫描图片文件夹...")
+    hash_cache = HashCache(HASH_CACHE_FILE)
+    images = scan_images(args.root, hash_cache)
+    hash_cache.save()
+    source_size = sum(size for _, _, size, _ in images)
+    print(f"共 {len(images)} 个图片，{source_size / 1024 / 1024:.1f}MB")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    plan = None if args.full else plan_incremental(args.output, images, args.align, args.max_garbage)
+    if plan and ([(rel_path, size, digest) for rel_path, _, size, digest in plan[0]]
+                 == [(rel_path, size, digest) for rel_path, _, size, digest in images]):
+        entries = plan[0]
+        total = os.path.getsize(args.output)
+        print("图片没有变化，包保持不变")
+    elif plan:
+        old_entries, old_end = plan
+        entries, total, appended = write_incremental(args.output, images, old_entries, old_end, args.align)
+        removed = len({rel_path for rel_path, *_ in old_entries} - {rel_path for rel_path, *_ in entries})
+        print(f"增量打包：保留 {len(entries) - appended} 个，追加 {appended} 个，移除 {removed} 个")
+    else:
+        entries, total = write_full(args.output, images, args.align)
+        print(f"整包写入 {len(entries)} 个图片")
+
+    print(f"✅ {args.output}: {total / 1024 / 1024:.1f}MB"
+          f"（图片 {source_size / 1024 / 1024:.1f}MB，对齐和废弃空间 "
+          f"{(total - source_size) / 1024 / 1024:.1f}MB）")
+    print("提示: APK 中必须不压缩存放（build.gradle 里 androidResources { noCompress 'pack' }）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+从index.html的SD产品数据生成分片倒排搜索索引，输出到 ../search-index：
+  meta.json                  分片文件名、各分类产品数和索引字段的内容哈希（用于确认索引与页面数据一致）
+  shard-<键>.<哈希>.json      {词项: [差分编码的产品序号, ...]}（另有 .gz/.br 预压缩副本）
+产品序号为按分类顺序展开SD后的下标（与doSearch中的all数组一致）。
+词项：中文等非拉丁字符取单字和相邻两字（bigram），拉丁字母/数字取单词中长度1~3的片段
+（包含各级前缀，也能命中词中间的子串，如 iphone 中的 phone）；
+按词项首字符分片，页面搜索时只加载用到的分片。index.html中的searchIndexLookup使用相同规则。
+"""
+
+import argparse
+import glob
+import json
+import os
+import unicodedata
+
+import catalog
+import metrics
+from assets import hashed_name, write_precompressed
+from imageutil import ROOT_DIR
+
+INDEX_DIR = os.path.join(ROOT_DIR, 'search-index')
+META_FILE = 'meta.json'
+
+# 参与搜索的字段（与doSearch一致）
+FIELDS = ('brand', 'name', 'tag')
+# 拉丁单词索引的最长片段，更长的查询词拆成该长度的片段求交集，再由页面逐条核对
+MAX_GRAM = 3
+# 非拉丁字符按码点取模分片
+OTHER_SHARDS = 16
+
+_LATIN = set('0123456789abcdefghijklmnopqrstuvwxyz')
+
+
+def _runs(text):
+    """NFKC小写后切分为 (是否拉丁, 连续片段) 列表，其余字符视为分隔符"""
+    runs = []
+    current, latin = '', None
+    for ch in unicodedata.normalize('NFKC', text).lower():
+        kind = True if ch in _LATIN else (False if ch.isalnum() else None)
+        if kind is None or kind != latin:
+            if current:
+                runs.append((latin, current))
+            current, latin = '', kind
+        if kind is not None:
+            current += ch
+    if current:
+        runs.append((latin, current))
+    return runs
+
+
+def index_tokens(text):
+    """产品字段的全部词项"""
+    tokens = set()
+    for latin, run in _runs(text):
+        if latin:
+            for k in range(1, MAX_GRAM + 1):
+                tokens.update(run[i:i + k] for i in range(len(run) - k + 1))
+        else:
+            tokens.update(run)
+            tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def query_tokens(text):
+    """查询词的词项（全部命中才算候选）"""
+    tokens = set()
+    for latin, run in _runs(text):
+        if latin:
+            if len(run) <= MAX_GRAM:
+                tokens.add(run)
+            else:
+                tokens.update(run[i:i + MAX_GRAM] for i in range(len(run) - MAX_GRAM + 1))
+        elif len(run) == 1:
+            tokens.add(run)
+        else:
+            tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def shard_key(token):
+    first = token[0]
+    if first in _LATIN:
+        return first
+    return 'x' + format(ord(first) % OTHER_SHARDS, 'x')
+
+
+def build_index(products):
+    """返回 {分片键: {词项: 升序产品序号列表}}"""
+    shards = {}
+    for ordinal, product in enumerate(products):
+        tokens = set()
+        for field in FIELDS:
+            tokens |= index_tokens(getattr(product, field) or '')
+        for token in tokens:
+            shards.setdefault(shard_key(token), {}).setdefault(token, []).append(ordinal)
+    return shards
+
+
+def catalog_hash(products):
+    """索引内容的FNV-1a 32位哈希（十六进制）：按顺序对每个产品的 分类\t品牌\t名称\t标签\n 的UTF-8字节计算，
+    页面的 searchCatalogHash 用同样的算法核对当前SD，卖家修改名称或品牌但产品数不变时也能发现索引已过期"""
+    h = 0x811c9dc5
+    for p in products:
+        line = '\t'.join([p.category] + [getattr(p, field) or '' for field in FIELDS]) + '\n'
+        for byte in line.encode('utf-8'):
+            h = ((h ^ byte) * 0x01000193) & 0xffffffff
+    return format(h, '08x')
+
+
+def delta_encode(ordinals):
+    previous = 0
+    encoded = []
+    for ordinal in ordinals:
+        encoded.append(ordinal - previous)
+        previous = ordinal
+    return encoded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成分片倒排搜索索引')
+    parser.add_argument('--html', default=catalog.HTML_FILE, help='源HTML文件（默认 ../index.html）')
+    parser.add_argument('--output', default=INDEX_DIR, help='输出目录（默认 ../search-index）')
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start('build-search-index', args)
+
+    print("正在提取产品数据...")
+    products = catalog.load_products(args.html, source='SD')
+    if not products:
+        print("未找到产品数据SD对象")
+        return
+    counts = {}
+    for p in products:
+        counts[p.category] = counts.get(p.category, 0) + 1
+
+    os.makedirs(args.output, exist_ok=True)
+    with metrics.stage('build_index'):
+        shards = build_index(products)
+
+    written = []
+    shard_files = {}
+    total_tokens = total_postings = total_bytes = 0
+    for key in sorted(shards):
+        postings = {token: delta_encode(ordinals) for token, ordinals in sorted(shards[key].items())}
+        data = json.dumps(postings, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        name = hashed_name(f"shard-{key}.json", data)
+        written.extend(write_precompressed(os.path.join(args.output, name), data))
+        shard_files[key] = name
+        total_tokens += len(postings)
+        total_postings += sum(len(v) for v in postings.values())
+        total_bytes += len(data)
+
+    meta = {
+        'version': 2,
+        'max_gram': MAX_GRAM,
+        'other_shards': OTHER_SHARDS,
+        'counts': counts,
+        'hash': catalog_hash(products),
+        'shards': shard_files,
+    }
+    meta_data = json.dumps(meta, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    written.extend(write_precompressed(os.path.join(args.output, META_FILE), meta_data))
+
+    # 删除旧版本分片
+    keep = {os.path.abspath(p) for p in written}
+    removed = 0
+    for path in glob.glob(os.path.join(args.output, 'shard-*')):
+        if os.path.abspath(path) not in keep:
+            os.remove(path)
+            removed += 1
+
+    metrics.count('tokens', total_tokens)
+    metrics.count('postings', total_postings)
+    print(f"共 {len(products)} 个产品，{total_tokens} 个词项，{total_postings} 条倒排记录")
+    print(f"{len(shard_files)} 个分片，共 {total_bytes / 1024:.0f} KB（未压缩），删除 {removed} 个旧文件")
+    print(f"已生成: {os.path.join(args.output, META_FILE)}")
+
+
+if __name__ == '__main__':
+    main()
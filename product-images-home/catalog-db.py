@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite产品目录（../catalog.db）的命令行工具
+  import    从index.html的SD/PD（或 --json 导出文件）整体导入
+  export    导出为JSON（结构与SD/PD相同，可再用 import --json 导入）
+  generate  把数据库写回index.html的SD/PD，并生成统一格式的 product-images-info.json
+            （写回记入修改日志，可用 html-history.py 回滚）
+  query     按分类/品牌/产品ID查询，--missing 列出某个图片文件夹中缺少图片的产品
+
+示例：
+  python3 catalog-db.py import
+  python3 catalog-db.py query --category fit --missing points
+"""
+
+import argparse
+import json
+import os
+
+import catalog
+import catalogdb
+import metrics
+from imageutil import IMAGE_FOLDERS
+
+MAPPING_FILE = 'product-images-info.json'
+
+
+def cmd_import(conn, args):
+    if args.json:
+        with open(args.json, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        count = catalogdb.import_catalog(conn, data)
+        source = args.json
+    else:
+        count = catalogdb.import_html(conn, args.html)
+        source = args.html
+    print(f"已从 {source} 导入 {count} 个产品到 {args.db}")
+
+
+def cmd_export(conn, args):
+    data = catalogdb.export_catalog(conn)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    count = len(data['PD']) + sum(len(items) for items in data['SD'].values())
+    print(f"已导出 {count} 个产品到 {args.output}")
+
+
+def cmd_generate(conn, args):
+    if not args.no_html:
+        with metrics.stage('write_html'):
+            changed = catalogdb.write_html(conn, args.html)
+        if changed < 0:
+            print(f"已重新生成 {args.html} 中的产品数据块")
+        elif changed:
+            print(f"已更新 {args.html} 中 {changed} 个产品")
+        else:
+            print(f"{args.html} 已是最新")
+    if not args.no_mapping:
+        mapping = catalogdb.image_mapping(conn)
+        with metrics.stage('write_mapping'), open(args.mapping, 'w', encoding='utf-8') as f:
+            json.dump(mapping, f, ensure_ascii=False, indent=2)
+        print(f"已生成映射文件: {args.mapping}（{len(mapping)} 个产品）")
+
+
+def cmd_query(conn, args):
+    if args.missing:
+        with metrics.stage('sync_images'):
+            catalogdb.sync_images(conn, [args.missing])
+        rows = catalogdb.missing_images(conn, args.missing, args.source, args.category)
+        if args.brand:
+            rows = [row for row in rows if (row['brand'] or '').lower() == args.brand.lower()]
+    else:
+        rows = catalogdb.query_products(conn, args.source, args.category, args.brand, args.id)
+
+    for row in rows[:args.limit]:
+        label = ' '.join(part for part in (row['brand'], row['name']) if part)
+        print(f"{row['source']:<3}{row['category'] or '-':<6}{row['norm_id']:<40}{label}  {row['price']}")
+    if len(rows) > args.limit:
+        print(f"... 还有 {len(rows) - args.limit} 个")
+    print(f"共 {len(rows)} 个产品")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump([dict(row) for row in rows], f, ensure_ascii=False, indent=2)
+        print(f"已生成JSON: {args.json}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite产品目录：导入/导出、写回index.html、按索引查询')
+    parser.add_argument('--db', default=catalogdb.DB_FILE, help='数据库文件（默认 ../catalog.db）')
+    metrics.add_arguments(parser)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('import', help='从index.html或JSON导入')
+    p.add_argument('--html', default=catalog.HTML_FILE, help='源HTML文件（默认 ../index.html）')
+    p.add_argument('--json', metavar='FILE', help='从 export 导出的JSON导入')
+
+    p = commands.add_parser('export', help='导出为JSON')
+    p.add_argument('output', help='输出JSON文件')
+
+    p = commands.add_parser('generate', help='写回index.html并生成图片映射文件')
+    p.add_argument('--html', default=catalog.HTML_FILE, help='目标HTML文件（默认 ../index.html）')
+    p.add_argument('--mapping', default=MAPPING_FILE, help=f'映射文件（默认 {MAPPING_FILE}）')
+    p.add_argument('--no-html', action='store_true', help='不写回HTML')
+    p.add_argument('--no-mapping', action='store_true', help='不生成映射文件')
+
+    p = commands.add_parser('query', help='查询产品')
+    p.add_argument('--source', choices=['SD', 'PD'], help='只查SD（商城）或PD（积分商品）')
+    p.add_argument('--category', help='分类，如 fit')
+    p.add_argument('--brand', help='品牌（不区分大小写）')
+    p.add_argument('--id', help='规范化产品ID，如 apple_iphone_13')
+    p.add_argument('--missing', choices=list(IMAGE_FOLDERS), help='只列出该页面类型文件夹中缺少图片的产品')
+    p.add_argument('--limit', type=int, default=50, help='最多显示的行数（默认50）')
+    p.add_argument('--json', metavar='FILE', help='将结果写入JSON文件')
+
+    args = parser.parse_args()
+    metrics.start('catalog-db', args)
+
+    if args.command != 'import' and not os.path.exists(args.db):
+        print(f"错误: 找不到数据库 {args.db}，请先运行 python3 catalog-db.py import")
+        return
+    if args.command == 'query' and args.missing and not args.source:
+        args.source = 'SD'
+
+    conn = catalogdb.connect(args.db)
+    try:
+        {'import': cmd_import, 'export': cmd_export, 'generate': cmd_generate, 'query': cmd_query}[args.command](
+            conn, args)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+产品目录共享解析模块
+单次扫描index.html，用JS对象字面量分词器提取SD/PD中的全部产品，
+所有分类自动识别，无需硬编码分类列表
+解析和修改既可作用于str，也可直接作用于HTML文件的只读内存映射（map_html，位置为字节偏移），
+修改时用 write_edits 把未变化的字节区间和替换内容流式写入临时文件，内存占用不随文件大小增长
+"""
+
+import json
+import mmap
+import os
+import re
+from collections import namedtuple
+from contextlib import contextmanager
+
+import metrics
+import parsecache
+
+HTML_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'index.html')
+
+# 紧凑的产品记录
+# source: 'SD'（商城/首页数据）或 'PD'（积分商品）
+# start/end: 产品对象字面量 { ... } 在HTML文本中的位置（end不含；内存映射时为字节偏移）
+Product = namedtuple('Product', 'source category id brand name price tag icon img start end')
+
+# 顶层声明：const SD = ... / const PD = ...
+_DECL = re.compile(r'\bconst\s+(SD|PD)\s*=\s*')
+
+# 空白和注释
+_SKIP = re.compile(r'(?:\s+|//[^\n]*|/\*.*?\*/)*', re.S)
+
+# 分词器：先跳过空白和注释，再匹配一个记号
+_TOKEN = re.compile(r'''
+    (?:\s+|//[^\n]*|/\*.*?\*/)*
+    (?:
+        (?P<punct>[{}\[\]:,])
+      | "(?P<dq>(?:[^"\\\n]|\\.)*)"
+      | '(?P<sq>(?:[^'\\\n]|\\.)*)'
+      | (?P<num>-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+      | (?P<ident>[A-Za-z_$][\w$]*)
+    )''', re.S | re.X)
+
+# 内存映射（bytes）版本的正则
+_DECL_BYTES = re.compile(_DECL.pattern.encode(), _DECL.flags & ~re.U)
+_SKIP_BYTES = re.compile(_SKIP.pattern.encode(), _SKIP.flags & ~re.U)
+_TOKEN_BYTES = re.compile(_TOKEN.pattern.encode(), _TOKEN.flags & ~re.U)
+
+_PUNCT = {ch: ch for ch in '{}[]:,'}
+_PUNCT_BYTES = {ch.encode(): ch for ch in '{}[]:,'}
+
+_ESCAPE = re.compile(r'\\(u\{[0-9a-fA-F]+\}|u[0-9a-fA-F]{4}|x[0-9a-fA-F]{2}|.)', re.S)
+_SIMPLE_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', 'v': '\v', '0': '\0'}
+_CONSTANTS = {'true': True, 'false': False, 'null': None, 'undefined': None}
+
+
+def _unescape(raw):
+    """解码JS字符串中的转义序列"""
+    if '\\' not in raw:
+        return raw
+
+    def repl(m):
+        seq = m.group(1)
+        if seq[0] == 'u':
+            return chr(int(seq[1:].strip('{}'), 16))
+        if seq[0] == 'x' and len(seq) == 3:
+            return chr(int(seq[1:], 16))
+        if seq == '\n':
+            return ''
+        return _SIMPLE_ESCAPES.get(seq, seq)
+
+    return _ESCAPE.sub(repl, raw)
+
+
+def _is_text(data):
+    return isinstance(data, str)
+
+
+def _decode(raw):
+    return raw.decode('utf-8')
+
+
+def _encode(value):
+    return value.encode('utf-8')
+
+
+def _same(value):
+    return value
+
+
+class JSObject(dict):
+    """带源码位置的JS对象（start为 { 的位置，end为 } 之后的位置）"""
+    __slots__ = ('start', 'end')
+
+
+class _Parser:
+    """JS对象/数组字面量的递归下降解析器"""
+
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+        if _is_text(text):
+            self.token, self.puncts, self.decode = _TOKEN, _PUNCT, _same
+        else:
+            self.token, self.puncts, self.decode = _TOKEN_BYTES, _PUNCT_BYTES, _decode
+
+    def error(self, message):
+        head = self.text[:self.pos]
+        line = head.count('\n' if _is_text(head) else b'\n') + 1
+        return ValueError(f"{message}（第 {line} 行，位置 {self.pos}）")
+
+    def next(self):
+        m = self.token.match(self.text, self.pos)
+        if not m:
+            raise self.error("无法识别的JS语法")
+        self.pos = m.end()
+        return m
+
+    def punct(self, m):
+        return self.puncts.get(m.group('punct'))
+
+    def expect(self, ch):
+        m = self.next()
+        if self.punct(m) != ch:
+            raise self.error(f"应为 '{ch}'")
+        return m
+
+    def value(self, m=None):
+        m = m or self.next()
+        kind = m.lastgroup
+        if kind == 'punct':
+            ch = self.punct(m)
+            if ch == '{':
+                return self.obj(m.start('punct'))
+            if ch == '[':
+                return self.arr()
+            raise self.error(f"意外的 '{ch}'")
+        if kind == 'dq' or kind == 'sq':
+            return _unescape(self.decode(m.group(kind)))
+        if kind == 'num':
+            s = self.decode(m.group('num'))
+            return float(s) if ('.' in s or 'e' in s or 'E' in s) else int(s)
+        word = self.decode(m.group('ident'))
+        if word in _CONSTANTS:
+            return _CONSTANTS[word]
+        raise self.error(f"不支持的标识符值 '{word}'")
+
+    def key(self, m):
+        """解码属性名记号，不是属性名时返回None"""
+        kind = m.lastgroup
+        if kind in ('dq', 'sq'):
+            return _unescape(self.decode(m.group(kind)))
+        if kind in ('ident', 'num'):
+            return self.decode(m.group(kind))
+        return None
+
+    def obj(self, start):
+        result = JSObject()
+        result.start = start
+        while True:
+            m = self.next()
+            if self.punct(m) == '}':
+                break
+            key = self.key(m)
+            if key is None:
+                raise self.error("应为属性名")
+            self.expect(':')
+            result[key] = self.value()
+            m = self.next()
+            ch = self.punct(m)
+            if ch == '}':
+                break
+            if ch != ',':
+                raise self.error("应为 ',' 或 '}'")
+        result.end = self.pos
+        return result
+
+    def arr(self):
+        result = []
+        while True:
+            m = self.next()
+            if self.punct(m) == ']':
+                break
+            result.append(self.value(m))
+            m = self.next()
+            ch = self.punct(m)
+            if ch == ']':
+                break
+            if ch != ',':
+                raise self.error("应为 ',' 或 ']'")
+        return result
+
+
+# 声明语句的位置信息
+# start: 'const' 的位置；value_start/value_end: 字面量的位置；end: 语句结束（含分号）的位置
+Declaration = namedtuple('Declaration', 'name start value_start value_end end value')
+
+
+def iter_declarations(text):
+    """单次扫描文本（str或内存映射），按顺序产出所有 const SD/PD 声明"""
+    parser = _Parser(text)
+    decl, skip = (_DECL, _SKIP) if _is_text(text) else (_DECL_BYTES, _SKIP_BYTES)
+    pos = 0
+    while True:
+        m = decl.search(text, pos)
+        if not m:
+            break
+        value_start = skip.match(text, m.end()).end()
+        parser.pos = m.end()
+        value = parser.value()
+        value_end = parser.pos
+        end = skip.match(text, value_end).end()
+        if text[end:end + 1] in (';', b';'):
+            end += 1
+        else:
+            end = value_end
+        yield Declaration(parser.decode(m.group(1)), m.start(), value_start, value_end, end, value)
+        pos = value_end
+
+
+def parse_declarations(text):
+    """单次扫描文本，解析所有 const SD/PD 声明，返回 {名称: 值}"""
+    return {decl.name: decl.value for decl in iter_declarations(text)}
+
+
+def object_properties(text, start):
+    """解析 start 处的对象字面量，返回 ([(属性名, 属性名起点, 值起点, 值终点), ...], 对象终点)"""
+    parser = _Parser(text)
+    skip = _SKIP if _is_text(text) else _SKIP_BYTES
+    parser.pos = start
+    parser.expect('{')
+    props = []
+    while True:
+        m = parser.next()
+        if parser.punct(m) == '}':
+            break
+        name = parser.key(m)
+        if name is None:
+            raise parser.error("应为属性名")
+        kind = m.lastgroup
+        key_start = m.start(kind) - 1 if kind in ('dq', 'sq') else m.start(kind)
+        parser.expect(':')
+        value_start = skip.match(text, parser.pos).end()
+        parser.value()
+        props.append((name, key_start, value_start, parser.pos))
+        m = parser.next()
+        ch = parser.punct(m)
+        if ch == '}':
+            break
+        if ch != ',':
+            raise parser.error("应为 ',' 或 '}'")
+    return props, parser.pos
+
+
+def js_string(value):
+    """把Python字符串编码为JS双引号字符串字面量"""
+    return json.dumps(value, ensure_ascii=False)
+
+
+def object_edits(text, start, changes):
+    """计算按 changes（属性名 -> 字符串值，None表示删除）修改对象字面量所需的修改
+    返回按位置排序、互不重叠的 [(替换起点, 替换终点, 替换文本)]；无需修改时为空列表
+    text 为内存映射时位置为字节偏移，替换文本为UTF-8编码的bytes"""
+    encode = _same if _is_text(text) else _encode
+    props, _ = object_properties(text, start)
+    positions = {name: idx for idx, (name, _, _, _) in enumerate(props)}
+    edits = []
+    inserts = []
+    removed = set()
+
+    for key, value in changes.items():
+        idx = positions.get(key)
+        if value is None:
+            if idx is not None:
+                removed.add(idx)
+            continue
+        literal = js_string(value)
+        if idx is None:
+            inserts.append(f'{key}: {literal}')
+        elif text[props[idx][2]:props[idx][3]] != encode(literal):
+            edits.append((props[idx][2], props[idx][3], literal))
+
+    kept = [idx for idx in range(len(props)) if idx not in removed]
+    if removed and not kept:
+        # 全部删除：连同新增属性一起替换整个对象内容
+        edits.append((props[0][1], props[-1][3], ', '.join(inserts)))
+        inserts = []
+    elif removed:
+        first = kept[0]
+        if first > 0:
+            edits.append((props[0][1], props[first][1], ''))
+        for idx in removed:
+            if idx > first:
+                # 连同前面的逗号一起删除
+                edits.append((props[idx - 1][3], props[idx][3], ''))
+
+    if inserts:
+        if props:
+            pos = props[-1][3]
+            edits.append((pos, pos, ''.join(', ' + item for item in inserts)))
+        else:
+            edits.append((start + 1, start + 1, ' ' + ', '.join(inserts)))
+
+    edits.sort(key=lambda edit: (edit[0], edit[1]))
+    return [(edit_start, edit_end, encode(replacement)) for edit_start, edit_end, replacement in edits]
+
+
+def property_edit(text, start, key, value):
+    """计算把对象字面量的属性 key 设为字符串 value 所需的修改
+    返回 (替换起点, 替换终点, 替换文本)；属性已是该值时返回None"""
+    edits = object_edits(text, start, {key: value})
+    return edits[0] if edits else None
+
+
+def property_remove(text, start, key):
+    """计算从对象字面量中删除属性 key 所需的修改
+    返回 (替换起点, 替换终点, '')；属性不存在时返回None"""
+    edits = object_edits(text, start, {key: None})
+    return edits[0] if edits else None
+
+
+def apply_edits(text, edits):
+    """按位置顺序应用互不重叠的修改，返回新文本（内存映射时返回bytes）"""
+    chunks = []
+    pos = 0
+    for edit_start, edit_end, replacement in edits:
+        chunks.append(text[pos:edit_start])
+        chunks.append(replacement)
+        pos = edit_end
+    chunks.append(text[pos:])
+    return ('' if _is_text(text) else b'').join(chunks)
+
+
+def stream_edits(f, data, edits):
+    """把 data（bytes或内存映射）按位置顺序应用修改后写入二进制文件对象 f
+    未修改的区间直接从映射中写出，不复制整个文件"""
+    with memoryview(data) as view:
+        pos = 0
+        for edit_start, edit_end, replacement in edits:
+            f.write(view[pos:edit_start])
+            f.write(replacement)
+            pos = edit_end
+        f.write(view[pos:])
+
+
+def write_edits(html_file, edits, output=None):
+    """把针对 html_file 内存映射计算的修改（字节偏移）流式写入 output（默认覆盖 html_file）
+    先写临时文件，关闭映射后再替换，避免写入中断导致文件损坏"""
+    output = output or html_file
+    tmp_file = output + '.tmp'
+    with map_html(html_file) as data, open(tmp_file, 'wb') as f:
+        stream_edits(f, data, edits)
+    os.replace(tmp_file, output)
+    metrics.count('bytes_written', os.path.getsize(output))
+
+
+def _make_product(source, category, obj):
+    price = obj.get('p', 0)
+    return Product(
+        source=source,
+        category=category,
+        id=str(obj.get('id', '')),
+        brand=str(obj.get('b', '')),
+        name=str(obj.get('n', '')),
+        price=int(price) if isinstance(price, (int, float)) else 0,
+        tag=str(obj.get('t', '') or ''),
+        icon=str(obj.get('i', '') or ''),
+        img=str(obj.get('img', '') or ''),
+        start=obj.start,
+        end=obj.end,
+    )
+
+
+def iter_products(text):
+    """按源码顺序逐个产出Product记录"""
+    decls = parse_declarations(text)
+    items = []
+    for obj in decls.get('PD') or []:
+        if isinstance(obj, JSObject):
+            items.append(_make_product('PD', '', obj))
+    for category, objs in (decls.get('SD') or {}).items():
+        for obj in objs:
+            if isinstance(obj, JSObject):
+                items.append(_make_product('SD', category, obj))
+    items.sort(key=lambda p: p.start)
+    yield from items
+
+
+def read_html(html_file=HTML_FILE):
+    """读取HTML文件内容"""
+    with open(html_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    metrics.count('html_chars_read', len(content))
+    return content
+
+
+@contextmanager
+def map_html(html_file=HTML_FILE):
+    """以只读内存映射打开HTML文件，可直接传给 iter_products/iter_declarations/object_edits
+    映射只在 with 块内有效；空文件产出 b''"""
+    with open(html_file, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            metrics.count('html_bytes_mapped', size)
+            yield data
+
+
+def _parse_products(html_file):
+    with map_html(html_file) as data:
+        return list(iter_products(data))
+
+
+def load_products(html_file=HTML_FILE, source=None):
+    """从HTML文件中提取产品记录列表（位置为字节偏移）；source可限定为 'SD' 或 'PD'
+    解析结果缓存在磁盘上，HTML未变化时不再重新解析"""
+    with metrics.stage('parse_catalog'):
+        products = parsecache.cached('catalog', html_file, _parse_products, parsecache.code_signature(__file__))
+    metrics.count('products_parsed', len(products))
+    if source:
+        products = [p for p in products if p.source == source]
+    return products
+
+
+def categories(products):
+    """按出现顺序返回分类列表"""
+    return list(dict.fromkeys(p.category for p in products if p.source == 'SD'))
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite产品目录共享模块
+从index.html中的SD/PD一次性导入，按分类、品牌、规范化产品ID建立索引；
+可批量导入/导出JSON，并生成写回index.html的JS数据块和统一格式的图片映射文件。
+三个图片文件夹的文件清单也存入数据库，"某分类中缺少积分图片的产品"之类的查询直接走索引。
+"""
+
+import json
+import os
+import re
+import sqlite3
+
+import catalog
+import htmljournal
+import productid
+from imageutil import IMAGE_FOLDERS, ROOT_DIR, folder_path, is_image
+
+DB_FILE = os.path.join(ROOT_DIR, 'catalog.db')
+
+# JS属性名 -> 数据库列名；生成JS时按此顺序输出，其余属性保存在extra中并排在后面
+PROPERTY_COLUMNS = {
+    'id': 'pid',
+    'b': 'brand',
+    'n': 'name',
+    'p': 'price',
+    't': 'tag',
+    'i': 'icon',
+    'img': 'img',
+}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS categories (
+    key TEXT PRIMARY KEY,
+    position INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS products (
+    rowid INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    category TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    pid TEXT,
+    brand TEXT,
+    name TEXT,
+    price,
+    tag TEXT,
+    icon TEXT,
+    img TEXT,
+    extra TEXT NOT NULL DEFAULT '{}',
+    norm_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS products_category ON products (source, category, position);
+CREATE INDEX IF NOT EXISTS products_brand ON products (brand COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS products_norm_id ON products (norm_id);
+CREATE TABLE IF NOT EXISTS images (
+    page_type TEXT NOT NULL,
+    norm_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (page_type, norm_id, filename)
+) WITHOUT ROWID;
+'''
+
+_IDENT = re.compile(r'^[A-Za-z_$][\w$]*$')
+
+
+def connect(db_file=DB_FILE):
+    """打开数据库（不存在时创建表结构），行以 sqlite3.Row 返回"""
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _product_row(source, category, position, props):
+    values = {column: props.get(key) for key, column in PROPERTY_COLUMNS.items()}
+    extra = {key: value for key, value in props.items() if key not in PROPERTY_COLUMNS}
+    norm_id = productid.product_id(str(props.get('b') or ''), str(props.get('n') or ''))
+    return (source, category, position, values['pid'], values['brand'], values['name'], values['price'],
+            values['tag'], values['icon'], values['img'], json.dumps(extra, ensure_ascii=False), norm_id)
+
+
+def import_catalog(conn, data):
+    """用 {'SD': {分类: [产品属性]}, 'PD': [产品属性]} 整体替换数据库中的产品，返回导入数量"""
+    rows = []
+    for position, props in enumerate(data.get('PD') or []):
+        rows.append(_product_row('PD', '', position, props))
+    categories = list((data.get('SD') or {}).items())
+    for category, items in categories:
+        for position, props in enumerate(items):
+            rows.append(_product_row('SD', category, position, props))
+    with conn:
+        conn.execute('DELETE FROM products')
+        conn.execute('DELETE FROM categories')
+        conn.executemany('INSERT INTO categories (key, position) VALUES (?, ?)',
+                         [(category, idx) for idx, (category, _) in enumerate(categories)])
+        conn.executemany('INSERT INTO products (source, category, position, pid, brand, name, price, tag, icon, '
+                         'img, extra, norm_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    return len(rows)
+
+
+def import_html(conn, html_file=catalog.HTML_FILE):
+    """从HTML中的SD/PD导入"""
+    with catalog.map_html(html_file) as content:
+        data = catalog.parse_declarations(content)
+    return import_catalog(conn, data)
+
+
+def _props(row):
+    props = {}
+    for key, column in PROPERTY_COLUMNS.items():
+        if row[column] is not None:
+            props[key] = row[column]
+    props.update(json.loads(row['extra']))
+    return props
+
+
+def export_catalog(conn):
+    """导出为与JS数据结构相同的 {'SD': {分类: [产品属性]}, 'PD': [产品属性]}"""
+    sd = {row['key']: [] for row in conn.execute('SELECT key FROM categories ORDER BY position')}
+    pd = []
+    for row in conn.execute('SELECT * FROM products ORDER BY source, category, position'):
+        if row['source'] == 'PD':
+            pd.append(_props(row))
+        else:
+            sd.setdefault(row['category'], []).append(_props(row))
+    return {'SD': sd, 'PD': pd}
+
+
+def query_products(conn, source=None, category=None, brand=None, norm_id=None):
+    """按条件查询产品（各条件均有索引），按目录顺序返回行"""
+    clauses = []
+    params = []
+    for column, value in (('source', source), ('category', category), ('norm_id', norm_id)):
+        if value is not None:
+            clauses.append(f'p.{column} = ?')
+            params.append(value)
+    if brand is not None:
+        clauses.append('p.brand = ? COLLATE NOCASE')
+        params.append(brand)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    return conn.execute(f'SELECT p.* FROM products p LEFT JOIN categories c ON c.key = p.category {where} '
+                        'ORDER BY p.source, c.position, p.position', params).fetchall()
+
+
+def sync_images(conn, page_types=None):
+    """重新扫描图片文件夹，刷新 images 表，返回文件数"""
+    page_types = list(page_types or IMAGE_FOLDERS)
+    rows = []
+    for page_type in page_types:
+        folder = folder_path(page_type)
+        if not os.path.isdir(folder):
+            continue
+        with os.scandir(folder) as it:
+            for entry in it:
+                if is_image(entry.name) and not entry.name.startswith('.') and entry.is_file():
+                    stem = os.path.splitext(entry.name)[0]
+                    rows.append((page_type, productid.normalize_id(stem), entry.name, entry.stat().st_size))
+    with conn:
+        conn.executemany('DELETE FROM images WHERE page_type = ?', [(t,) for t in page_types])
+        conn.executemany('INSERT OR REPLACE INTO images (page_type, norm_id, filename, size) VALUES (?, ?, ?, ?)',
+                         rows)
+    return len(rows)
+
+
+def missing_images(conn, page_type, source='SD', category=None):
+    """返回在 page_type 文件夹中没有对应图片的产品（需先 sync_images）"""
+    sql = ('SELECT p.* FROM products p LEFT JOIN categories c ON c.key = p.category '
+           'WHERE p.source = ? {category} AND NOT EXISTS '
+           '(SELECT 1 FROM images i WHERE i.page_type = ? AND i.norm_id = p.norm_id) '
+           'ORDER BY c.position, p.position')
+    params = [source]
+    if category is not None:
+        params.append(category)
+    params.append(page_type)
+    return conn.execute(sql.format(category='AND p.category = ?' if category is not None else ''),
+                        params).fetchall()
+
+
+def js_value(value):
+    """把Python值编码为JS字面量"""
+    if isinstance(value, str):
+        return catalog.js_string(value)
+    return json.dumps(value, ensure_ascii=False)
+
+
+def js_object(props):
+    """生成单行对象字面量，如 { b: "Apple", n: "iPhone 13", p: 4780 }"""
+    items = []
+    for key, value in props.items():
+        name = key if _IDENT.match(key) else catalog.js_string(key)
+        items.append(f'{name}: {js_value(value)}')
+    return '{ ' + ', '.join(items) + ' }'
+
+
+def _js_key(key):
+    return "'" + key.replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+
+def js_data_blocks(data, indent='            '):
+    """生成完整的SD/PD字面量文本（每行一个产品），返回 {'SD': 文本, 'PD': 文本}"""
+    inner = indent + '    '
+    pd = ',\n'.join(inner + js_object(props) for props in data['PD'])
+    sd = ',\n'.join(f"{inner}{_js_key(category)}: [\n"
+                    + ',\n'.join(inner + '    ' + js_object(props) for props in items)
+                    + f"\n{inner}]"
+                    for category, items in data['SD'].items())
+    return {'PD': f'[\n{pd}\n{indent}]', 'SD': f'{{\n{sd}\n{indent}}}'}
+
+
+def _objects(name, value):
+    """按源码顺序展开SD/PD中的产品对象"""
+    if name == 'PD':
+        return list(value)
+    return [props for items in value.values() for props in items]
+
+
+def _same_shape(name, current, wanted):
+    """分类和每个分类的产品数量都相同时可以逐个对象替换"""
+    if name == 'PD':
+        return isinstance(current, list) and len(current) == len(wanted)
+    return (isinstance(current, dict) and list(current) == list(wanted)
+            and all(len(current[key]) == len(wanted[key]) for key in wanted))
+
+
+def _dump(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+def write_html(conn, html_file=catalog.HTML_FILE):
+    """把数据库中的产品写回HTML的SD/PD字面量，返回改写的产品数（整块重新生成时为-1）
+    分类和产品数量不变时只替换有变化的对象字面量，保留原有排版和注释；否则重新生成整个数据块。
+    通过 htmljournal 写入，可以用 html-history.py 回滚"""
+    data = export_catalog(conn)
+    edits = []
+    products = []
+    changed = 0
+    with catalog.map_html(html_file) as content:
+        for decl in catalog.iter_declarations(content):
+            wanted = data.get(decl.name)
+            if wanted is None or _dump(decl.value) == _dump(wanted):
+                continue
+            if _same_shape(decl.name, decl.value, wanted):
+                for obj, props in zip(_objects(decl.name, decl.value), _objects(decl.name, wanted)):
+                    if _dump(obj) != _dump(props):
+                        edits.append((obj.start, obj.end, js_object(props).encode('utf-8')))
+                        products.append(str(props.get('n', '')))
+                        changed += 1
+            else:
+                block = js_data_blocks(data)[decl.name]
+                edits.append((decl.value_start, decl.value_end, block.encode('utf-8')))
+                # 新增、修改和删除的产品都记入日志
+                before = {_dump(obj): obj for obj in _objects(decl.name, decl.value)}
+                after = {_dump(props): props for props in _objects(decl.name, wanted)}
+                products.extend(str(props.get('n', '')) for key, props in after.items() if key not in before)
+                products.extend(str(obj.get('n', '')) for key, obj in before.items() if key not in after)
+                changed = -1
+    if edits:
+        edits.sort()
+        htmljournal.write_edits(html_file, edits, products, tool='catalog-db')
+    return changed
+
+
+def image_mapping(conn, page_type='home'):
+    """生成统一格式的图片映射（product-images-info.json，字段与 generate-home-image-mapping.py 一致）"""
+    folder = IMAGE_FOLDERS[page_type][0]
+    mapping = []
+    for idx, row in enumerate(query_products(conn, source='SD'), 1):
+        props = _props(row)
+        brand, name = str(props.get('b', '')), str(props.get('n', ''))
+        tag = str(props.get('t', '') or '')
+        filename = row['norm_id'] + '.jpg'
+        mapping.append({
+            'id': idx,
+            'category': row['category'],
+            'brand': brand,
+            'name': name,
+            'price': props.get('p', 0),
+            'tag': tag,
+            'icon': str(props.get('i', '') or ''),
+            'filename': filename,
+            'path': f"{folder}/{filename}",
+            'existing_img': str(props.get('img', '') or ''),
+            'description': f"{brand} {name} {tag}".strip(),
+        })
+    return mapping
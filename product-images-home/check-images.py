@@ -1,87 +1,237 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-检查product-images文件夹中的图片文件
-统计已上传和未上传的图片数量
+检查三个产品图片文件夹（product-images-home/shop/points）
+只读取图片文件头，多线程并行检查：格式、实际尺寸、渐进式编码、EXIF冗余，
+并统计已上传和未上传的图片数量。
+输出机器可读的JSON和文字摘要，有错误时以非零状态退出，可作为发布前检查。
 """
 
-import os
+import argparse
 import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import imageutil
+import metrics
+import parsecache
+from imageutil import IMAGE_FOLDERS, folder_path, is_image, read_image_header
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+INFO_FILE = os.path.join(SCRIPT_DIR, 'product-images-info.json')
+MISSING_FILE = os.path.join(SCRIPT_DIR, '缺失图片列表.txt')
+
+# 扩展名 -> 实际格式
+EXPECTED_FORMATS = {
+    '.jpg': 'jpeg',
+    '.jpeg': 'jpeg',
+    '.png': 'png',
+    '.webp': 'webp',
+    '.gif': 'gif',
+}
+
+
+def scan_folders(root_dir=None):
+    """一次性扫描三个文件夹（目录未变化时使用缓存的清单），返回 {页面类型: {文件名: (大小, 修改时间ns)}}"""
+    index = {}
+    for page_type in IMAGE_FOLDERS:
+        folder = folder_path(page_type, root_dir)
+        entries = parsecache.list_dir(folder) if os.path.isdir(folder) else []
+        index[page_type] = {name: (size, mtime_ns) for name, size, mtime_ns in entries if is_image(name)}
+    return index
+
+
+def audit_file(page_type, filename, size, exif_limit, root_dir=None, read_header=read_image_header):
+    """检查单个图片文件头，返回问题列表 [(级别, 代码, 说明)]"""
+    _, width, height = IMAGE_FOLDERS[page_type]
+    path = os.path.join(folder_path(page_type, root_dir), filename)
+    issues = []
+    try:
+        info = read_header(path)
+    except OSError as e:
+        return [('error', 'unreadable', str(e))]
+
+    fmt = info['format']
+    if fmt is None:
+        return [('error', 'unknown_format', '无法识别的图片格式')]
+
+    expected = EXPECTED_FORMATS.get(os.path.splitext(filename)[1].lower())
+    if expected and fmt != expected:
+        issues.append(('error', 'format_mismatch', f"扩展名与实际格式 {fmt} 不符"))
 
-def check_images():
-    """检查图片文件"""
-    # 读取产品信息
-    info_file = 'product-images-info.json'
+    if info['width'] is None:
+        issues.append(('error', 'no_dimensions', '文件头中未找到尺寸信息'))
+    elif (info['width'], info['height']) != (width, height):
+        issues.append(('error', 'wrong_size',
+                       f"实际尺寸 {info['width']}×{info['height']}，应为 {width}×{height}"))
+
+    if fmt == 'jpeg' and not info['progressive']:
+        issues.append(('warning', 'baseline_jpeg', '非渐进式JPEG'))
+
+    metadata = info['exif_bytes'] + info['metadata_bytes']
+    if metadata > exif_limit:
+        issues.append(('warning', 'metadata_bloat',
+                       f"元数据 {metadata} 字节（EXIF {info['exif_bytes']}），占文件 {metadata * 100 // max(size, 1)}%"))
+    return issues
+
+
+def _load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_products(info_file=INFO_FILE):
+    """读取产品映射文件，文件名字段兼容 filename / image_filename"""
     if not os.path.exists(info_file):
-        print(f"错误：未找到 {info_file}")
-        print("请先运行 generate-product-list.py 生成产品清单")
-        return
-    
-    with open(info_file, 'r', encoding='utf-8') as f:
-        products = json.load(f)
-    
-    # 检查product-images文件夹
-    images_dir = '../product-images'
-    if not os.path.exists(images_dir):
-        print(f"警告：未找到 {images_dir} 文件夹")
-        print(f"正在创建 {images_dir} 文件夹...")
-        os.makedirs(images_dir, exist_ok=True)
-    
-    # 获取所有图片文件
-    image_files = set()
-    if os.path.exists(images_dir):
-        for file in os.listdir(images_dir):
-            if file.lower().endswith(('.jpg', '.jpeg', '.png', '.webp', '.gif')):
-                image_files.add(file.lower())
-    
-    # 统计
-    total_products = len(products)
-    uploaded_count = 0
-    missing_images = []
-    
-    for product in products:
-        filename = product['image_filename'].lower()
-        if filename in image_files:
-            uploaded_count += 1
-        else:
-            missing_images.append(product)
-    
-    # 输出统计信息
+        return []
+    return parsecache.cached('json', info_file, _load_json)
+
+
+def product_filename(product):
+    return product.get('filename') or product.get('image_filename') or ''
+
+
+def check_images(exif_limit=4096, workers=16, root_dir=None, info_file=INFO_FILE):
+    """检查图片文件，返回报告字典（root_dir/info_file 可指向其他图片目录和映射文件）"""
+    with metrics.stage('scan'):
+        index = scan_folders(root_dir)
+    jobs = [(page_type, filename, size, mtime_ns)
+            for page_type, files in index.items()
+            for filename, (size, mtime_ns) in files.items()]
+    metrics.count('files_scanned', len(jobs))
+
+    # 文件头按 (大小, 修改时间) 缓存，未变化的文件不再打开
+    headers = parsecache.FileResults('image-headers', parsecache.code_signature(imageutil.__file__))
+
+    def audit(job):
+        page_type, filename, size, mtime_ns = job
+        return audit_file(page_type, filename, size, exif_limit, root_dir,
+                          lambda path: headers.get(path, size, mtime_ns, read_image_header))
+
+    with metrics.stage('read_headers'), ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(audit, jobs))
+    headers.prune([folder_path(t, root_dir) for t in index],
+                  [os.path.join(folder_path(t, root_dir), filename) for t, filename, _, _ in jobs])
+    headers.save()
+
+    issues = []
+    for (page_type, filename, size, _), file_issues in zip(jobs, results):
+        for level, code, detail in file_issues:
+            issues.append({
+                'path': f"{IMAGE_FOLDERS[page_type][0]}/{filename}",
+                'level': level,
+                'code': code,
+                'detail': detail,
+            })
+
+    products = load_products(info_file)
+    folders = {}
+    missing = {}
+    for page_type, files in index.items():
+        lower_names = {name.lower() for name in files}
+        missing[page_type] = [p for p in products if product_filename(p).lower() not in lower_names]
+        folders[page_type] = {
+            'folder': IMAGE_FOLDERS[page_type][0],
+            'files': len(files),
+            'bytes': sum(size for size, _ in files.values()),
+            'uploaded': len(products) - len(missing[page_type]),
+            'missing': len(missing[page_type]),
+        }
+
+    counts = {}
+    for issue in issues:
+        counts[issue['code']] = counts.get(issue['code'], 0) + 1
+
+    return {
+        'summary': {
+            'files': len(jobs),
+            'products': len(products),
+            'errors': sum(1 for i in issues if i['level'] == 'error'),
+            'warnings': sum(1 for i in issues if i['level'] == 'warning'),
+            'issue_counts': counts,
+        },
+        'folders': folders,
+        'issues': issues,
+        'missing': {t: [product_filename(p) for p in items] for t, items in missing.items()},
+    }
+
+
+def print_summary(report):
+    """输出文字摘要"""
+    summary = report['summary']
     print("=" * 80)
-    print("图片上传统计")
+    print("图片检查报告")
     print("=" * 80)
-    print(f"\n总产品数: {total_products}")
-    print(f"已上传图片: {uploaded_count}")
-    print(f"未上传图片: {total_products - uploaded_count}")
-    print(f"上传进度: {uploaded_count/total_products*100:.1f}%")
-    
-    if missing_images:
-        print(f"\n未上传图片的产品（前20个）：")
+    print(f"\n图片文件数: {summary['files']}")
+    print(f"总产品数: {summary['products']}")
+
+    for page_type, folder in report['folders'].items():
+        print(f"\n[{folder['folder']}]")
+        print(f"  文件数: {folder['files']}  总大小: {folder['bytes'] / 1024 / 1024:.1f} MB")
+        if summary['products']:
+            print(f"  已上传图片: {folder['uploaded']}  未上传图片: {folder['missing']}"
+                  f"  上传进度: {folder['uploaded'] / summary['products'] * 100:.1f}%")
+
+    print(f"\n错误: {summary['errors']}  警告: {summary['warnings']}")
+    for code, count in sorted(summary['issue_counts'].items()):
+        print(f"  {code}: {count}")
+
+    errors = [i for i in report['issues'] if i['level'] == 'error']
+    if errors:
+        print(f"\n错误详情（前20个）：")
         print("-" * 80)
-        for i, product in enumerate(missing_images[:20], 1):
-            print(f"{i}. {product['brand']} {product['name']}")
-            print(f"   需要文件名: {product['image_filename']}")
-        
-        if len(missing_images) > 20:
-            print(f"\n... 还有 {len(missing_images) - 20} 个产品未上传图片")
-    
+        for issue in errors[:20]:
+            print(f"  {issue['path']}: {issue['detail']}")
+        if len(errors) > 20:
+            print(f"\n  ... 还有 {len(errors) - 20} 个错误")
+
     print("\n" + "=" * 80)
-    
-    # 生成缺失图片列表文件
-    if missing_images:
-        missing_file = '缺失图片列表.txt'
-        with open(missing_file, 'w', encoding='utf-8') as f:
-            f.write("缺失图片列表\n")
-            f.write("=" * 80 + "\n\n")
-            f.write(f"共 {len(missing_images)} 个产品缺少图片\n\n")
-            f.write("-" * 80 + "\n\n")
-            
-            for idx, product in enumerate(missing_images, 1):
-                f.write(f"{idx}. {product['brand']} {product['name']}\n")
-                f.write(f"   需要文件名: {product['image_filename']}\n")
-                f.write(f"   图片路径: {product['image_path']}\n\n")
-        
-        print(f"\n已生成缺失图片列表: {missing_file}")
+
+
+def write_missing_list(report):
+    """生成缺失图片列表文件"""
+    if not any(report['missing'].values()):
+        return
+    with open(MISSING_FILE, 'w', encoding='utf-8') as f:
+        f.write("缺失图片列表\n")
+        f.write("=" * 80 + "\n\n")
+        for page_type, filenames in report['missing'].items():
+            f.write(f"[{IMAGE_FOLDERS[page_type][0]}] 共 {len(filenames)} 个产品缺少图片\n")
+            f.write("-" * 80 + "\n")
+            for idx, filename in enumerate(filenames, 1):
+                f.write(f"{idx}. {filename}\n")
+            f.write("\n")
+    print(f"\n已生成缺失图片列表: {MISSING_FILE}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='检查三个产品图片文件夹的图片')
+    parser.add_argument('--json', metavar='FILE', help="将完整报告写入JSON文件（'-' 表示标准输出）")
+    parser.add_argument('--exif-limit', type=int, default=4096, help='元数据字节数警告阈值（默认4096）')
+    parser.add_argument('--workers', type=int, default=16, help='读取文件头的线程数')
+    parser.add_argument('--strict', action='store_true', help='有警告时也以非零状态退出')
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start('check-images', args)
+
+    report = check_images(args.exif_limit, args.workers)
+
+    if args.json == '-':
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write('\n')
+    else:
+        print_summary(report)
+        write_missing_list(report)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"已生成JSON报告: {args.json}")
+
+    summary = report['summary']
+    if summary['errors'] or (args.strict and summary['warnings']):
+        sys.exit(1)
+
 
 if __name__ == '__main__':
-    check_images()
+    main()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+查找三个产品图片文件夹中的重复和近似重复图片
+多进程计算感知哈希（dHash/pHash），按文件内容哈希缓存；
+用BK树按汉明距离检索近邻，无需两两比较，输出近似重复图片分组。
+同时列出可疑文件名（首尾空格、重复扩展名、KOKO-NN占位图）。
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+from imageutil import IMAGE_FOLDERS, ROOT_DIR, HashCache, folder_path, is_image
+
+HASH_CACHE_FILE = os.path.join(ROOT_DIR, '.image-hash-cache.json')
+PHASH_CACHE_FILE = os.path.join(ROOT_DIR, '.phash-cache.json')
+
+# 首页图片的宽高比，--cross-crop 时所有图片只取中间这一条带计算哈希，便于跨文件夹比较
+HOME_ASPECT = IMAGE_FOLDERS['home'][1] / IMAGE_FOLDERS['home'][2]
+
+_DCT_SIZE = 32
+_DCT = [[math.cos((2 * x + 1) * u * math.pi / (2 * _DCT_SIZE)) for x in range(_DCT_SIZE)]
+        for u in range(8)]
+
+JUNK_NAME_PATTERNS = [
+    ('leading_or_trailing_space', re.compile(r'^\s|\s$|\s(?=\.\w+$)')),
+    ('double_extension', re.compile(r'\.(jpe?g|png|webp|gif)\s*\.\w+$', re.I)),
+    ('placeholder', re.compile(r'^KOKO-\d+\.', re.I)),
+]
+
+
+def _center_band(img):
+    """裁出与首页宽高比一致的中间条带"""
+    width, height = img.size
+    band = int(round(width / HOME_ASPECT))
+    if band >= height:
+        return img
+    top = (height - band) // 2
+    return img.crop((0, top, width, top + band))
+
+
+def _pixels(img):
+    """按行展开的像素列表（兼容新旧版本Pillow）"""
+    getter = getattr(img, 'get_flattened_data', None) or img.getdata
+    return list(getter())
+
+
+def dhash(gray):
+    """差值哈希：9×8灰度图中相邻像素比较，64位"""
+    from PIL import Image
+    pixels = _pixels(gray.resize((9, 8), Image.BILINEAR))
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits
+
+
+def phash(gray):
+    """感知哈希：32×32灰度图做DCT，取左上8×8低频系数与中位数比较，64位"""
+    from PIL import Image
+    pixels = _pixels(gray.resize((_DCT_SIZE, _DCT_SIZE), Image.BILINEAR))
+    # 可分离DCT：先对每行求8个低频系数，再对列求
+    rows = []
+    for x in range(_DCT_SIZE):
+        line = pixels[x * _DCT_SIZE:(x + 1) * _DCT_SIZE]
+        rows.append([sum(c * p for c, p in zip(_DCT[v], line)) for v in range(8)])
+    coeffs = []
+    for u in range(8):
+        basis = _DCT[u]
+        for v in range(8):
+            coeffs.append(sum(basis[x] * rows[x][v] for x in range(_DCT_SIZE)))
+    values = coeffs[1:]
+    median = sorted(values)[len(values) // 2]
+    bits = 0
+    for value in coeffs:
+        bits = (bits << 1) | (value > median)
+    return bits
+
+
+def compute_hashes(path, cross_crop):
+    """子进程：计算单个图片的 (dHash, pHash)"""
+    from PIL import Image
+    with Image.open(path) as img:
+        img.draft('L', (256, 256))
+        gray = img.convert('L')
+    if cross_crop:
+        gray = _center_band(gray)
+    return dhash(gray), phash(gray)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """按汉明距离组织的BK树"""
+
+    def __init__(self):
+        self.root = None
+
+    def add(self, key, item):
+        if self.root is None:
+            self.root = [key, [item], {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(key, node[0])
+            if d == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [key, [item], {}]
+                return
+            node = child
+
+    def search(self, key, radius):
+        """返回所有距离不超过radius的 (距离, 条目)"""
+        if self.root is None:
+            return []
+        result = []
+        stack = [self.root]
+        while stack:
+            node_key, items, children = stack.pop()
+            d = hamming(key, node_key)
+            if d <= radius:
+                result.extend((d, item) for item in items)
+            for child_d, child in children.items():
+                if d - radius <= child_d <= d + radius:
+                    stack.append(child)
+        return result
+
+
+def scan_images():
+    """返回 [(相对路径, 绝对路径)]"""
+    images = []
+    for page_type in IMAGE_FOLDERS:
+        folder = folder_path(page_type)
+        if not os.path.isdir(folder):
+            continue
+        with os.scandir(folder) as it:
+            for entry in it:
+                if entry.is_file() and is_image(entry.name):
+                    images.append((f"{IMAGE_FOLDERS[page_type][0]}/{entry.name}", entry.path))
+    images.sort()
+    return images
+
+
+def load_phash_cache():
+    if os.path.exists(PHASH_CACHE_FILE):
+        with open(PHASH_CACHE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_phash_cache(cache):
+    tmp_file = PHASH_CACHE_FILE + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    os.replace(tmp_file, PHASH_CACHE_FILE)
+
+
+def hash_all(images, cross_crop, jobs):
+    """返回 {相对路径: (dHash, pHash)}，只为缓存中没有的内容计算"""
+    file_hashes = HashCache(HASH_CACHE_FILE)
+    cache = load_phash_cache()
+    mode = 'band' if cross_crop else 'full'
+
+    digests = {rel: file_hashes.sha256(path) for rel, path in images}
+    file_hashes.save()
+
+    pending = {}
+    for rel, path in images:
+        key = f"{mode}:{digests[rel]}"
+        if key not in cache and key not in pending:
+            pending[key] = path
+
+    if pending:
+        print(f"需要计算 {len(pending)} 个图片的感知哈希...")
+        keys = list(pending)
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = pool.map(compute_hashes, [pending[k] for k in keys],
+                               [cross_crop] * len(keys), chunksize=32)
+            for key, (d, p) in zip(keys, results):
+                cache[key] = [format(d, '016x'), format(p, '016x')]
+        save_phash_cache(cache)
+
+    hashes = {}
+    for rel, _ in images:
+        d, p = cache[f"{mode}:{digests[rel]}"]
+        hashes[rel] = (int(d, 16), int(p, 16))
+    return hashes, digests
+
+
+def find_clusters(hashes, algorithm, radius):
+    """用BK树检索近邻并用并查集合并成组"""
+    which = 0 if algorithm == 'dhash' else 1
+    tree = BKTree()
+    for rel, pair in hashes.items():
+        tree.add(pair[which], rel)
+
+    parent = {rel: rel for rel in hashes}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for rel, pair in hashes.items():
+        for _, other in tree.search(pair[which], radius):
+            if other != rel:
+                a, b = find(rel), find(other)
+                if a != b:
+                    parent[a] = b
+
+    groups = {}
+    for rel in hashes:
+        groups.setdefault(find(rel), []).append(rel)
+    clusters = [sorted(members) for members in groups.values() if len(members) > 1]
+    clusters.sort(key=lambda members: (-len(members), members[0]))
+    return clusters
+
+
+def junk_names(images):
+    """列出可疑文件名"""
+    result = []
+    for rel, _ in images:
+        filename = rel.split('/', 1)[1]
+        for code, pattern in JUNK_NAME_PATTERNS:
+            if pattern.search(filename):
+                result.append({'path': rel, 'code': code})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='查找重复和近似重复的产品图片')
+    parser.add_argument('--algorithm', choices=['dhash', 'phash'], default='phash', help='用于分组的哈希算法')
+    parser.add_argument('--radius', type=int, default=6, help='汉明距离阈值（默认6）')
+    parser.add_argument('--cross-crop', action='store_true', help='只用首页比例的中间条带计算，便于跨文件夹比较')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='并行进程数')
+    parser.add_argument('--json', metavar='FILE', help='将完整结果写入JSON文件')
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start('find-duplicate-images', args)
+
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("PIL/Pillow not installed. Please install it with: pip3 install Pillow")
+        return
+
+    print("正在扫描图片文件夹...")
+    with metrics.stage('scan'):
+        images = scan_images()
+    metrics.count('files_scanned', len(images))
+    print(f"找到 {len(images)} 个图片文件")
+
+    with metrics.stage('perceptual_hash'):
+        hashes, digests = hash_all(images, args.cross_crop, args.jobs)
+    with metrics.stage('cluster'):
+        clusters = find_clusters(hashes, args.algorithm, args.radius)
+    sizes = {rel: os.path.getsize(path) for rel, path in images}
+
+    report = []
+    reclaimable = 0
+    for members in clusters:
+        identical = len({digests[m] for m in members}) == 1
+        keep = max(members, key=lambda m: sizes[m])
+        saved = sum(sizes[m] for m in members if m != keep)
+        reclaimable += saved
+        report.append({'files': members, 'identical': identical, 'bytes_reclaimable': saved})
+
+    junk = junk_names(images)
+
+    print(f"\n发现 {len(clusters)} 组近似重复图片（{args.algorithm}，距离 ≤ {args.radius}）")
+    print(f"涉及 {sum(len(c) for c in clusters)} 个文件，可节省约 {reclaimable / 1024 / 1024:.1f} MB")
+    for item in report[:20]:
+        label = '完全相同' if item['identical'] else '近似'
+        print(f"\n  [{label}] {len(item['files'])} 个文件")
+        for rel in item['files'][:6]:
+            print(f"    - {rel}")
+        if len(item['files']) > 6:
+            print(f"    ... 还有 {len(item['files']) - 6} 个")
+    if len(report) > 20:
+        print(f"\n  ... 还有 {len(report) - 20} 组")
+
+    if junk:
+        print(f"\n可疑文件名 {len(junk)} 个：")
+        for item in junk[:20]:
+            print(f"  - [{item['code']}] '{item['path']}'")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'algorithm': args.algorithm,
+                'radius': args.radius,
+                'cross_crop': args.cross_crop,
+                'bytes_reclaimable': reclaimable,
+                'clusters': report,
+                'junk_names': junk,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n已生成JSON报告: {args.json}")
+
+
+if __name__ == '__main__':
+    main()
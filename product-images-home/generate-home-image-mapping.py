@@ -5,77 +5,38 @@
 从index.html中提取所有产品数据，生成图片文件名和映射信息
 """
 
+import argparse
 import json
-import re
 import os
 
+import catalog
+import metrics
+import productid
+
 def extract_products_from_html(html_file):
-    """从HTML文件中提取产品数据"""
-    with open(html_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # 查找SD对象定义
-    pattern = r"const SD = \{([\s\S]*?)\};"
-    match = re.search(pattern, content)
-    if not match:
+    """从HTML文件中提取产品数据（SD对象中的全部分类）"""
+    products = catalog.load_products(html_file, source='SD')
+    if not products:
         print("未找到产品数据SD对象")
         return []
     
-    sd_content = match.group(1)
-    
-    # 解析各个分类的产品
-    products = []
-    categories = ['ph', 'sp', 'fa', 'li', 'di', 'sh', 'be', 'fu', 'bk', 'fit', 'toy', 'car', 'mus']
-    
-    for cat in categories:
-        # 匹配每个分类的数组
-        cat_pattern = rf"'{cat}':\s*\[([\s\S]*?)\]"
-        cat_match = re.search(cat_pattern, sd_content)
-        if cat_match:
-            cat_products_str = cat_match.group(1)
-            # 匹配每个产品对象
-            product_pattern = r"\{\s*b:\s*\"([^\"]*)\",\s*n:\s*\"([^\"]*)\",\s*p:\s*(\d+)(?:,\s*t:\s*\"([^\"]*)\")?(?:,\s*i:\s*\"([^\"]*)\")?(?:,\s*img:\s*\"([^\"]*)\")?\s*\}"
-            for prod_match in re.finditer(product_pattern, cat_products_str):
-                brand = prod_match.group(1)
-                name = prod_match.group(2)
-                price = int(prod_match.group(3))
-                tag = prod_match.group(4) if prod_match.group(4) else ""
-                icon = prod_match.group(5) if prod_match.group(5) else ""
-                existing_img = prod_match.group(6) if prod_match.group(6) else ""
-                
-                products.append({
-                    'category': cat,
-                    'brand': brand,
-                    'name': name,
-                    'price': price,
-                    'tag': tag,
-                    'icon': icon,
-                    'existing_img': existing_img
-                })
-    
-    return products
+    return [{
+        'category': p.category,
+        'brand': p.brand,
+        'name': p.name,
+        'price': p.price,
+        'tag': p.tag,
+        'icon': p.icon,
+        'existing_img': p.img
+    } for p in products]
 
 def generate_filename(brand, name):
     """生成图片文件名（与getProductImagePath函数逻辑一致）"""
-    product_id = (brand + '_' + name).lower()
-    # 移除不允许的字符
-    product_id = re.sub(r'[<>:"/\\|?*]', '', product_id)
-    # 替换空格为下划线
-    product_id = re.sub(r'\s+', '_', product_id)
-    return f"{product_id}.jpg"
+    return productid.image_filename(brand, name)
 
-def main():
-    html_file = '../index.html'
-    output_dir = '.'
-    
-    print("正在提取产品数据...")
-    products = extract_products_from_html(html_file)
-    print(f"找到 {len(products)} 个产品")
-    
-    # 生成映射数据
+def build_mapping(products):
+    """按产品顺序生成映射数据"""
     mapping = []
-    filename_list = []
-    
     for idx, product in enumerate(products, 1):
         filename = generate_filename(product['brand'], product['name'])
         full_path = f"product-images-home/{filename}"
@@ -93,16 +54,33 @@ def main():
             'existing_img': product['existing_img'],
             'description': f"{product['brand']} {product['name']} {product['tag']}".strip()
         })
-        
-        filename_list.append({
-            'filename': filename,
-            'description': f"{product['brand']} {product['name']} {product['tag']}".strip(),
-            'price': product['price']
-        })
+    return mapping
+
+def main():
+    parser = argparse.ArgumentParser(description='生成首页产品图片映射文件')
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start('generate-home-image-mapping', args)
+
+    html_file = '../index.html'
+    output_dir = '.'
+    
+    print("正在提取产品数据...")
+    products = extract_products_from_html(html_file)
+    print(f"找到 {len(products)} 个产品")
+    
+    # 生成映射数据
+    with metrics.stage('build_mapping'):
+        mapping = build_mapping(products)
+    filename_list = [{
+        'filename': item['filename'],
+        'description': item['description'],
+        'price': item['price']
+    } for item in mapping]
     
     # 保存映射文件
     mapping_file = os.path.join(output_dir, 'product-images-info.json')
-    with open(mapping_file, 'w', encoding='utf-8') as f:
+    with metrics.stage('write'), open(mapping_file, 'w', encoding='utf-8') as f:
         json.dump(mapping, f, ensure_ascii=False, indent=2)
     print(f"已保存映射文件: {mapping_file}")
     
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成图片内容哈希清单 image-manifest.json
+对三个 product-images-* 文件夹中的每个图片计算内容哈希，
+并按优先级在字节预算内生成Service Worker预缓存列表。
+sw.js 读取该清单，只下载有变化的图片、只删除已失效的缓存。
+"""
+
+import argparse
+import hashlib
+import json
+import os
+
+import metrics
+from imageutil import IMAGE_FOLDERS, ROOT_DIR, HashCache, folder_path, is_image
+
+MANIFEST_FILE = os.path.join(ROOT_DIR, 'image-manifest.json')
+HASH_CACHE_FILE = os.path.join(ROOT_DIR, '.image-hash-cache.json')
+MAPPING_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'product-images-info.json')
+
+# 预缓存的文件夹优先级：首页首屏最先显示
+FOLDER_PRIORITY = ['home', 'shop', 'points']
+
+
+def load_product_order(mapping_file):
+    """读取产品映射文件，返回 {图片文件名: 产品顺序}"""
+    if not os.path.exists(mapping_file):
+        return {}
+    with open(mapping_file, 'r', encoding='utf-8') as f:
+        mapping = json.load(f)
+    order = {}
+    for idx, item in enumerate(mapping):
+        filename = item.get('filename') or item.get('image_filename')
+        if filename and filename not in order:
+            order[filename] = idx
+    return order
+
+
+def scan_folders(hash_cache):
+    """扫描三个图片文件夹，返回 [(页面类型, 相对路径, 文件名, 大小, 哈希)]"""
+    entries = []
+    for page_type in IMAGE_FOLDERS:
+        folder = folder_path(page_type)
+        if not os.path.isdir(folder):
+            continue
+        with os.scandir(folder) as it:
+            for entry in it:
+                if not entry.is_file() or not is_image(entry.name):
+                    continue
+                st = entry.stat()
+                digest = hash_cache.sha256(entry.path, st)
+                rel_path = f"{IMAGE_FOLDERS[page_type][0]}/{entry.name}"
+                entries.append((page_type, rel_path, entry.name, st.st_size, digest))
+    return entries
+
+
+def build_precache(entries, product_order, budget):
+    """按 文件夹优先级 -> 产品顺序 选取预缓存文件，总大小不超过budget字节"""
+    candidates = [e for e in entries if e[2] in product_order]
+    candidates.sort(key=lambda e: (FOLDER_PRIORITY.index(e[0]), product_order[e[2]]))
+    precache = []
+    used = 0
+    for page_type, rel_path, filename, size, digest in candidates:
+        if used + size > budget:
+            continue
+        precache.append(rel_path)
+        used += size
+    return precache, used
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成图片内容哈希清单和预缓存列表')
+    parser.add_argument('--budget-mb', type=float, default=15, help='预缓存字节预算（MB，默认15）')
+    parser.add_argument('--output', default=MANIFEST_FILE, help='输出文件（默认 ../image-manifest.json）')
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start('generate-image-manifest', args)
+
+    print("正在扫描图片文件夹...")
+    hash_cache = HashCache(HASH_CACHE_FILE)
+    with metrics.stage('scan_and_hash'):
+        entries = scan_folders(hash_cache)
+        hash_cache.save()
+    metrics.count('files_scanned', len(entries))
+    print(f"找到 {len(entries)} 个图片文件")
+
+    product_order = load_product_order(MAPPING_FILE)
+    print(f"加载了 {len(product_order)} 个产品的映射信息")
+
+    budget = int(args.budget_mb * 1024 * 1024)
+    precache, used = build_precache(entries, product_order, budget)
+
+    files = {rel_path: digest[:16] for _, rel_path, _, _, digest in sorted(entries, key=lambda e: e[1])}
+    version = hashlib.sha256(json.dumps(files, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    manifest = {
+        'version': version,
+        'files': files,
+        'precache': precache,
+    }
+
+    with metrics.stage('write'):
+        tmp_file = args.output + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_file, args.output)
+    metrics.count('bytes_written', os.path.getsize(args.output))
+
+    print(f"\n已生成: {args.output}")
+    print(f"清单版本: {version}")
+    print(f"预缓存 {len(precache)} 个文件，共 {used / 1024 / 1024:.1f} MB（预算 {args.budget_mb} MB）")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,43 +5,23 @@
 提取所有产品信息，生成图片文件名清单和详细信息
 """
 
+import argparse
 import json
-import re
 import os
 
-# 读取HTML文件中的产品数据
+import catalog
+import metrics
+import productid
+
+def generate_product_id(brand, name):
+    """生成产品ID（与HTML中的getProductImagePath函数保持一致）"""
+    return productid.product_id(brand, name)
+
 def extract_products_from_html(html_file):
     """从HTML文件中提取产品数据"""
-    with open(html_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # 查找SD对象定义
-    pattern = r'const SD = ({.*?});'
-    match = re.search(pattern, content, re.DOTALL)
-    if not match:
-        print("未找到产品数据")
-        return []
-    
-    # 解析JavaScript对象（简化版，实际需要更复杂的解析）
-    # 这里我们直接提取产品信息
     products = []
-    
-    # 匹配产品对象模式: { b: "品牌", n: "名称", p: 价格, t: "标签", i: "图标", img: "图片" }
-    product_pattern = r'\{[^}]*b:\s*"([^"]*)",\s*n:\s*"([^"]*)",\s*p:\s*(\d+),\s*t:\s*"([^"]*)",\s*i:\s*"([^"]*)"(?:\s*,\s*img:\s*"([^"]*)")?\s*\}'
-    
-    matches = re.finditer(product_pattern, content)
-    for match in matches:
-        brand = match.group(1)
-        name = match.group(2)
-        price = int(match.group(3))
-        tag = match.group(4)
-        icon = match.group(5)
-        img = match.group(6) if match.group(6) else ""
-        
-        # 生成产品ID（与HTML中的getProductImagePath函数保持一致）
-        product_id = (brand + '_' + name).lower().replace(' ', '_')
-        product_id = re.sub(r'[<>:"/\\|?*]', '', product_id)
-        product_id = re.sub(r'\s+', '_', product_id)
+    for p in catalog.load_products(html_file, source='SD'):
+        product_id = generate_product_id(p.brand, p.name)
         
         # 生成图片文件名
         image_filename = f"{product_id}.jpg"
@@ -49,26 +29,25 @@ def extract_products_from_html(html_file):
         
         products.append({
             'id': product_id,
-            'brand': brand,
-            'name': name,
-            'price': price,
-            'tag': tag,
-            'icon': icon,
-            'current_img': img,
+            'category': p.category,
+            'brand': p.brand,
+            'name': p.name,
+            'price': p.price,
+            'tag': p.tag,
+            'icon': p.icon,
+            'current_img': p.img,
             'image_filename': image_filename,
             'image_path': image_path
         })
     
     return products
 
-def generate_product_id(brand, name):
-    """生成产品ID（与HTML中的getProductImagePath函数保持一致）"""
-    product_id = (brand + '_' + name).lower().replace(' ', '_')
-    product_id = re.sub(r'[<>:"/\\|?*]', '', product_id)
-    product_id = re.sub(r'\s+', '_', product_id)
-    return product_id
-
 def main():
+    parser = argparse.ArgumentParser(description='生成首页产品图片信息文件')
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start('generate-product-list', args)
+
     html_file = '../index.html'
     output_dir = '.'
     
@@ -76,69 +55,14 @@ def main():
     products = extract_products_from_html(html_file)
     
     if not products:
-        print("未找到产品数据，尝试直接读取HTML中的SD对象...")
-        # 如果正则匹配失败，尝试读取HTML并手动解析
-        with open(html_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # 查找所有产品数据行
-        products = []
-        lines = content.split('\n')
-        in_sd = False
-        current_category = None
-        
-        for i, line in enumerate(lines):
-            if "const SD = {" in line:
-                in_sd = True
-                continue
-            if in_sd and line.strip().startswith("'") and ':' in line:
-                # 分类行，如 'ph': [
-                category_match = re.search(r"'(\w+)':\s*\[", line)
-                if category_match:
-                    current_category = category_match.group(1)
-                    continue
-            if in_sd and '{' in line and 'b:' in line:
-                # 产品行
-                # 匹配: { b: "品牌", n: "名称", p: 价格, t: "标签", i: "图标" }
-                brand_match = re.search(r'b:\s*"([^"]*)"', line)
-                name_match = re.search(r'n:\s*"([^"]*)"', line)
-                price_match = re.search(r'p:\s*(\d+)', line)
-                tag_match = re.search(r't:\s*"([^"]*)"', line)
-                icon_match = re.search(r'i:\s*"([^"]*)"', line)
-                img_match = re.search(r'img:\s*"([^"]*)"', line)
-                
-                if brand_match and name_match and price_match:
-                    brand = brand_match.group(1)
-                    name = name_match.group(1)
-                    price = int(price_match.group(1))
-                    tag = tag_match.group(1) if tag_match else ""
-                    icon = icon_match.group(1) if icon_match else ""
-                    img = img_match.group(1) if img_match else ""
-                    
-                    product_id = generate_product_id(brand, name)
-                    image_filename = f"{product_id}.jpg"
-                    image_path = f"product-images/{image_filename}"
-                    
-                    products.append({
-                        'id': product_id,
-                        'category': current_category or '',
-                        'brand': brand,
-                        'name': name,
-                        'price': price,
-                        'tag': tag,
-                        'icon': icon,
-                        'current_img': img,
-                        'image_filename': image_filename,
-                        'image_path': image_path
-                    })
-            if in_sd and line.strip() == '};':
-                break
+        print("未找到产品数据")
+        return
     
     print(f"找到 {len(products)} 个产品")
     
     # 生成JSON文件
     json_file = os.path.join(output_dir, 'product-images-info.json')
-    with open(json_file, 'w', encoding='utf-8') as f:
+    with metrics.stage('write'), open(json_file, 'w', encoding='utf-8') as f:
         json.dump(products, f, ensure_ascii=False, indent=2)
     print(f"已生成: {json_file}")
     
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+查看和回滚 index.html 的修改日志（由 auto-update-html-images.py 写入）
+  list      列出每次运行：编号、时间、工具、涉及的产品数和修改字节数（默认）
+  show N    显示第N次运行涉及的产品和每处修改
+  rollback N  撤销第N次之后的所有运行（N为最早编号减1时撤销全部记录）；回滚本身也会记录，可再次撤销
+  compact   只保留最近的记录（--keep，默认100），更早的状态不再可回滚
+
+示例：
+  python3 html-history.py list
+  python3 html-history.py rollback 12 --dry-run
+"""
+
+import argparse
+
+import catalog
+import htmljournal
+import metrics
+
+
+def _short(data, limit=100):
+    text = data.decode('utf-8', 'replace').replace('\n', '\\n')
+    return text if len(text) <= limit else text[:limit] + '…'
+
+
+def cmd_list(records, args):
+    if not records:
+        print("没有修改记录")
+        return
+    print(f"{'编号':>5}  {'时间':<20}{'类型':<10}{'产品':>6}{'修改字节':>10}  工具")
+    for record in records[-args.limit:]:
+        print(f"{record['id']:>5}  {record['time']:<20}{record['kind']:<10}{len(record['products']):>6}"
+              f"{htmljournal.delta_size(record):>10}  {record['tool']}")
+    if len(records) > args.limit:
+        print(f"... 更早的 {len(records) - args.limit} 条未显示（--limit）")
+    print(f"最早可回滚到 {records[0]['id'] - 1}（即第 {records[0]['id']} 次运行之前）")
+
+
+def cmd_show(records, args):
+    record = next((r for r in records if r['id'] == args.id), None)
+    if record is None:
+        print(f"错误: 没有第 {args.id} 次运行的记录")
+        return
+    print(f"#{record['id']} {record['time']} {record['kind']} {record['tool']}")
+    print(f"内容哈希: {record['before'][:16]} -> {record['after'][:16]}")
+    print(f"涉及 {len(record['products'])} 个产品：")
+    for name in record['products'][:args.limit]:
+        print(f"  - {name}")
+    edits = [edit for step in record['steps'] for edit in step]
+    print(f"\n{len(edits)} 处修改：")
+    for start, old, new in edits[:args.limit]:
+        print(f"  @{start}\n    - {_short(old)}\n    + {_short(new)}")
+    if len(edits) > args.limit:
+        print(f"  ... 还有 {len(edits) - args.limit} 处")
+
+
+def cmd_rollback(records, args):
+    try:
+        undone = htmljournal.rollback(args.html, args.id, args.dry_run)
+    except htmljournal.JournalError as e:
+        print(f"错误: {e}")
+        raise SystemExit(1)
+    label = '将撤销' if args.dry_run else '已撤销'
+    print(f"{label} {len(undone)} 次运行（#{undone[0]['id']} - #{undone[-1]['id']}），"
+          f"涉及 {len({name for record in undone for name in record['products']})} 个产品")
+    if not args.dry_run:
+        state = f"第 {args.id} 次运行之后" if args.id else "第 1 次运行之前"
+        print(f"{args.html} 已恢复到{state}的状态")
+
+
+def cmd_compact(records, args):
+    removed = htmljournal.compact(args.html, args.keep)
+    print(f"已删除 {removed} 条较早的记录，保留 {min(len(records), args.keep)} 条")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='查看和回滚index.html的修改日志')
+    parser.add_argument('--html', default=catalog.HTML_FILE, help='HTML文件（默认 ../index.html）')
+    parser.add_argument('--limit', type=int, default=30, help='最多显示的条数（默认30）')
+    metrics.add_arguments(parser)
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('list', help='列出修改记录')
+    p = commands.add_parser('show', help='显示某次运行的修改')
+    p.add_argument('id', type=int)
+    p = commands.add_parser('rollback', help='回滚到某次运行之后的状态')
+    p.add_argument('id', type=int)
+    p.add_argument('--dry-run', action='store_true', help='只检查能否回滚，不修改文件')
+    p = commands.add_parser('compact', help='删除较早的记录')
+    p.add_argument('--keep', type=int, default=htmljournal.KEEP_RECORDS,
+                   help=f'保留的记录数（默认{htmljournal.KEEP_RECORDS}）')
+    args = parser.parse_args()
+    metrics.start('html-history', args)
+
+    records = htmljournal.load(args.html)
+    {None: cmd_list, 'list': cmd_list, 'show': cmd_show, 'rollback': cmd_rollback,
+     'compact': cmd_compact}[args.command](records, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTML修改日志共享模块（取代每次整份复制的 index.html.backup）
+每次写回HTML时只追加一条记录：时间、工具、涉及的产品、修改前后的内容哈希，
+以及每处修改的 (位置, 原内容, 新内容)。记录可以正向重放，也可以反向撤销，
+因此可以回滚到任意一次运行之后的状态，读取的数据量只与修改量有关。
+回滚本身也作为一条记录追加，可以再次撤销。
+
+日志保存在 ../.html-journal/<文件名>-<路径哈希>.journal，每条记录为 4字节长度 + zlib压缩的pickle；
+记录数超过 MAX_RECORDS 时自动压缩，只保留最近 KEEP_RECORDS 条（更早的状态不再可回滚）。
+"""
+
+import collections
+import hashlib
+import os
+import pickle
+import struct
+import time
+import zlib
+
+import catalog
+import metrics
+from imageutil import ROOT_DIR, file_sha256
+
+JOURNAL_DIR = os.path.join(ROOT_DIR, '.html-journal')
+MAX_RECORDS = 200
+KEEP_RECORDS = 100
+
+_LENGTH = struct.Struct('>I')
+
+
+class JournalError(Exception):
+    pass
+
+
+def journal_file(html_file):
+    path = os.path.abspath(html_file)
+    key = hashlib.sha1(path.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(JOURNAL_DIR, f'{os.path.basename(path)}-{key}.journal')
+
+
+def _encode(record):
+    data = zlib.compress(pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL))
+    return _LENGTH.pack(len(data)) + data
+
+
+def load(html_file):
+    """按顺序返回全部记录；末尾写了一半的记录（进程被中断）忽略"""
+    try:
+        with open(journal_file(html_file), 'rb') as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return []
+    records = []
+    pos = 0
+    while pos + _LENGTH.size <= len(raw):
+        (length,) = _LENGTH.unpack_from(raw, pos)
+        chunk = raw[pos + _LENGTH.size:pos + _LENGTH.size + length]
+        if len(chunk) < length:
+            break
+        try:
+            records.append(pickle.loads(zlib.decompress(chunk)))
+        except (zlib.error, pickle.UnpicklingError, EOFError):
+            break
+        pos += _LENGTH.size + length
+    return records
+
+
+def _rewrite(html_file, records):
+    path = journal_file(html_file)
+    tmp_file = path + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        for record in records:
+            f.write(_encode(record))
+    os.replace(tmp_file, path)
+
+
+def _tail(html_file):
+    """只读每条记录的4字节长度前缀，返回 (记录数, 最后一条记录, 有效数据末尾)；
+    只解压最后一条记录，不随日志变长而变慢"""
+    offsets = []
+    pos = 0
+    try:
+        f = open(journal_file(html_file), 'rb')
+    except FileNotFoundError:
+        return 0, None, 0
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        while pos + _LENGTH.size <= size:
+            f.seek(pos)
+            (length,) = _LENGTH.unpack(f.read(_LENGTH.size))
+            if pos + _LENGTH.size + length > size:
+                break
+            offsets.append(pos)
+            pos += _LENGTH.size + length
+        if not offsets:
+            return 0, None, 0
+        f.seek(offsets[-1])
+        (length,) = _LENGTH.unpack(f.read(_LENGTH.size))
+        try:
+            return len(offsets), pickle.loads(zlib.decompress(f.read(length))), pos
+        except (zlib.error, pickle.UnpicklingError, EOFError):
+            pass
+    # 中间有损坏的记录：与 load 一致，只认损坏处之前的记录
+    records = load(html_file)
+    return len(records), records[-1] if records else None, offsets[len(records)]
+
+
+def _append(html_file, record):
+    count, last, end = _tail(html_file)
+    record['id'] = last['id'] + 1 if last else 1
+    os.makedirs(JOURNAL_DIR, exist_ok=True)
+    if count + 1 > MAX_RECORDS:
+        _rewrite(html_file, load(html_file)[-(KEEP_RECORDS - 1):] + [record])
+    else:
+        with open(journal_file(html_file), 'ab') as f:
+            # 去掉末尾写了一半的记录，否则新记录接在后面会读不到
+            f.truncate(end)
+            f.write(_encode(record))
+    metrics.count('journal_bytes', len(_encode(record)))
+    return record
+
+
+def compact(html_file, keep=KEEP_RECORDS):
+    """只保留最近 keep 条记录，返回删除的记录数"""
+    records = load(html_file)
+    if len(records) <= keep:
+        return 0
+    _rewrite(html_file, records[-keep:] if keep else [])
+    return len(records) - keep
+
+
+def delta_size(record):
+    """记录中修改内容的字节数（原内容+新内容）"""
+    return sum(len(old) + len(new) for step in record['steps'] for _, old, new in step)
+
+
+def _invert(step):
+    """把一组修改变成从修改后内容恢复原内容的修改（位置换算为修改后内容中的偏移）"""
+    inverted = []
+    shift = 0
+    for start, old, new in step:
+        inverted.append((start + shift, new, old))
+        shift += len(new) - len(old)
+    return inverted
+
+
+def _move(pieces, length, out):
+    """从片段表 pieces 开头取出 length 字节交给 out（必要时拆分片段）"""
+    while length > 0:
+        if not pieces:
+            raise JournalError('修改位置超出文件范围，日志可能已损坏')
+        piece = pieces.popleft()
+        size = len(piece) if isinstance(piece, bytes) else piece[1] - piece[0]
+        if size > length:
+            if isinstance(piece, bytes):
+                piece, rest = piece[:length], piece[length:]
+            else:
+                piece, rest = (piece[0], piece[0] + length), (piece[0] + length, piece[1])
+            pieces.appendleft(rest)
+            size = length
+        out(piece)
+        length -= size
+
+
+def _splice(pieces, step, data):
+    """在片段表上应用一组按位置排序的修改并核对原内容，返回新的片段表
+    片段为当前文件中的区间 (起点, 终点) 或新内容 bytes，只有修改涉及的字节会被读出"""
+    pieces = collections.deque(pieces)
+    result = []
+    pos = 0
+    for start, old, new in step:
+        if start < pos:
+            raise JournalError('修改位置重叠，日志可能已损坏')
+        _move(pieces, start - pos, result.append)
+        removed = []
+        _move(pieces, len(old), lambda piece: removed.append(
+            piece if isinstance(piece, bytes) else data[piece[0]:piece[1]]))
+        if b''.join(removed) != old:
+            raise JournalError('HTML内容与修改记录不一致，日志可能已损坏')
+        if new:
+            result.append(new)
+        pos = start + len(old)
+    result.extend(pieces)
+    return result
+
+
+def _compose(pieces, data):
+    """把片段表换算成针对当前文件的、按位置排序的修改 [(起点, 终点, 新内容)]"""
+    edits = []
+    pos = 0
+    pending = []
+    for piece in pieces:
+        if isinstance(piece, bytes):
+            pending.append(piece)
+            continue
+        if piece[0] != pos or pending:
+            edits.append((pos, piece[0], b''.join(pending)))
+            pending = []
+        pos = piece[1]
+    if pos != len(data) or pending:
+        edits.append((pos, len(data), b''.join(pending)))
+    return edits
+
+
+def write_edits(html_file, edits, products=(), tool=''):
+    """用 catalog.write_edits 写回HTML，并追加一条可撤销的记录，返回该记录"""
+    with catalog.map_html(html_file) as data:
+        before = hashlib.sha256(data).hexdigest()
+        step = [(start, bytes(data[start:end]), bytes(replacement)) for start, end, replacement in edits]
+    catalog.write_edits(html_file, edits)
+    return _append(html_file, {
+        'kind': 'update',
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'tool': tool,
+        'products': list(products),
+        'before': before,
+        'after': file_sha256(html_file),
+        'steps': [step],
+    })
+
+
+def rollback(html_file, target_id, dry_run=False):
+    """撤销 target_id 之后的全部运行，使HTML恢复到第 target_id 次运行之后的状态
+    （target_id 为最早记录的id减1时恢复到最早记录之前）；返回被撤销的记录列表"""
+    records = load(html_file)
+    if not records:
+        raise JournalError('没有修改记录')
+    earliest = records[0]['id'] - 1
+    if target_id < earliest:
+        raise JournalError(f'第 {target_id} 次之前的记录已被压缩，最早只能回滚到 {earliest}')
+    undone = [record for record in records if record['id'] > target_id]
+    if not undone:
+        raise JournalError(f'第 {target_id} 次之后没有修改记录')
+    for older, newer in zip(undone, undone[1:]):
+        if older['after'] != newer['before']:
+            raise JournalError(f"第 {older['id']} 次与第 {newer['id']} 次运行之间HTML被其他工具修改过，无法跨过该处回滚")
+
+    # 在片段表上逐步撤销（内存只与修改量有关），合成一组针对当前文件的修改，最后一次流式写回
+    with catalog.map_html(html_file) as data:
+        if hashlib.sha256(data).hexdigest() != undone[-1]['after']:
+            raise JournalError(f"{html_file} 在第 {undone[-1]['id']} 次运行之后被其他工具修改过，无法回滚")
+        pieces = [(0, len(data))] if len(data) else []
+        for record in reversed(undone):
+            for step in reversed(record['steps']):
+                pieces = _splice(pieces, _invert(step), data)
+        digest = hashlib.sha256()
+        with memoryview(data) as view:
+            for piece in pieces:
+                digest.update(piece if isinstance(piece, bytes) else view[piece[0]:piece[1]])
+        if digest.hexdigest() != undone[0]['before']:
+            raise JournalError('回滚结果与记录的哈希不一致，日志可能已损坏')
+        edits = _compose(pieces, data)
+        step = [(start, bytes(data[start:end]), replacement) for start, end, replacement in edits]
+    if dry_run:
+        return undone
+
+    catalog.write_edits(html_file, edits)
+    products = []
+    for record in undone:
+        products.extend(name for name in record['products'] if name not in products)
+    _append(html_file, {
+        'kind': 'rollback',
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'tool': f'rollback {target_id}',
+        'products': products,
+        'before': undone[-1]['after'],
+        'after': undone[0]['before'],
+        'steps': [step],
+    })
+    return undone
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+三个产品图片文件夹的内容寻址存储
+每种图片内容只在 ../.image-store/objects/<哈希前2位>/<sha256><扩展名> 保存一份，
+product-images-*/<id>.jpg 保留为指向该内容的硬链接（文件系统不支持时用 --symlink 改为相对符号链接），
+getProductImagePath 使用的路径不变。
+
+命令：
+  status  统计文件数、不同内容数、实际占用和可节省的空间（默认）
+  ingest  把文件夹中的图片收入存储，相同内容的文件合并为同一份
+  gc      删除已没有任何文件引用的内容（例如图片被重新优化或删除后留下的旧版本）
+  verify  重新计算存储中每份内容的哈希，找出被原地修改过的内容
+
+其他脚本用临时文件+替换的方式写图片时，会断开硬链接，文件恢复为独立副本；
+再次运行 ingest 即可重新合并，旧内容由 gc 回收。
+同步到设备时用 rsync -H 可保留硬链接，只传输不同的内容。
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from imageutil import IMAGE_FOLDERS, ROOT_DIR, HashCache, file_sha256, folder_path, is_image
+
+HASH_CACHE_FILE = os.path.join(ROOT_DIR, '.image-hash-cache.json')
+STORE_DIR = os.path.join(ROOT_DIR, '.image-store')
+OBJECTS_DIR = os.path.join(STORE_DIR, 'objects')
+
+
+def blob_path(digest, ext):
+    """内容对应的存储路径（扩展名统一为小写，符号链接模式下服务器仍能识别类型）"""
+    return os.path.join(OBJECTS_DIR, digest[:2], digest + ext.lower())
+
+
+def scan_blobs():
+    """返回存储中的全部内容 {(设备, inode): (路径, 大小)}"""
+    blobs = {}
+    if not os.path.isdir(OBJECTS_DIR):
+        return blobs
+    for prefix in os.scandir(OBJECTS_DIR):
+        if not prefix.is_dir():
+            continue
+        for entry in os.scandir(prefix.path):
+            if entry.is_file(follow_symlinks=False) and not entry.name.endswith('.tmp'):
+                st = entry.stat(follow_symlinks=False)
+                blobs[(st.st_dev, st.st_ino)] = (entry.path, st.st_size)
+    return blobs
+
+
+def scan_images(page_types):
+    """返回 [(页面类型, os.DirEntry)]，包括指向存储的符号链接"""
+    images = []
+    for page_type in page_types:
+        folder = folder_path(page_type)
+        if not os.path.isdir(folder):
+            continue
+        with os.scandir(folder) as it:
+            for entry in it:
+                if is_image(entry.name) and not entry.name.startswith('.') and entry.is_file():
+                    images.append((page_type, entry))
+    images.sort(key=lambda item: item[1].path)
+    return images
+
+
+def classify(images, blobs):
+    """把每个图片文件归类为 linked（硬链接到存储）、symlink（符号链接到存储）或 loose（独立文件）
+    返回 {路径: (类别, 存储路径或None, os.stat_result)}"""
+    objects_dir = os.path.realpath(OBJECTS_DIR) + os.sep
+    result = {}
+    for _, entry in images:
+        if entry.is_symlink():
+            target = os.path.realpath(entry.path)
+            st = os.stat(target)
+            kind = 'symlink' if target.startswith(objects_dir) else 'loose'
+            result[entry.path] = (kind, target if kind == 'symlink' else None, st)
+            continue
+        st = entry.stat(follow_symlinks=False)
+        blob = blobs.get((st.st_dev, st.st_ino))
+        result[entry.path] = ('linked', blob[0], st) if blob else ('loose', None, st)
+    return result
+
+
+def hash_files(paths, cache, workers):
+    """并行计算文件哈希（已缓存的直接返回），返回 {路径: sha256}"""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(paths, pool.map(cache.sha256, paths)))
+
+
+def _replace_with_link(blob, path, symlink):
+    """用指向存储内容的链接原子替换 path"""
+    tmp_path = path + '.tmp'
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    if symlink:
+        os.symlink(os.path.relpath(blob, os.path.dirname(path)), tmp_path)
+    else:
+        os.link(blob, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def ingest(page_types, symlink=False, dry_run=False, workers=16):
+    """把独立文件收入存储；返回统计"""
+    blobs = scan_blobs()
+    images = scan_images(page_types)
+    with metrics.stage('classify'):
+        states = classify(images, blobs)
+    # 指向存储以外的符号链接保持原样
+    loose = [path for path, (kind, _, _) in states.items() if kind == 'loose' and not os.path.islink(path)]
+    cache = HashCache(HASH_CACHE_FILE)
+    with metrics.stage('hash'):
+        digests = hash_files(loose, cache, workers)
+    cache.save()
+
+    stats = {'files': len(images), 'ingested': 0, 'deduplicated': 0, 'bytes_freed': 0, 'failed': []}
+    created = set()
+    with metrics.stage('link'):
+        for path in loose:
+            st = states[path][2]
+            blob = blob_path(digests[path], os.path.splitext(path)[1])
+            exists = blob in created or os.path.exists(blob)
+            created.add(blob)
+            if exists and os.path.exists(blob) and os.path.samefile(blob, path):
+                # 之前已合并过的硬链接（例如存储被删除后重新收入）
+                continue
+            if exists:
+                stats['deduplicated'] += 1
+                stats['bytes_freed'] += st.st_size
+            else:
+                stats['ingested'] += 1
+            if dry_run:
+                continue
+            try:
+                if not exists:
+                    os.makedirs(os.path.dirname(blob), exist_ok=True)
+                    if symlink:
+                        # 符号链接模式：把文件本身移入存储
+                        os.replace(path, blob)
+                    else:
+                        # 硬链接模式：存储路径只是同一份数据的另一个名字，不复制
+                        os.link(path, blob)
+                        continue
+                _replace_with_link(blob, path, symlink)
+            except OSError as e:
+                stats['failed'].append((os.path.relpath(path, ROOT_DIR), str(e)))
+    metrics.count('files_ingested', stats['ingested'])
+    metrics.count('files_deduplicated', stats['deduplicated'])
+    return stats
+
+
+def status(page_types):
+    """统计当前的存储和引用情况（引用关系始终按全部文件夹计算）"""
+    blobs = scan_blobs()
+    all_images = scan_images(IMAGE_FOLDERS)
+    states = classify(all_images, blobs)
+    images = [(page_type, entry) for page_type, entry in all_images if page_type in page_types]
+
+    referenced = {blob for _, blob, _ in states.values() if blob}
+    inodes = {}
+    folders = {}
+    for page_type, entry in images:
+        kind, _, st = states[entry.path]
+        inodes[(st.st_dev, st.st_ino)] = st.st_size
+        folder = folders.setdefault(page_type, {'folder': IMAGE_FOLDERS[page_type][0], 'files': 0,
+                                                'linked': 0, 'symlink': 0, 'loose': 0, 'bytes': 0})
+        folder['files'] += 1
+        folder[kind] += 1
+        folder['bytes'] += st.st_size
+
+    unreferenced = [(path, size) for path, size in blobs.values() if path not in referenced]
+    logical = sum(folder['bytes'] for folder in folders.values())
+    return {
+        'files': len(images),
+        'logical_bytes': logical,
+        'disk_bytes': sum(inodes.values()) + sum(size for _, size in unreferenced),
+        'blobs': len(blobs),
+        'blob_bytes': sum(size for _, size in blobs.values()),
+        'unreferenced_blobs': len(unreferenced),
+        'unreferenced_bytes': sum(size for _, size in unreferenced),
+        'folders': folders,
+    }
+
+
+def gc(page_types, dry_run=False):
+    """删除没有任何文件引用的内容，返回 (删除数量, 释放字节数)"""
+    if set(page_types) != set(IMAGE_FOLDERS):
+        raise ValueError('gc 需要扫描全部文件夹，不能与 --only 同时使用')
+    blobs = scan_blobs()
+    states = classify(scan_images(page_types), blobs)
+    referenced = {blob for _, blob, _ in states.values() if blob}
+    removed = freed = 0
+    for path, size in blobs.values():
+        if path in referenced:
+            continue
+        if not dry_run:
+            os.remove(path)
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+        removed += 1
+        freed += size
+    metrics.count('blobs_removed', removed)
+    return removed, freed
+
+
+def verify(workers=16):
+    """重新计算存储内容的哈希（不使用缓存），返回内容与文件名不一致的路径列表"""
+    paths = [path for path, _ in scan_blobs().values()]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        digests = pool.map(file_sha256, paths)
+    metrics.count('blobs_verified', len(paths))
+    return [path for path, digest in zip(paths, digests)
+            if os.path.splitext(os.path.basename(path))[0] != digest]
+
+
+def _mb(size):
+    return f"{size / 1048576:.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='三个产品图片文件夹的内容寻址存储（硬链接去重）')
+    parser.add_argument('command', nargs='?', default='status', choices=['status', 'ingest', 'gc', 'verify'])
+    parser.add_argument('--only', default='', help='只处理指定页面类型，逗号分隔：home,shop,points')
+    parser.add_argument('--symlink', action='store_true', help='ingest时使用相对符号链接代替硬链接')
+    parser.add_argument('--dry-run', action='store_true', help='ingest/gc只统计，不修改文件')
+    parser.add_argument('--jobs', type=int, default=16, help='计算哈希的线程数')
+    parser.add_argument('--json', metavar='FILE', help='将status结果写入JSON文件')
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start('image-store', args)
+
+    page_types = [t for t in args.only.split(',') if t] or list(IMAGE_FOLDERS)
+    unknown = [t for t in page_types if t not in IMAGE_FOLDERS]
+    if unknown:
+        print(f"错误: 未知的页面类型 {', '.join(unknown)}")
+        return
+
+    if args.command == 'ingest':
+        stats = ingest(page_types, args.symlink, args.dry_run, args.jobs)
+        label = '将' if args.dry_run else '已'
+        print(f"共 {stats['files']} 个图片文件：{label}收入 {stats['ingested']} 份新内容，"
+              f"合并 {stats['deduplicated']} 个重复文件，节省 {_mb(stats['bytes_freed'])}")
+        for rel_path, error in stats['failed'][:20]:
+            print(f"  失败 {rel_path}: {error}")
+        return
+
+    if args.command == 'gc':
+        try:
+            removed, freed = gc(page_types, args.dry_run)
+        except ValueError as e:
+            print(f"错误: {e}")
+            return
+        label = '可删除' if args.dry_run else '已删除'
+        print(f"{label} {removed} 份未引用的内容，释放 {_mb(freed)}")
+        return
+
+    if args.command == 'verify':
+        broken = verify(args.jobs)
+        if broken:
+            print(f"发现 {len(broken)} 份内容与哈希不一致（被原地修改过）：")
+            for path in broken[:20]:
+                print(f"  - {os.path.relpath(path, ROOT_DIR)}")
+            raise SystemExit(1)
+        print("存储内容全部一致")
+        return
+
+    report = status(page_types)
+    print(f"\n{'文件夹':<24}{'文件':>7}{'硬链接':>8}{'符号链接':>9}{'独立':>7}{'大小':>11}")
+    for folder in report['folders'].values():
+        print(f"{folder['folder']:<24}{folder['files']:>7}{folder['linked']:>8}{folder['symlink']:>9}"
+              f"{folder['loose']:>7}{_mb(folder['bytes']):>11}")
+    print(f"\n文件总大小 {_mb(report['logical_bytes'])}，实际占用 {_mb(report['disk_bytes'])}")
+    print(f"存储中 {report['blobs']} 份内容（{_mb(report['blob_bytes'])}），"
+          f"其中 {report['unreferenced_blobs']} 份未被引用（{_mb(report['unreferenced_bytes'])}，可用 gc 回收）")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"已生成JSON报告: {args.json}")
+
+
+if __name__ == '__main__':
+    main()
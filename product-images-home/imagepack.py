@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Android 图片包共享模块（格式定义 + 读取）
+把 product-images-* 和 hero-featured-images 打成一个不压缩的单文件 images.pack，
+App 端 mmap 整个文件后用二分查找定位图片，直接把映射内存交给 WebView，不解压、不复制。
+
+文件布局（小端）：
+  [0, PAGE_SIZE)   头部：魔数、版本、对齐、条目数、索引/文件名区的位置和大小
+  数据区           每个图片从 align 的整数倍偏移开始（默认4096，即页对齐），原样存放
+  索引             条目数 × ENTRY，按路径的UTF-8字节序排序：
+                   文件名偏移、文件名长度、保留、数据偏移、数据长度、sha256
+  文件名区         全部路径（UTF-8，如 product-images-shop/xxx.jpg）首尾相接
+
+索引和文件名区总是写在文件末尾，头部最后写入；增量打包时旧数据和旧索引都不动，
+新图片和新索引追加在后面，头部写完之前读到的仍是完整的旧包。
+"""
+
+import bisect
+import mmap
+import os
+import struct
+
+MAGIC = b'KOKOPACK'
+VERSION = 1
+PAGE_SIZE = 4096
+
+# 魔数, 版本, 对齐, 条目数, 保留, 索引偏移, 索引大小, 文件名区偏移, 文件名区大小
+HEADER = struct.Struct('<8sIIII4Q')
+# 文件名偏移, 文件名长度, 保留, 数据偏移, 数据长度, sha256
+ENTRY = struct.Struct('<IHHQQ32s')
+
+MIME_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif',
+}
+
+
+class PackError(Exception):
+    pass
+
+
+def align_up(value, align):
+    return (value + align - 1) // align * align
+
+
+def encode_index(entries):
+    """entries: 按路径排序的 [(路径, 偏移, 长度, sha256十六进制)]
+    返回 (索引字节, 文件名区字节)，文件名区紧跟在索引之后"""
+    index = bytearray()
+    names = bytearray()
+    for path, offset, length, digest in entries:
+        name = path.encode('utf-8')
+        index += ENTRY.pack(len(names), len(name), 0, offset, length, bytes.fromhex(digest))
+        names += name
+    return bytes(index), bytes(names)
+
+
+def encode_header(align, count, index_offset, index_size, names_offset, names_size):
+    header = HEADER.pack(MAGIC, VERSION, align, count, 0,
+                         index_offset, index_size, names_offset, names_size)
+    return header + b'\0' * (PAGE_SIZE - len(header))
+
+
+class ImagePack:
+    """只读打开图片包；lookup 用二分查找返回 memoryview 切片（不复制数据）"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        if os.fstat(self._file.fileno()).st_size < PAGE_SIZE:
+            self._file.close()
+            raise PackError(f'{path} 不是图片包（文件太短）')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.align, self.count, _,
+         self.index_offset, index_size, self.names_offset, names_size) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise PackError(f'{path} 不是图片包或版本不支持')
+        if (index_size != self.count * ENTRY.size
+                or self.names_offset + names_size > len(self._map)
+                or self.index_offset + index_size > self.names_offset):
+            self.close()
+            raise PackError(f'{path} 索引超出文件范围，文件可能已损坏')
+        self.data_end = self.index_offset
+        self.end = self.names_offset + names_size
+        self._view = memoryview(self._map)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if getattr(self, '_view', None) is not None:
+            self._view.release()
+            self._view = None
+        self._map.close()
+        self._file.close()
+
+    def __len__(self):
+        return self.count
+
+    def _entry(self, i):
+        return ENTRY.unpack_from(self._map, self.index_offset + i * ENTRY.size)
+
+    def _name(self, i):
+        name_offset, name_len = self._entry(i)[:2]
+        start = self.names_offset + name_offset
+        return self._map[start:start + name_len]
+
+    def entries(self):
+        """按索引顺序返回 [(路径, 偏移, 长度, sha256十六进制)]"""
+        result = []
+        for i in range(self.count):
+            name_offset, name_len, _, offset, length, digest = self._entry(i)
+            start = self.names_offset + name_offset
+            result.append((self._map[start:start + name_len].decode('utf-8'), offset, length, digest.hex()))
+        return result
+
+    def find(self, path):
+        """二分查找路径，返回 (偏移, 长度, sha256十六进制)，不存在时返回 None"""
+        key = path.encode('utf-8')
+        names = _NameView(self)
+        i = bisect.bisect_left(names, key)
+        if i == self.count or names[i] != key:
+            return None
+        _, _, _, offset, length, digest = self._entry(i)
+        return offset, length, digest.hex()
+
+    def lookup(self, path):
+        """返回图片内容的 memoryview（指向映射内存），不存在时返回 None"""
+        found = self.find(path)
+        if found is None:
+            return None
+        offset, length, _ = found
+        return self._view[offset:offset + length]
+
+
+class _NameView:
+    """让 bisect 直接在索引上二分，不需要把全部路径读成列表"""
+
+    def __init__(self, pack):
+        self.pack = pack
+
+    def __len__(self):
+        return self.pack.count
+
+    def __getitem__(self, i):
+        return self.pack._name(i)
+
+
+def mime_type(path):
+    return MIME_TYPES.get(os.path.splitext(path)[1].lower(), 'application/octet-stream')
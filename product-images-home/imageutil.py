@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片工具共享模块
+三个产品图片文件夹的规格、图片文件头解析、文件内容哈希及基于stat的哈希缓存
+"""
+
+import hashlib
+import json
+import os
+import struct
+
+import metrics
+
+ROOT_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# 页面类型 -> (文件夹, 宽, 高)，与index.html中getProductImagePath保持一致
+IMAGE_FOLDERS = {
+    'home': ('product-images-home', 600, 252),
+    'shop': ('product-images-shop', 600, 472),
+    'points': ('product-images-points', 600, 600),
+}
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+
+
+def folder_path(page_type, root_dir=None):
+    """返回页面类型对应文件夹的绝对路径（root_dir 默认为项目根目录）"""
+    return os.path.join(root_dir or ROOT_DIR, IMAGE_FOLDERS[page_type][0])
+
+
+def is_image(filename):
+    """按扩展名判断是否为图片文件"""
+    return filename.lower().endswith(IMAGE_EXTENSIONS)
+
+
+# JPEG的SOF标记（基线/渐进式）
+_JPEG_SOF_BASELINE = {0xC0, 0xC1, 0xC3, 0xC5, 0xC7, 0xC9, 0xCB, 0xCD, 0xCF}
+_JPEG_SOF_PROGRESSIVE = {0xC2, 0xC6, 0xCA, 0xCE}
+
+
+def _jpeg_header(f, info):
+    """逐个读取JPEG段头，跳过段内容，直到SOF为止"""
+    f.seek(2)
+    while True:
+        b = f.read(1)
+        if not b:
+            return
+        if b != b'\xff':
+            continue
+        marker = f.read(1)
+        while marker == b'\xff':
+            marker = f.read(1)
+        if not marker:
+            return
+        code = marker[0]
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            continue
+        if code in (0xD9, 0xDA):
+            return
+        raw = f.read(2)
+        if len(raw) < 2:
+            return
+        length = struct.unpack('>H', raw)[0]
+        if code in _JPEG_SOF_BASELINE or code in _JPEG_SOF_PROGRESSIVE:
+            data = f.read(5)
+            if len(data) == 5:
+                info['height'], info['width'] = struct.unpack('>HH', data[1:5])
+                info['progressive'] = code in _JPEG_SOF_PROGRESSIVE
+            return
+        if code == 0xE1:
+            data = f.read(6)
+            if data.startswith(b'Exif'):
+                info['exif_bytes'] += length - 2
+            f.seek(length - 2 - len(data), 1)
+        else:
+            if 0xE2 <= code <= 0xEF or code == 0xFE:
+                info['metadata_bytes'] += length - 2
+            f.seek(length - 2, 1)
+
+
+def _webp_header(f, info):
+    """遍历RIFF块，读取画布尺寸和EXIF块大小"""
+    f.seek(12)
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return
+        fourcc, size = chunk[:4], struct.unpack('<I', chunk[4:])[0]
+        padded = size + (size & 1)
+        if fourcc == b'VP8X':
+            data = f.read(10)
+            info['width'] = int.from_bytes(data[4:7], 'little') + 1
+            info['height'] = int.from_bytes(data[7:10], 'little') + 1
+            f.seek(padded - len(data), 1)
+        elif fourcc == b'VP8 ' and 'width' not in info:
+            data = f.read(10)
+            w, h = struct.unpack('<HH', data[6:10])
+            info['width'], info['height'] = w & 0x3FFF, h & 0x3FFF
+            return
+        elif fourcc == b'VP8L' and 'width' not in info:
+            data = f.read(5)
+            bits = int.from_bytes(data[1:5], 'little')
+            info['width'] = (bits & 0x3FFF) + 1
+            info['height'] = ((bits >> 14) & 0x3FFF) + 1
+            return
+        else:
+            if fourcc == b'EXIF':
+                info['exif_bytes'] += size
+            elif fourcc in (b'ICCP', b'XMP '):
+                info['metadata_bytes'] += size
+            f.seek(padded, 1)
+
+
+def read_image_header(path):
+    """只读取文件头，返回 {'format', 'width', 'height', 'progressive', 'exif_bytes', 'metadata_bytes'}
+    无法识别的文件 format 为 None"""
+    info = {'format': None, 'progressive': False, 'exif_bytes': 0, 'metadata_bytes': 0}
+    with open(path, 'rb') as f:
+        head = f.read(32)
+        if head.startswith(b'\xff\xd8'):
+            info['format'] = 'jpeg'
+            _jpeg_header(f, info)
+        elif head.startswith(b'\x89PNG\r\n\x1a\n') and len(head) >= 29:
+            info['format'] = 'png'
+            info['width'], info['height'] = struct.unpack('>II', head[16:24])
+            info['progressive'] = head[28] == 1
+        elif head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+            info['format'] = 'webp'
+            _webp_header(f, info)
+        elif head[:4] == b'GIF8' and len(head) >= 10:
+            info['format'] = 'gif'
+            info['width'], info['height'] = struct.unpack('<HH', head[6:10])
+    info.setdefault('width', None)
+    info.setdefault('height', None)
+    return info
+
+
+def strip_jpeg_metadata(data):
+    """无损去除JPEG中的EXIF/XMP/注释等元数据段，保留JFIF、ICC色彩配置和Adobe段；
+    非JPEG或结构异常时原样返回"""
+    if not data.startswith(b'\xff\xd8'):
+        return data
+    out = [b'\xff\xd8']
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return data
+        code = data[pos + 1]
+        if code == 0xFF:
+            pos += 1
+            continue
+        if code == 0xDA:
+            out.append(data[pos:])
+            return b''.join(out)
+        length = struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        segment = data[pos:pos + 2 + length]
+        if len(segment) < 2 + length:
+            return data
+        keep = True
+        if code == 0xFE or (0xE1 <= code <= 0xEF and code != 0xEE):
+            # APP2只保留ICC色彩配置
+            keep = code == 0xE2 and segment[4:16] == b'ICC_PROFILE\0'
+        if keep:
+            out.append(segment)
+        pos += 2 + length
+    return data
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """计算文件内容的sha256十六进制摘要"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class HashCache:
+    """以 (大小, 修改时间) 为键缓存文件哈希，未变化的文件不再重新读取"""
+
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+        self.entries = {}
+        self.dirty = False
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def sha256(self, path, st=None):
+        """返回文件哈希，stat未变化时直接使用缓存"""
+        st = st or os.stat(path)
+        key = os.path.abspath(path)
+        entry = self.entries.get(key)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+        digest = file_sha256(path)
+        metrics.count('files_hashed')
+        metrics.count('bytes_hashed', st.st_size)
+        self.entries[key] = [st.st_size, st.st_mtime_ns, digest]
+        self.dirty = True
+        return digest
+
+    def save(self):
+        """缓存有变化时写回磁盘"""
+        if not self.dirty:
+            return
+        tmp_file = self.cache_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_file, self.cache_file)
+        self.dirty = False
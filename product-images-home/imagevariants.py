@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按需生成的产品图片尺寸/格式变体（供 serve.py 的 ?w=&fmt= 使用）
+以现有图片（有 product-images-master/<产品ID>.jpg 高清主图时优先用主图）为源，
+在进程池中缩放和转码；结果放在内存和磁盘两级LRU缓存中，两者都有字节上限；
+同一变体的并发请求合并为一个任务。
+"""
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from imageutil import IMAGE_FOLDERS, ROOT_DIR, read_image_header
+
+MASTER_DIR = os.path.join(ROOT_DIR, 'product-images-master')
+CACHE_DIR = os.path.join(ROOT_DIR, '.image-variants')
+VERSION = 1
+
+# 允许的宽度档位，请求的宽度向上取整到最近的档位，避免任意宽度撑爆缓存
+VARIANT_WIDTHS = (160, 240, 320, 360, 480, 600, 720, 960, 1200)
+
+# 格式 -> (Pillow格式名, MIME类型, 质量)，按 fmt=auto 时的优先级排列
+FORMATS = {
+    'avif': ('AVIF', 'image/avif', 55),
+    'webp': ('WEBP', 'image/webp', 80),
+    'jpg': ('JPEG', 'image/jpeg', 82),
+}
+
+
+def supported_formats():
+    """当前Pillow可以写出的格式；未安装Pillow时为空"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return []
+    Image.init()
+    return [fmt for fmt, (pil_format, _, _) in FORMATS.items() if pil_format in Image.SAVE]
+
+
+def page_type_for(url_path):
+    """URL第一段为图片文件夹时返回页面类型，否则返回None"""
+    first = url_path.lstrip('/').split('/', 1)[0]
+    for page_type, (folder, _, _) in IMAGE_FOLDERS.items():
+        if first == folder:
+            return page_type
+    return None
+
+
+def source_for(path):
+    """变体的源图：同名高清主图存在时用主图，否则用文件夹中的图片本身"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    master = os.path.join(MASTER_DIR, stem + '.jpg')
+    return master if os.path.isfile(master) else path
+
+
+def choose_width(requested, max_width):
+    """把请求的宽度取整到档位，不超过源图可裁出的宽度（不放大）"""
+    widths = [w for w in VARIANT_WIDTHS if w <= max_width] or [max_width]
+    for width in widths:
+        if width >= requested:
+            return width
+    return widths[-1]
+
+
+def choose_format(requested, accept, supported):
+    """fmt 为空或 auto 时按Accept头选择最优格式；返回None表示不支持"""
+    if requested and requested != 'auto':
+        requested = 'jpg' if requested == 'jpeg' else requested
+        return requested if requested in supported else None
+    accept = (accept or '').lower()
+    for fmt in supported:
+        if fmt == 'jpg' or FORMATS[fmt][1] in accept:
+            return fmt
+    return None
+
+
+def variant_key(source_digest, width, height, fmt):
+    raw = f'{source_digest}:{width}x{height}:{fmt}:{FORMATS[fmt][2]}:v{VERSION}'
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def render_variant(source_path, width, height, fmt):
+    """子进程：按目标尺寸居中裁切缩放并编码，返回图片字节"""
+    from PIL import Image, ImageOps
+
+    with Image.open(source_path) as src:
+        img = ImageOps.exif_transpose(src).convert('RGB')
+    resized = ImageOps.fit(img, (width, height), Image.LANCZOS, centering=(0.5, 0.5))
+    pil_format, _, quality = FORMATS[fmt]
+    buf = io.BytesIO()
+    if fmt == 'jpg':
+        resized.save(buf, pil_format, quality=quality, optimize=True, progressive=True)
+    else:
+        resized.save(buf, pil_format, quality=quality)
+    return buf.getvalue()
+
+
+class VariantCache:
+    """内存+磁盘两级LRU缓存；未命中时提交到进程池生成，同一键的并发请求共用一个任务"""
+
+    def __init__(self, cache_dir=CACHE_DIR, memory_bytes=64 << 20, disk_bytes=512 << 20, workers=None):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.formats = supported_formats()
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+        self.memory_size = 0
+        self.disk = OrderedDict()
+        self.disk_size = 0
+        self.pending = {}
+        self.sizes = {}
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'renders': 0, 'collapsed': 0}
+        self._load_disk_index()
+
+    def _load_disk_index(self):
+        """按修改时间恢复磁盘缓存的LRU顺序"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    st = entry.stat()
+                    entries.append((st.st_mtime_ns, entry.name, st.st_size))
+        for _, name, size in sorted(entries):
+            self.disk[name] = size
+            self.disk_size += size
+        self._evict_disk()
+
+    def source_size(self, path, digest):
+        """源图 (宽, 高)（只读文件头，按内容哈希缓存）"""
+        size = self.sizes.get(digest)
+        if size is None:
+            header = read_image_header(path)
+            size = (header['width'] or VARIANT_WIDTHS[-1], header['height'] or VARIANT_WIDTHS[-1])
+            self.sizes[digest] = size
+        return size
+
+    def _memory_put(self, key, data):
+        if len(data) > self.memory_bytes:
+            return
+        if key in self.memory:
+            self.memory_size -= len(self.memory.pop(key))
+        self.memory[key] = data
+        self.memory_size += len(data)
+        while self.memory_size > self.memory_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_size -= len(evicted)
+
+    def _evict_disk(self):
+        while self.disk_size > self.disk_bytes and self.disk:
+            name, size = self.disk.popitem(last=False)
+            self.disk_size -= size
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+    def _read_disk(self, name):
+        try:
+            with open(os.path.join(self.cache_dir, name), 'rb') as f:
+                return f.read()
+        except OSError:
+            with self.lock:
+                self.disk_size -= self.disk.pop(name, 0)
+            return None
+
+    def _write_disk(self, name, data):
+        path = os.path.join(self.cache_dir, name)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        with self.lock:
+            self.disk_size += len(data) - self.disk.pop(name, 0)
+            self.disk[name] = len(data)
+            self._evict_disk()
+
+    def get(self, key, fmt, source_path, width, height):
+        """返回变体字节；依次查内存、磁盘、正在生成的任务，最后提交新任务"""
+        name = f'{key}.{fmt}'
+        with self.lock:
+            data = self.memory.get(name)
+            if data is not None:
+                self.memory.move_to_end(name)
+                self.stats['memory_hits'] += 1
+                return data
+            on_disk = name in self.disk
+            if on_disk:
+                self.disk.move_to_end(name)
+
+        if on_disk:
+            data = self._read_disk(name)
+            if data is not None:
+                with self.lock:
+                    self._memory_put(name, data)
+                    self.stats['disk_hits'] += 1
+                return data
+
+        with self.lock:
+            future = self.pending.get(name)
+            owner = future is None
+            if owner:
+                future = self.pool.submit(render_variant, source_path, width, height, fmt)
+                self.pending[name] = future
+                self.stats['renders'] += 1
+            else:
+                self.stats['collapsed'] += 1
+
+        if not owner:
+            return future.result()
+        try:
+            data = future.result()
+        except BaseException:
+            with self.lock:
+                self.pending.pop(name, None)
+            raise
+        with self.lock:
+            # 先放入内存再移除任务，期间到达的请求不会重复生成
+            self._memory_put(name, data)
+            self.pending.pop(name, None)
+        self._write_disk(name, data)
+        return data
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工具运行指标共享模块
+各脚本用 stage() 记录阶段的墙钟/CPU时间，用 count() 累加计数（产品数、扫描文件数、写入字节数等）。
+命令行加 --metrics FILE 时以JSON Lines追加写入每个阶段和运行汇总（'-' 表示标准错误）；
+加 --profile FILE 时用cProfile包裹整个运行，结束时写入按累计时间排序的统计。
+
+用法：
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start('check-images', args)
+    with metrics.stage('scan'):
+        ...
+    metrics.count('files_scanned', n)
+"""
+
+import atexit
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+_state = {
+    'tool': None,
+    'output': None,
+    'profile': None,
+    'profile_file': None,
+    'started': None,
+    'counters': {},
+    'stages': {},
+}
+
+
+def add_arguments(parser):
+    """为命令行解析器添加 --metrics / --profile 参数"""
+    parser.add_argument('--metrics', metavar='FILE',
+                        help="以JSON Lines追加写入阶段耗时和计数（'-' 表示标准错误）")
+    parser.add_argument('--profile', metavar='FILE', help='用cProfile运行并写入按累计时间排序的统计')
+
+
+def _cpu_times():
+    """本进程和已结束子进程（进程池）的CPU时间"""
+    t = os.times()
+    return t.user + t.system, t.children_user + t.children_system
+
+
+def _peak_rss_mb(who):
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux以KB为单位，macOS以字节为单位
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _emit(record):
+    output = _state['output']
+    if output is None:
+        return
+    record = {'ts': round(time.time(), 3), 'tool': _state['tool'], **record}
+    line = json.dumps(record, ensure_ascii=False)
+    if output == '-':
+        print(line, file=sys.stderr)
+    else:
+        with open(output, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+def start(tool, args=None):
+    """开始记录一次运行；结束（包括sys.exit）时自动输出汇总和cProfile统计"""
+    _state['tool'] = tool
+    _state['output'] = getattr(args, 'metrics', None)
+    _state['profile_file'] = getattr(args, 'profile', None)
+    _state['started'] = (time.perf_counter(), _cpu_times())
+    if _state['profile_file']:
+        _state['profile'] = cProfile.Profile()
+        _state['profile'].enable()
+    atexit.register(finish)
+
+
+def finish():
+    """输出运行汇总；可重复调用，只生效一次"""
+    if _state['started'] is None:
+        return
+    profile = _state['profile']
+    if profile is not None:
+        profile.disable()
+        buf = io.StringIO()
+        pstats.Stats(profile, stream=buf).sort_stats('cumulative').print_stats()
+        with open(_state['profile_file'], 'w', encoding='utf-8') as f:
+            f.write(buf.getvalue())
+        _state['profile'] = None
+
+    wall_start, (cpu_start, children_start) = _state['started']
+    cpu, children = _cpu_times()
+    _emit({
+        'event': 'summary',
+        'wall_s': round(time.perf_counter() - wall_start, 4),
+        'cpu_s': round(cpu - cpu_start, 4),
+        'children_cpu_s': round(children - children_start, 4),
+        'peak_rss_mb': _peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+        'children_peak_rss_mb': _peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+        'counters': _state['counters'],
+        'stages': _state['stages'],
+    })
+    _state['started'] = None
+
+
+@contextmanager
+def stage(name):
+    """记录一个阶段的墙钟时间和CPU时间（同名阶段累加）"""
+    wall = time.perf_counter()
+    cpu, children = _cpu_times()
+    try:
+        yield
+    finally:
+        cpu_end, children_end = _cpu_times()
+        result = {
+            'wall_s': round(time.perf_counter() - wall, 4),
+            'cpu_s': round(cpu_end - cpu + children_end - children, 4),
+        }
+        total = _state['stages'].setdefault(name, {'wall_s': 0.0, 'cpu_s': 0.0, 'calls': 0})
+        total['wall_s'] = round(total['wall_s'] + result['wall_s'], 4)
+        total['cpu_s'] = round(total['cpu_s'] + result['cpu_s'], 4)
+        total['calls'] += 1
+        _emit({'event': 'stage', 'stage': name, **result,
+               'rss_mb': _peak_rss_mb(resource.RUSAGE_SELF) if resource else None})
+
+
+def count(name, value=1):
+    """累加一个计数器"""
+    _state['counters'][name] = _state['counters'].get(name, 0) + value
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程优化三个产品图片文件夹中的JPEG
+1. 无损去除EXIF/XMP/注释等元数据（安装了jpegtran时再无损优化霍夫曼表并转为渐进式）
+2. 仍超过该页面类型的大小预算时，按目标质量重新编码，逐级降低质量直到满足预算
+只有结果更小时才替换原文件；按文件内容哈希记录已优化的文件，重复运行时跳过。
+输出每个文件夹节省的字节数报告。
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import metrics
+from imageutil import IMAGE_FOLDERS, ROOT_DIR, HashCache, folder_path, strip_jpeg_metadata
+
+HASH_CACHE_FILE = os.path.join(ROOT_DIR, '.image-hash-cache.json')
+STATE_FILE = os.path.join(ROOT_DIR, '.optimize-state.json')
+
+# 页面类型 -> (目标质量, 大小预算KB)
+OPTIMIZE_TARGETS = {
+    'home': (82, 80),
+    'shop': (82, 110),
+    'points': (82, 120),
+}
+MIN_QUALITY = 60
+QUALITY_STEP = 5
+
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+JPEGTRAN = shutil.which('jpegtran')
+
+
+def optimize_settings(page_type, lossless_only):
+    """单个文件夹的优化参数（参与签名计算）"""
+    quality, budget_kb = OPTIMIZE_TARGETS[page_type]
+    return {'q': quality, 'budget': budget_kb * 1024, 'min_q': MIN_QUALITY,
+            'lossless_only': lossless_only, 'jpegtran': bool(JPEGTRAN), 'v': 1}
+
+
+def signature(settings):
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def _jpegtran(data):
+    """jpegtran无损优化；失败时返回None"""
+    try:
+        result = subprocess.run([JPEGTRAN, '-copy', 'none', '-optimize', '-progressive'],
+                                input=data, capture_output=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return result.stdout if result.returncode == 0 and result.stdout.startswith(b'\xff\xd8') else None
+
+
+def _reencode(data, quality, budget):
+    """按目标质量重新编码（应用EXIF方向），超出预算时逐级降低质量"""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as src:
+        icc_profile = src.info.get('icc_profile')
+        img = ImageOps.exif_transpose(src).convert('RGB')
+    best = None
+    while quality >= MIN_QUALITY:
+        buf = io.BytesIO()
+        img.save(buf, 'JPEG', quality=quality, optimize=True, progressive=True, icc_profile=icc_profile)
+        best = buf.getvalue()
+        if len(best) <= budget:
+            break
+        quality -= QUALITY_STEP
+    return best, quality
+
+
+def _orientation(data):
+    from PIL import Image
+    with Image.open(io.BytesIO(data)) as img:
+        return img.getexif().get(0x0112, 1)
+
+
+def optimize_file(path, settings, dry_run):
+    """子进程：优化单个JPEG，只在结果更小时写回；返回 (原大小, 新大小, 方式)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    original = len(data)
+
+    # 带旋转方向的图片去掉EXIF会显示错误，只能应用方向后重新编码
+    rotated = _orientation(data) not in (None, 1)
+    best, method = data, 'unchanged'
+    if not rotated:
+        stripped = strip_jpeg_metadata(data)
+        if len(stripped) < len(best):
+            best, method = stripped, 'strip'
+        if JPEGTRAN:
+            optimized = _jpegtran(best)
+            if optimized and len(optimized) < len(best):
+                best, method = optimized, 'lossless'
+
+    if not settings['lossless_only'] and (rotated or len(best) > settings['budget']):
+        encoded, quality = _reencode(data, settings['q'], settings['budget'])
+        if encoded and len(encoded) < len(best):
+            best, method = encoded, f'q{quality}'
+
+    if len(best) >= original:
+        return original, original, 'unchanged'
+    if not dry_run:
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(best)
+        os.replace(tmp_path, path)
+    return original, len(best), method
+
+
+def load_state():
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state):
+    tmp_file = STATE_FILE + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=0, sort_keys=True)
+    os.replace(tmp_file, STATE_FILE)
+
+
+def plan_jobs(page_types, lossless_only, state, hash_cache, force=False):
+    """返回待优化的 [(页面类型, 路径, 相对路径, 参数)] 和各文件夹跳过数"""
+    jobs = []
+    skipped = {}
+    for page_type in page_types:
+        settings = optimize_settings(page_type, lossless_only)
+        sig = signature(settings)
+        skipped[page_type] = 0
+        folder = folder_path(page_type)
+        if not os.path.isdir(folder):
+            continue
+        with os.scandir(folder) as it:
+            entries = sorted((e for e in it if e.is_file() and e.name.lower().endswith(JPEG_EXTENSIONS)),
+                             key=lambda e: e.name)
+        for entry in entries:
+            rel_path = os.path.relpath(entry.path, ROOT_DIR)
+            recorded = state.get(rel_path)
+            if not force and recorded and recorded[1] == sig \
+                    and recorded[0] == hash_cache.sha256(entry.path, entry.stat()):
+                skipped[page_type] += 1
+                continue
+            jobs.append((page_type, entry.path, rel_path, settings))
+    return jobs, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description='去除元数据并按大小预算优化产品JPEG图片')
+    parser.add_argument('--only', default='', help='只处理指定页面类型，逗号分隔：home,shop,points')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='并行进程数')
+    parser.add_argument('--lossless-only', action='store_true', help='只做无损优化，不重新编码')
+    parser.add_argument('--dry-run', action='store_true', help='只统计可节省的字节数，不修改文件')
+    parser.add_argument('--force', action='store_true', help='忽略缓存，重新检查所有文件')
+    parser.add_argument('--json', metavar='FILE', help='将报告写入JSON文件')
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start('optimize-images', args)
+
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("PIL/Pillow not installed. Please install it with: pip3 install Pillow")
+        return
+
+    page_types = [t for t in args.only.split(',') if t] or list(IMAGE_FOLDERS)
+    unknown = [t for t in page_types if t not in IMAGE_FOLDERS]
+    if unknown:
+        print(f"错误: 未知的页面类型 {', '.join(unknown)}")
+        return
+
+    if not JPEGTRAN:
+        print("提示: 未找到jpegtran，无损阶段只去除元数据")
+
+    state = load_state()
+    hash_cache = HashCache(HASH_CACHE_FILE)
+    with metrics.stage('plan'):
+        jobs, skipped = plan_jobs(page_types, args.lossless_only, state, hash_cache, args.force)
+    print(f"需要检查 {len(jobs)} 个文件，跳过 {sum(skipped.values())} 个已优化的文件")
+
+    report = {t: {'folder': IMAGE_FOLDERS[t][0], 'budget_kb': OPTIMIZE_TARGETS[t][1], 'checked': 0,
+                  'skipped': skipped[t], 'changed': 0, 'bytes_before': 0, 'bytes_after': 0,
+                  'over_budget': 0, 'methods': {}}
+              for t in page_types}
+    failed = []
+    with metrics.stage('optimize'), ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = {pool.submit(optimize_file, path, settings, args.dry_run): (page_type, path, rel_path, settings)
+                   for page_type, path, rel_path, settings in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            page_type, path, rel_path, settings = futures[future]
+            try:
+                before, after, method = future.result()
+            except Exception as e:
+                failed.append((rel_path, e))
+                continue
+            folder = report[page_type]
+            folder['checked'] += 1
+            folder['bytes_before'] += before
+            folder['bytes_after'] += after
+            folder['methods'][method] = folder['methods'].get(method, 0) + 1
+            if after != before:
+                folder['changed'] += 1
+            if after > settings['budget']:
+                folder['over_budget'] += 1
+            if not args.dry_run:
+                state[rel_path] = [hash_cache.sha256(path), signature(settings)]
+            if done % 500 == 0:
+                print(f"  已检查 {done}/{len(jobs)}")
+
+    hash_cache.save()
+    if not args.dry_run:
+        save_state(state)
+
+    print(f"\n{'文件夹':<24}{'检查':>6}{'跳过':>6}{'修改':>6}{'超预算':>7}{'优化前':>10}{'优化后':>10}{'节省':>10}")
+    total_saved = 0
+    for folder in report.values():
+        saved = folder['bytes_before'] - folder['bytes_after']
+        folder['bytes_saved'] = saved
+        total_saved += saved
+        metrics.count('files_checked', folder['checked'])
+        metrics.count('files_changed', folder['changed'])
+        print(f"{folder['folder']:<24}{folder['checked']:>6}{folder['skipped']:>6}{folder['changed']:>6}"
+              f"{folder['over_budget']:>7}{folder['bytes_before'] / 1048576:>9.1f}M"
+              f"{folder['bytes_after'] / 1048576:>9.1f}M{saved / 1048576:>9.1f}M")
+    label = '可节省' if args.dry_run else '共节省'
+    metrics.count('bytes_saved', total_saved)
+    print(f"\n{label} {total_saved / 1048576:.1f} MB")
+
+    if failed:
+        print(f"失败 {len(failed)} 个文件：")
+        for rel_path, e in failed[:20]:
+            print(f"  - {rel_path}: {e}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'dry_run': args.dry_run, 'bytes_saved': total_saved, 'folders': report,
+                       'failed': [rel for rel, _ in failed]}, f, ensure_ascii=False, indent=2)
+        print(f"已生成JSON报告: {args.json}")
+
+
+if __name__ == '__main__':
+    main()
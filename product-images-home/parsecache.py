@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+解析结果磁盘缓存共享模块
+各脚本连续运行时不必重复解析index.html、读取映射JSON、扫描图片文件夹和读取图片文件头：
+  cached()     由单个文件内容派生的数据（解析后的产品目录、JSON），按 (大小, 修改时间) 校验，
+               不一致时再比较内容哈希，内容没变只更新stat；生成数据的代码文件变化时同样失效
+  list_dir()   目录清单 [(文件名, 大小, 修改时间)]：文件名列表按目录的修改时间校验
+               （增删和重命名文件都会改变目录修改时间），大小和修改时间每次逐个stat，
+               原地覆盖写入的文件（不改变目录修改时间）也能反映出来
+  FileResults  按文件 (大小, 修改时间) 缓存的逐文件结果，如图片文件头
+缓存以pickle保存在 ../.parse-cache/，未变化的输入只需一次stat加一次读取。
+设置环境变量 PARSE_CACHE=0 可完全禁用（基准测试用）。
+"""
+
+import hashlib
+import os
+import pickle
+import time
+
+import metrics
+from imageutil import ROOT_DIR, file_sha256
+
+CACHE_DIR = os.path.join(ROOT_DIR, '.parse-cache')
+VERSION = 2
+ENABLED = os.environ.get('PARSE_CACHE', '1') != '0'
+
+# 修改时间距现在不足该秒数的目录不写缓存：同一时间刻度内的再次修改无法从修改时间上区分
+_RACY_SECONDS = 2
+
+
+def _cache_file(kind, path):
+    key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f'{kind}-{key}.pickle')
+
+
+def _load(cache_file):
+    try:
+        with open(cache_file, 'rb') as f:
+            entry = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError):
+        return None
+    return entry if isinstance(entry, dict) and entry.get('version') == VERSION else None
+
+
+def _store(cache_file, entry):
+    entry['version'] = VERSION
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_file = f'{cache_file}.{os.getpid()}.tmp'
+    with open(tmp_file, 'wb') as f:
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, cache_file)
+
+
+def _stat_key(st):
+    return (st.st_size, st.st_mtime_ns)
+
+
+def code_signature(*files):
+    """生成数据的代码文件的stat，代码修改后缓存随之失效"""
+    return tuple(_stat_key(os.stat(path)) for path in files)
+
+
+def cached(kind, path, build, signature=None):
+    """返回 build(path) 的结果，path 内容和 signature 不变时直接读取缓存"""
+    if not ENABLED:
+        return build(path)
+    cache_file = _cache_file(kind, path)
+    st = os.stat(path)
+    entry = _load(cache_file)
+    digest = None
+    if entry and entry['path'] == os.path.abspath(path) and entry['signature'] == signature:
+        if entry['stat'] == _stat_key(st):
+            metrics.count('parse_cache_hits')
+            return entry['value']
+        digest = file_sha256(path)
+        if entry['sha256'] == digest:
+            # 只是修改时间变了（例如touch或git checkout），内容相同
+            entry['stat'] = _stat_key(st)
+            _store(cache_file, entry)
+            metrics.count('parse_cache_hits')
+            return entry['value']
+
+    metrics.count('parse_cache_misses')
+    digest = digest or file_sha256(path)
+    value = build(path)
+    if _stat_key(os.stat(path)) == _stat_key(st):
+        _store(cache_file, {'path': os.path.abspath(path), 'signature': signature, 'stat': _stat_key(st),
+                            'sha256': digest, 'value': value})
+    return value
+
+
+def _scan_dir(folder):
+    entries = []
+    with os.scandir(folder) as it:
+        for entry in it:
+            if entry.is_file():
+                st = entry.stat()
+                entries.append((entry.name, st.st_size, st.st_mtime_ns))
+    entries.sort()
+    return entries
+
+
+def _stat_names(folder, names):
+    """逐个stat缓存中的文件名；有文件已不存在时返回 None（目录在校验之后又被修改）"""
+    entries = []
+    for name in names:
+        try:
+            st = os.stat(os.path.join(folder, name))
+        except FileNotFoundError:
+            return None
+        entries.append((name, st.st_size, st.st_mtime_ns))
+    return entries
+
+
+def list_dir(folder):
+    """返回目录中普通文件（含指向文件的符号链接）的 [(文件名, 大小, 修改时间ns)]，按文件名排序"""
+    if not ENABLED:
+        return _scan_dir(folder)
+    st = os.stat(folder)
+    key = (st.st_ino, st.st_mtime_ns)
+    cache_file = _cache_file('dir', folder)
+    entry = _load(cache_file)
+    if entry and entry['path'] == os.path.abspath(folder) and entry['stat'] == key:
+        entries = _stat_names(folder, entry['value'])
+        if entries is not None:
+            metrics.count('parse_cache_hits')
+            return entries
+
+    metrics.count('parse_cache_misses')
+    entries = _scan_dir(folder)
+    after = os.stat(folder)
+    if (after.st_ino, after.st_mtime_ns) == key and time.time() - after.st_mtime > _RACY_SECONDS:
+        _store(cache_file, {'path': os.path.abspath(folder), 'stat': key,
+                            'value': [name for name, _, _ in entries]})
+    return entries
+
+
+class FileResults:
+    """以 (大小, 修改时间) 为键缓存逐个文件计算出的结果（与 imageutil.HashCache 相同的校验方式）"""
+
+    def __init__(self, kind, signature=None):
+        self.cache_file = os.path.join(CACHE_DIR, f'{kind}.pickle')
+        self.signature = signature
+        self.entries = {}
+        self.dirty = False
+        entry = _load(self.cache_file) if ENABLED else None
+        if entry and entry['signature'] == signature:
+            self.entries = entry['value']
+
+    def get(self, path, size, mtime_ns, compute):
+        """返回 compute(path)，文件未变化时直接使用缓存"""
+        key = os.path.abspath(path)
+        cached_entry = self.entries.get(key)
+        if cached_entry and cached_entry[0] == size and cached_entry[1] == mtime_ns:
+            return cached_entry[2]
+        value = compute(path)
+        self.entries[key] = (size, mtime_ns, value)
+        self.dirty = True
+        return value
+
+    def prune(self, folders, paths):
+        """删除 folders 中已不在 paths 里的文件（已删除或重命名）的结果"""
+        folders = {os.path.abspath(folder) for folder in folders}
+        keep = {os.path.abspath(path) for path in paths}
+        stale = [key for key in self.entries if os.path.dirname(key) in folders and key not in keep]
+        for key in stale:
+            del self.entries[key]
+        self.dirty = self.dirty or bool(stale)
+
+    def save(self):
+        """结果有变化时写回磁盘"""
+        if ENABLED and self.dirty:
+            _store(self.cache_file, {'signature': self.signature, 'value': self.entries})
+            self.dirty = False
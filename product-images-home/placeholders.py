@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+产品图片占位信息共享模块
+为每张产品图片计算主色（bg）和BlurHash（bh），图片加载完成前可立即绘制占位；
+结果按图片内容哈希缓存，重复运行只处理新图片
+"""
+
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from imageutil import ROOT_DIR, HashCache
+
+HASH_CACHE_FILE = os.path.join(ROOT_DIR, '.image-hash-cache.json')
+PLACEHOLDER_CACHE_FILE = os.path.join(ROOT_DIR, '.placeholder-cache.json')
+
+# BlurHash分量数（横×纵）和计算时的缩略图尺寸
+COMPONENTS_X = 4
+COMPONENTS_Y = 3
+SAMPLE_SIZE = 16
+
+_BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+_SRGB_TO_LINEAR = [(v / 255 / 12.92) if v / 255 <= 0.04045 else ((v / 255 + 0.055) / 1.055) ** 2.4
+                   for v in range(256)]
+
+
+def _encode83(value, length):
+    return ''.join(_BASE83[(value // 83 ** (length - i - 1)) % 83] for i in range(length))
+
+
+def _linear_to_srgb(value):
+    v = max(0.0, min(1.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value, exp):
+    return math.copysign(abs(value) ** exp, value)
+
+
+def blurhash(pixels, width, height):
+    """对RGB像素列表计算BlurHash字符串"""
+    linear = [(_SRGB_TO_LINEAR[r], _SRGB_TO_LINEAR[g], _SRGB_TO_LINEAR[b]) for r, g, b in pixels]
+    cos_x = [[math.cos(math.pi * i * x / width) for x in range(width)] for i in range(COMPONENTS_X)]
+    cos_y = [[math.cos(math.pi * j * y / height) for y in range(height)] for j in range(COMPONENTS_Y)]
+
+    factors = []
+    for j in range(COMPONENTS_Y):
+        for i in range(COMPONENTS_X):
+            norm = (1 if i == 0 and j == 0 else 2) / (width * height)
+            r = g = b = 0.0
+            for y in range(height):
+                basis_y = cos_y[j][y]
+                row = y * width
+                for x in range(width):
+                    basis = cos_x[i][x] * basis_y
+                    pr, pg, pb = linear[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            factors.append((r * norm, g * norm, b * norm))
+
+    dc, ac = factors[0], factors[1:]
+    result = _encode83((COMPONENTS_X - 1) + (COMPONENTS_Y - 1) * 9, 1)
+    if ac:
+        actual_max = max(abs(c) for factor in ac for c in factor)
+        quantised_max = max(0, min(82, int(math.floor(actual_max * 166 - 0.5))))
+        max_value = (quantised_max + 1) / 166
+        result += _encode83(quantised_max, 1)
+    else:
+        max_value = 1
+        result += _encode83(0, 1)
+    result += _encode83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+    for factor in ac:
+        q = [max(0, min(18, int(math.floor(_sign_pow(c / max_value, 0.5) * 9 + 9.5)))) for c in factor]
+        result += _encode83(q[0] * 19 * 19 + q[1] * 19 + q[2], 2)
+    return result
+
+
+def compute_placeholder(path):
+    """计算单张图片的 (主色, BlurHash)"""
+    from PIL import Image
+    with Image.open(path) as img:
+        img.draft('RGB', (SAMPLE_SIZE * 8, SAMPLE_SIZE * 8))
+        rgb = img.convert('RGB')
+
+    # 主色：缩小后量化为少量颜色，取像素最多的一种
+    palette_img = rgb.resize((48, 48), Image.BILINEAR).quantize(colors=5)
+    palette = palette_img.getpalette()
+    count, index = max(palette_img.getcolors())
+    color = '#{:02x}{:02x}{:02x}'.format(*palette[index * 3:index * 3 + 3])
+
+    width = SAMPLE_SIZE
+    height = max(1, round(SAMPLE_SIZE * rgb.height / rgb.width))
+    small = rgb.resize((width, height), Image.BILINEAR)
+    getter = getattr(small, 'get_flattened_data', None) or small.getdata
+    return color, blurhash(list(getter()), width, height)
+
+
+def _load_cache():
+    if os.path.exists(PLACEHOLDER_CACHE_FILE):
+        with open(PLACEHOLDER_CACHE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def _save_cache(cache):
+    tmp_file = PLACEHOLDER_CACHE_FILE + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False)
+    os.replace(tmp_file, PLACEHOLDER_CACHE_FILE)
+
+
+def load_placeholders(paths, jobs=None):
+    """返回 {路径: (主色, BlurHash)}；只为缓存中没有的图片内容计算，多张时并行"""
+    file_hashes = HashCache(HASH_CACHE_FILE)
+    digests = {path: file_hashes.sha256(path) for path in paths}
+    file_hashes.save()
+
+    cache = _load_cache()
+    pending = {}
+    for path, digest in digests.items():
+        if digest not in cache and digest not in pending:
+            pending[digest] = path
+
+    if pending:
+        digests_todo = list(pending)
+        sources = [pending[d] for d in digests_todo]
+        if len(sources) == 1:
+            results = [compute_placeholder(sources[0])]
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(compute_placeholder, sources, chunksize=16))
+        for digest, result in zip(digests_todo, results):
+            cache[digest] = list(result)
+        _save_cache(cache)
+
+    return {path: tuple(cache[digest]) for path, digest in digests.items()}
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+产品ID共享模块
+品牌+名称 -> 图片文件名ID 的规范化规则（与index.html中getProductImagePath一致），
+以及按字符三元组检索最相近产品ID的索引
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+_UNSAFE_CHARS = re.compile(r'''[<>:"/\\|?*'#°]''')
+_SPACES = re.compile(r'\s+')
+_UNDERSCORES = re.compile(r'_{2,}')
+
+
+@lru_cache(maxsize=None)
+def normalize_id(text):
+    """把任意字符串规范化为ID：NFKC、小写、去除特殊字符、空白转下划线、合并并去掉首尾下划线"""
+    text = unicodedata.normalize('NFKC', text).lower()
+    text = _UNSAFE_CHARS.sub('', text)
+    text = _SPACES.sub('_', text)
+    text = _UNDERSCORES.sub('_', text)
+    return text.strip('_')
+
+
+def product_id(brand, name):
+    """产品ID：品牌_名称（缺少其一时只用另一项）"""
+    brand = (brand or '').strip()
+    name = (name or '').strip()
+    if brand and name:
+        return normalize_id(brand + '_' + name)
+    return normalize_id(brand or name)
+
+
+def image_filename(brand, name, ext='.jpg'):
+    """产品对应的图片文件名"""
+    return product_id(brand, name) + ext
+
+
+def trigrams(text):
+    """首尾补位后的字符三元组集合"""
+    padded = f"\x02{text}\x03"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """字符三元组倒排索引，按Dice系数返回最相近的键"""
+
+    def __init__(self):
+        self.keys = []
+        self.sizes = []
+        self.postings = {}
+
+    def add(self, key):
+        slot = len(self.keys)
+        grams = trigrams(key)
+        self.keys.append(key)
+        self.sizes.append(len(grams))
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(slot)
+
+    def search(self, text, limit=3):
+        """返回 [(相似度, 键)]，只统计与查询共享三元组的键"""
+        grams = trigrams(text)
+        common = {}
+        for gram in grams:
+            for slot in self.postings.get(gram, ()):
+                common[slot] = common.get(slot, 0) + 1
+        scored = [(2 * count / (len(grams) + self.sizes[slot]), self.keys[slot])
+                  for slot, count in common.items()]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return scored[:limit]
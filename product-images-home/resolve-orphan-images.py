@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+为三个产品图片文件夹中无法对应到任何产品的图片（孤儿图片）生成重命名计划
+1. 文件名按统一规则规范化后与某个产品ID相同：直接改为规范文件名
+2. 否则用产品ID的三元组索引查找最相近的产品，相似度足够高且不存在歧义时给出重命名建议
+结果写入JSON重命名计划，确认后用 --apply 执行
+"""
+
+import argparse
+import json
+import os
+
+import catalog
+import metrics
+import productid
+from imageutil import IMAGE_FOLDERS, folder_path, is_image
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PLAN_FILE = os.path.join(SCRIPT_DIR, '图片重命名计划.json')
+
+
+def file_stem(filename):
+    """去掉（可能重复的）图片扩展名，返回 (主名, 规范扩展名)"""
+    stem, ext = os.path.splitext(filename.strip())
+    ext = ext.lower()
+    while is_image(stem.strip()):
+        stem = os.path.splitext(stem.strip())[0]
+    return stem, ext
+
+
+def load_product_ids(html_file):
+    """返回 {产品ID: 产品信息}；同一ID的多个产品只保留第一个"""
+    products = {}
+    for p in catalog.load_products(html_file, source='SD'):
+        pid = productid.product_id(p.brand, p.name)
+        if pid and pid not in products:
+            products[pid] = {'category': p.category, 'brand': p.brand, 'name': p.name}
+    return products
+
+
+def plan_folder(page_type, products, index, min_score, margin):
+    """为一个文件夹生成重命名条目和无法解决的孤儿列表"""
+    folder = folder_path(page_type)
+    if not os.path.isdir(folder):
+        return [], []
+    with os.scandir(folder) as it:
+        files = sorted(entry.name for entry in it if entry.is_file() and is_image(entry.name))
+
+    # 已被正确命名的图片占用的产品ID
+    taken = set()
+    orphans = []
+    for filename in files:
+        stem, ext = file_stem(filename)
+        if stem in products and filename == stem + ext:
+            taken.add(stem)
+        else:
+            orphans.append((filename, stem, ext))
+
+    candidates = []
+    unresolved = []
+    for filename, stem, ext in orphans:
+        key = productid.normalize_id(stem)
+        if key in products:
+            candidates.append((1.0, filename, key, ext, 'normalize'))
+            continue
+        matches = index.search(key) if key else []
+        if not matches or matches[0][0] < min_score:
+            unresolved.append({'file': filename, 'reason': 'no_match',
+                               'candidates': [{'id': m[1], 'score': round(m[0], 3)} for m in matches]})
+        elif len(matches) > 1 and matches[0][0] - matches[1][0] < margin:
+            unresolved.append({'file': filename, 'reason': 'ambiguous',
+                               'candidates': [{'id': m[1], 'score': round(m[0], 3)} for m in matches]})
+        else:
+            candidates.append((matches[0][0], filename, matches[0][1], ext, 'fuzzy'))
+
+    # 同一产品只分配给得分最高的孤儿图片，已有正确图片的产品不再分配
+    renames = []
+    candidates.sort(key=lambda c: (-c[0], c[1]))
+    for score, filename, pid, ext, reason in candidates:
+        if pid in taken:
+            unresolved.append({'file': filename, 'reason': 'target_exists',
+                               'candidates': [{'id': pid, 'score': round(score, 3)}]})
+            continue
+        taken.add(pid)
+        renames.append({
+            'folder': IMAGE_FOLDERS[page_type][0],
+            'from': filename,
+            'to': pid + ext,
+            'score': round(score, 3),
+            'reason': reason,
+            'product': products[pid],
+        })
+    renames.sort(key=lambda r: r['from'])
+    for item in unresolved:
+        item['folder'] = IMAGE_FOLDERS[page_type][0]
+    return renames, unresolved
+
+
+def apply_plan(plan_file):
+    """按重命名计划执行重命名，目标已存在的条目跳过"""
+    with open(plan_file, 'r', encoding='utf-8') as f:
+        plan = json.load(f)
+    renamed = skipped = 0
+    for item in plan['renames']:
+        folder = os.path.join(os.path.dirname(SCRIPT_DIR), item['folder'])
+        source = os.path.join(folder, item['from'])
+        target = os.path.join(folder, item['to'])
+        if not os.path.exists(source) or os.path.exists(target):
+            print(f"  跳过: {item['folder']}/{item['from']} -> {item['to']}")
+            skipped += 1
+            continue
+        os.rename(source, target)
+        renamed += 1
+    print(f"已重命名 {renamed} 个文件，跳过 {skipped} 个")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='为无法对应到产品的图片生成重命名计划')
+    parser.add_argument('--html', default=catalog.HTML_FILE, help='源HTML文件（默认 ../index.html）')
+    parser.add_argument('--output', default=PLAN_FILE, help='重命名计划JSON文件')
+    parser.add_argument('--min-score', type=float, default=0.6, help='模糊匹配的最低相似度（默认0.6）')
+    parser.add_argument('--margin', type=float, default=0.05, help='最佳与次佳候选的最小差距（默认0.05）')
+    parser.add_argument('--apply', metavar='PLAN', help='执行已生成的重命名计划')
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start('resolve-orphan-images', args)
+
+    if args.apply:
+        apply_plan(args.apply)
+        return
+
+    print("正在提取产品数据...")
+    products = load_product_ids(args.html)
+    with metrics.stage('build_index'):
+        index = productid.TrigramIndex()
+        for pid in products:
+            index.add(pid)
+    print(f"共 {len(products)} 个产品ID")
+
+    renames = []
+    unresolved = []
+    for page_type in IMAGE_FOLDERS:
+        with metrics.stage('plan_folder'):
+            folder_renames, folder_unresolved = plan_folder(page_type, products, index,
+                                                            args.min_score, args.margin)
+        renames.extend(folder_renames)
+        unresolved.extend(folder_unresolved)
+        print(f"  [{IMAGE_FOLDERS[page_type][0]}] 可重命名 {len(folder_renames)} 个，"
+              f"无法确定 {len(folder_unresolved)} 个")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'renames': renames, 'unresolved': unresolved}, f, ensure_ascii=False, indent=2)
+    metrics.count('renames_planned', len(renames))
+    metrics.count('bytes_written', os.path.getsize(args.output))
+
+    by_reason = {}
+    for item in renames:
+        by_reason[item['reason']] = by_reason.get(item['reason'], 0) + 1
+    print(f"\n重命名 {len(renames)} 个（规范化 {by_reason.get('normalize', 0)}，"
+          f"模糊匹配 {by_reason.get('fuzzy', 0)}），无法确定 {len(unresolved)} 个")
+    for item in renames[:10]:
+        print(f"  {item['folder']}/{item['from']} -> {item['to']}（{item['score']}）")
+    print(f"\n已生成重命名计划: {args.output}")
+    print(f"检查无误后运行: python3 {os.path.basename(__file__)} --apply '{args.output}'")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件系统监视共享模块
+Linux上使用inotify，其他系统回退为定时轮询；批量复制产生的连续事件会合并（防抖）后一次交出
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+# inotify事件掩码
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class _InotifyBackend:
+    """基于inotify的事件源（通过ctypes调用libc）"""
+
+    def __init__(self, dirs):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 失败')
+        self.dirs = {}
+        for path in dirs:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f'无法监视 {path}')
+            self.dirs[wd] = path
+
+    def read(self, timeout):
+        """等待最多timeout秒，返回发生变化的路径集合；队列溢出时返回所有被监视的目录"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    changed.update(self.dirs.values())
+                elif wd in self.dirs and name:
+                    changed.add(os.path.join(self.dirs[wd], os.fsdecode(name)))
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _PollingBackend:
+    """定时比较目录快照的事件源"""
+
+    def __init__(self, dirs, interval):
+        self.dirs = list(dirs)
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for path in self.dirs:
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        if entry.is_file():
+                            st = entry.stat()
+                            snapshot[entry.path] = (st.st_size, st.st_mtime_ns)
+            except FileNotFoundError:
+                continue
+        return snapshot
+
+    def read(self, timeout):
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        snapshot = self._scan()
+        changed = {p for p, sig in snapshot.items() if self.snapshot.get(p) != sig}
+        changed.update(p for p in self.snapshot if p not in snapshot)
+        self.snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class Watcher:
+    """监视若干目录和文件，按批交出发生变化的路径
+
+    paths中的文件通过监视其所在目录实现，只交出与之同名的事件；
+    目录下的所有文件事件都会交出。
+    """
+
+    def __init__(self, paths, debounce=0.3, poll_interval=1.0, force_polling=False):
+        self.files = set()
+        self.dir_set = set()
+        dirs = []
+        for path in paths:
+            path = os.path.abspath(path)
+            if os.path.isdir(path):
+                self.dir_set.add(path)
+                dirs.append(path)
+            else:
+                self.files.add(path)
+                dirs.append(os.path.dirname(path))
+        dirs = list(dict.fromkeys(dirs))
+        self.debounce = debounce
+        self.backend = None
+        if sys.platform.startswith('linux') and not force_polling:
+            try:
+                self.backend = _InotifyBackend(dirs)
+                self.kind = 'inotify'
+            except (OSError, AttributeError):
+                self.backend = None
+        if self.backend is None:
+            self.backend = _PollingBackend(dirs, poll_interval)
+            self.kind = 'polling'
+
+    def _wanted(self, path):
+        return path in self.files or path in self.dir_set or os.path.dirname(path) in self.dir_set
+
+    def batches(self):
+        """持续产出变化路径集合；一批事件之后安静debounce秒才交出"""
+        while True:
+            changed = {p for p in self.backend.read(None) if self._wanted(p)}
+            if not changed:
+                continue
+            while True:
+                more = self.backend.read(self.debounce)
+                if not more:
+                    break
+                changed.update(p for p in more if self._wanted(p))
+            yield changed
+
+    def close(self):
+        self.backend.close()
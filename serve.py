@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+KOKO Mall 本地静态服务器（npm run serve）
+- 线程池处理请求，HTTP/1.1长连接；连接空闲时交给一个selector线程等待，不占用工作线程，
+  空闲超过15秒的连接被关闭
+- 文件内容通过sendfile零拷贝发送
+- 客户端支持时优先返回预压缩的 .br/.gz 副本
+- 启动时为所有文件建立内容哈希索引，作为强ETag，支持304和Range请求
+- 文件名带内容哈希的资源（如 app.3f2a9c1b0d.js）返回一年的immutable缓存头
+- 产品图片支持按需缩放/转码：product-images-*/<id>.jpg?w=360&fmt=webp
+  w 向上取整到固定档位、不超过源图宽度；fmt 为 jpg/webp/avif，省略或 auto 时按Accept头选择。
+  首次请求在进程池中生成，结果进入内存和 ../.image-variants/ 两级LRU缓存，同一变体的并发请求只生成一次
+
+用法: python3 serve.py [端口] [--dir 目录] [--threads N] [--resize-workers N]
+"""
+
+import argparse
+import email.utils
+import mimetypes
+import os
+import re
+import selectors
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'product-images-home'))
+import imagevariants  # noqa: E402
+import metrics  # noqa: E402
+from imageutil import IMAGE_FOLDERS, ROOT_DIR, HashCache  # noqa: E402
+
+HASH_CACHE_FILE = os.path.join(ROOT_DIR, '.image-hash-cache.json')
+
+# 文件名中带内容哈希：name.<8位以上十六进制>.ext
+HASHED_NAME = re.compile(r'\.[0-9a-f]{8,}\.[A-Za-z0-9]+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+# 预压缩副本：编码 -> 扩展名，按优先级排列
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+SIBLING_EXTENSIONS = tuple(ext for _, ext in ENCODINGS)
+
+mimetypes.add_type('application/manifest+json', '.webmanifest')
+mimetypes.add_type('application/javascript', '.js')
+mimetypes.add_type('image/webp', '.webp')
+mimetypes.add_type('image/svg+xml', '.svg')
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def content_type(path):
+    if os.path.basename(path) == 'manifest.json':
+        return 'application/manifest+json'
+    ctype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if ctype.startswith('text/') or ctype in ('application/javascript', 'application/json',
+                                              'application/manifest+json', 'image/svg+xml'):
+        ctype += '; charset=utf-8'
+    return ctype
+
+
+class FileIndex:
+    """URL路径 -> 文件信息；按stat复用哈希缓存，文件变化后在下次请求时重新计算"""
+
+    def __init__(self, root):
+        self.root = os.path.realpath(root)
+        self.hashes = HashCache(HASH_CACHE_FILE)
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def build(self):
+        count = 0
+        for dirpath, dirnames, filenames in os.walk(self.root, followlinks=True):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.') and d != 'node_modules']
+            for filename in filenames:
+                if filename.startswith('.') or filename.endswith(SIBLING_EXTENSIONS):
+                    continue
+                path = os.path.join(dirpath, filename)
+                self.lookup(path)
+                count += 1
+        self.hashes.save()
+        return count
+
+    def resolve(self, url_path):
+        """把URL路径映射到根目录下的文件；越界或隐藏文件返回None"""
+        parts = [p for p in unquote(url_path).split('/') if p not in ('', '.')]
+        if any(p == '..' or p.startswith('.') for p in parts):
+            return None
+        path = os.path.join(self.root, *parts)
+        if os.path.isdir(path):
+            path = os.path.join(path, 'index.html')
+        return path if os.path.isfile(path) else None
+
+    def lookup(self, path):
+        """返回 (stat, etag, 可用的预压缩副本{编码: (路径, 大小)})"""
+        st = os.stat(path)
+        key = (st.st_size, st.st_mtime_ns)
+        entry = self.entries.get(path)
+        if entry is None or entry[0] != key:
+            with self.lock:
+                digest = self.hashes.sha256(os.path.realpath(path), st)
+            variants = {}
+            for encoding, ext in ENCODINGS:
+                try:
+                    sibling = os.stat(path + ext)
+                except OSError:
+                    continue
+                # 副本比原文件旧则视为过期
+                if sibling.st_mtime_ns >= st.st_mtime_ns:
+                    variants[encoding] = (path + ext, sibling.st_size)
+            entry = (key, f'"{digest[:16]}"', variants)
+            self.entries[path] = entry
+        return st, entry[1], entry[2]
+
+
+def accepted_encodings(header):
+    """解析Accept-Encoding，返回q>0的编码集合"""
+    accepted = set()
+    for item in (header or '').split(','):
+        name, _, params = item.strip().partition(';')
+        q = 1.0
+        match = re.search(r'q=([0-9.]+)', params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        if name and q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def parse_range(header, size):
+    """解析单个字节范围，返回 (起, 止) 闭区间；不支持的格式返回None，无法满足返回False"""
+    match = _RANGE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'KOKOServe/1.0'
+    # 一个请求读写过程中的套接字超时，防止慢客户端一直占用工作线程
+    timeout = 15
+    index = None
+    image_variants = None
+    keep_alive = False
+
+    def handle(self):
+        """只处理连接上已经到达的请求；之后连接若保持打开，由服务器放回空闲等待"""
+        self.handle_one_request()
+        while not self.close_connection and self.has_pending_input():
+            self.handle_one_request()
+        self.keep_alive = not self.close_connection
+
+    def has_pending_input(self):
+        """不阻塞地检查下一个请求（流水线请求或已到达的数据）是否已在缓冲区或套接字中"""
+        self.connection.settimeout(0)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def do_GET(self):
+        self.serve(send_body=True)
+
+    def do_HEAD(self):
+        self.serve(send_body=False)
+
+    def serve(self, send_body):
+        url = urlsplit(self.path)
+        path = self.index.resolve(url.path)
+        if path is None:
+            self.send_error(404)
+            return
+        page_type = imagevariants.page_type_for(url.path)
+        if url.query and page_type and self.image_variants:
+            query = parse_qs(url.query)
+            if 'w' in query or 'fmt' in query:
+                self.serve_variant(path, page_type, query, send_body)
+                return
+        try:
+            st, etag, variants = self.index.lookup(path)
+        except OSError:
+            self.send_error(404)
+            return
+
+        cache_control = IMMUTABLE if HASHED_NAME.search(path) else REVALIDATE
+        range_header = self.headers.get('Range')
+        if range_header and self.headers.get('If-Range') not in (None, etag):
+            range_header = None
+
+        # 预压缩副本只用于完整响应
+        encoding = None
+        body_path, body_size = path, st.st_size
+        if not range_header and variants:
+            accepted = accepted_encodings(self.headers.get('Accept-Encoding'))
+            for name, _ in ENCODINGS:
+                if name in variants and name in accepted:
+                    encoding = name
+                    body_path, body_size = variants[name]
+                    etag = etag[:-1] + f'-{name}"'
+                    break
+
+        if self.etag_matches(self.headers.get('If-None-Match'), etag):
+            self.send_response(304)
+            self.send_common_headers(etag, cache_control, st, variants)
+            self.end_headers()
+            return
+
+        start, end = 0, body_size - 1
+        status = 200
+        if range_header:
+            byte_range = parse_range(range_header, body_size)
+            if byte_range is False:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{body_size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            if byte_range is not None:
+                start, end = byte_range
+                status = 206
+
+        try:
+            f = open(body_path, 'rb')
+        except OSError:
+            self.send_error(404)
+            return
+        with f:
+            self.send_response(status)
+            self.send_common_headers(etag, cache_control, st, variants)
+            self.send_header('Content-Type', content_type(path))
+            if encoding:
+                self.send_header('Content-Encoding', encoding)
+            if status == 206:
+                self.send_header('Content-Range', f'bytes {start}-{end}/{body_size}')
+            self.send_header('Content-Length', str(max(0, end - start + 1)))
+            self.end_headers()
+            if send_body and end >= start:
+                self.wfile.flush()
+                self.connection.sendfile(f, start, end - start + 1)
+
+    def serve_variant(self, path, page_type, query, send_body):
+        """返回图片的缩放/转码变体；参数无效时返回400"""
+        cache = self.image_variants
+        try:
+            requested = int(query.get('w', ['0'])[0] or 0)
+        except ValueError:
+            requested = -1
+        fmt_param = query.get('fmt', [''])[0].lower()
+        fmt = imagevariants.choose_format(fmt_param, self.headers.get('Accept'), cache.formats)
+        if requested < 0 or fmt is None:
+            self.send_error(400)
+            return
+
+        source = imagevariants.source_for(path)
+        try:
+            st, digest, _ = self.index.lookup(source)
+            source_width, source_height = cache.source_size(source, digest)
+        except OSError:
+            self.send_error(404)
+            return
+        _, folder_width, folder_height = IMAGE_FOLDERS[page_type]
+        max_width = min(source_width, source_height * folder_width // folder_height)
+        width = imagevariants.choose_width(requested or folder_width, max_width)
+        height = round(width * folder_height / folder_width)
+        key = imagevariants.variant_key(digest, width, height, fmt)
+        etag = f'"{key[:16]}"'
+        vary = fmt_param in ('', 'auto')
+
+        if self.etag_matches(self.headers.get('If-None-Match'), etag):
+            self.send_response(304)
+            self.send_variant_headers(etag, st, vary)
+            self.end_headers()
+            return
+        try:
+            data = cache.get(key, fmt, source, width, height)
+        except Exception as e:
+            self.log_error('生成变体失败 %s: %s', path, e)
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_variant_headers(etag, st, vary)
+        self.send_header('Content-Type', imagevariants.FORMATS[fmt][1])
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(data)
+
+    def send_variant_headers(self, etag, st, vary):
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', REVALIDATE)
+        self.send_header('Last-Modified', email.utils.formatdate(st.st_mtime, usegmt=True))
+        if vary:
+            self.send_header('Vary', 'Accept')
+
+    def send_common_headers(self, etag, cache_control, st, variants):
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', cache_control)
+        self.send_header('Last-Modified', email.utils.formatdate(st.st_mtime, usegmt=True))
+        self.send_header('Accept-Ranges', 'bytes')
+        if variants:
+            self.send_header('Vary', 'Accept-Encoding')
+
+    @staticmethod
+    def etag_matches(header, etag):
+        if not header:
+            return False
+        if header.strip() == '*':
+            return True
+        return etag in (tag.strip().removeprefix('W/') for tag in header.split(','))
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class PooledHTTPServer(HTTPServer):
+    """用固定大小的线程池处理请求；长连接空闲时由单独的selector线程等待下一个请求，
+    有数据到达再提交给线程池，空闲连接不占用工作线程"""
+
+    daemon_threads = True
+    # 默认监听队列只有5，并发建连时多余的SYN被丢弃，客户端要等1秒以上重传
+    request_queue_size = 256
+    idle_timeout = 15
+
+    def __init__(self, address, handler, threads, quiet=False):
+        # 先创建线程池和selector：绑定端口失败时基类会调用 server_close
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+        self.quiet = quiet
+        self.closing = False
+        self.parked = []
+        self.parked_lock = threading.Lock()
+        self.idle = selectors.DefaultSelector()
+        self.wakeup_r, self.wakeup_w = socket.socketpair()
+        self.wakeup_r.setblocking(False)
+        self.wakeup_w.setblocking(False)
+        self.idle.register(self.wakeup_r, selectors.EVENT_READ)
+        self.idle_thread = threading.Thread(target=self._watch_idle, name='idle-connections', daemon=True)
+        self.idle_thread.start()
+        super().__init__(address, handler)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def finish_request(self, request, client_address):
+        return self.RequestHandlerClass(request, client_address, self)
+
+    def _process(self, request, client_address):
+        try:
+            handler = self.finish_request(request, client_address)
+            if handler.keep_alive and not self.closing:
+                self._park(request, client_address)
+                return
+        except Exception:
+            self.handle_error(request, client_address)
+        self.shutdown_request(request)
+
+    def _park(self, request, client_address):
+        """把空闲的长连接交给selector线程（注册在该线程内完成，避免并发修改selector）"""
+        with self.parked_lock:
+            self.parked.append((request, client_address))
+        try:
+            self.wakeup_w.send(b'\0')
+        except BlockingIOError:
+            pass  # 唤醒字节已经积压，selector线程反正会醒来
+
+    def _watch_idle(self):
+        while not self.closing:
+            try:
+                events = self.idle.select(timeout=1)
+            except OSError:
+                return
+            now = time.monotonic()
+            for key, _ in events:
+                if key.fileobj is self.wakeup_r:
+                    try:
+                        while self.wakeup_r.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    with self.parked_lock:
+                        parked, self.parked = self.parked, []
+                    for request, client_address in parked:
+                        self.idle.register(request, selectors.EVENT_READ, (client_address, now))
+                else:
+                    # 下一个请求到达（或客户端关闭），交回线程池
+                    self.idle.unregister(key.fileobj)
+                    self.pool.submit(self._process, key.fileobj, key.data[0])
+            for key in list(self.idle.get_map().values()):
+                if key.fileobj is not self.wakeup_r and now - key.data[1] > self.idle_timeout:
+                    self.idle.unregister(key.fileobj)
+                    self.shutdown_request(key.fileobj)
+
+    def server_close(self):
+        super().server_close()
+        self.closing = True
+        self.idle_thread.join(timeout=2)
+        for key in list(self.idle.get_map().values()):
+            if key.fileobj is not self.wakeup_r:
+                self.shutdown_request(key.fileobj)
+        for request, _ in self.parked:
+            self.shutdown_request(request)
+        self.idle.close()
+        self.wakeup_r.close()
+        self.wakeup_w.close()
+        self.pool.shutdown(wait=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='KOKO Mall 本地静态服务器')
+    parser.add_argument('port', nargs='?', type=int, default=8000, help='端口（默认8000）')
+    parser.add_argument('--bind', default='', help='监听地址（默认所有地址）')
+    parser.add_argument('--dir', default=ROOT_DIR, help='网站根目录（默认项目根目录，构建后可用 dist）')
+    parser.add_argument('--threads', type=int, default=32, help='同时处理请求的工作线程数（默认32，空闲长连接不占用）')
+    parser.add_argument('--quiet', action='store_true', help='不输出访问日志')
+    parser.add_argument('--resize-workers', type=int, default=os.cpu_count(),
+                        help='生成图片变体的进程数（默认CPU核数，0表示关闭按需缩放）')
+    parser.add_argument('--variant-memory', type=int, default=64, help='图片变体内存缓存上限，MB（默认64）')
+    parser.add_argument('--variant-disk', type=int, default=512, help='图片变体磁盘缓存上限，MB（默认512）')
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start('serve', args)
+
+    index = FileIndex(args.dir)
+    started = time.perf_counter()
+    with metrics.stage('build_index'):
+        count = index.build()
+    metrics.count('files_indexed', count)
+    print(f"已索引 {count} 个文件（{time.perf_counter() - started:.1f} 秒）")
+
+    Handler.index = index
+    server = PooledHTTPServer((args.bind, args.port), Handler, args.threads, args.quiet)
+    if args.resize_workers > 0:
+        if imagevariants.supported_formats():
+            Handler.image_variants = imagevariants.VariantCache(
+                memory_bytes=args.variant_memory << 20, disk_bytes=args.variant_disk << 20,
+                workers=args.resize_workers)
+            print(f"按需缩放: {', '.join(Handler.image_variants.formats)}（{args.resize_workers} 个进程）")
+        else:
+            print("未安装Pillow，图片的 ?w=&fmt= 参数将被忽略（pip install Pillow）")
+
+    print(f"服务目录: {index.root}")
+    print(f"访问地址: http://localhost:{args.port}（{args.threads} 个工作线程，Ctrl+C 停止）")
+    try:
+        with metrics.stage('serve'):
+            server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n已停止")
+    finally:
+        server.server_close()
+        if Handler.image_variants:
+            stats = Handler.image_variants.stats
+            for name in ('renders', 'collapsed', 'memory_hits', 'disk_hits'):
+                metrics.count(f'variant_{name}', stats[name])
+            print(f"图片变体: 生成 {stats['renders']}，合并 {stats['collapsed']}，"
+                  f"内存命中 {stats['memory_hits']}，磁盘命中 {stats['disk_hits']}")
+            Handler.image_variants.close()
+
+
+if __name__ == '__main__':
+    main()
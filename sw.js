@@ -1,6 +1,10 @@
 // Service Worker for KOKO Mall PWA - Android APK Version
 const CACHE_VERSION = 'koko-mall-android-v1';
 const IMAGE_CACHE = 'koko-images-android-v1';
+// 图片内容哈希清单（由 product-images-home/generate-image-manifest.py 生成）
+const IMAGE_MANIFEST_URL = './image-manifest.json';
+const IMAGE_MANIFEST_CHECK_INTERVAL = 5 * 60 * 1000;
+const IMAGE_PRECACHE_CONCURRENCY = 6;
 
 const urlsToCache = [
   './',
@@ -41,6 +45,8 @@ self.addEventListener('activate', function(event) {
           }
         })
       );
+    }).then(function() {
+      return syncImageManifest();
     })
   );
   self.clients.claim();
@@ -51,6 +57,11 @@ self.addEventListener('fetch', function(event) {
   const request = event.request;
   const url = new URL(request.url);
 
+  // 页面导航时检查图片清单是否有更新
+  if (request.mode === 'navigate') {
+    event.waitUntil(maybeSyncImageManifest());
+  }
+
   // 图片专用缓存策略：Cache First
   if (url.pathname.includes('/images/') || 
       url.pathname.includes('/product-images-')) {
@@ -108,4 +119,85 @@ async function cacheImage(request) {
       statusText: 'Not Found'
     });
   }
-}
\ No newline at end of file
+}
+
+// 根据图片清单同步图片缓存：只删除内容已变化或已移除的图片，只下载有变化的预缓存图片
+let lastManifestCheck = 0;
+let manifestSync = null;
+
+function maybeSyncImageManifest() {
+  if (manifestSync || Date.now() - lastManifestCheck < IMAGE_MANIFEST_CHECK_INTERVAL) {
+    return manifestSync || Promise.resolve();
+  }
+  return syncImageManifest();
+}
+
+function syncImageManifest() {
+  if (!manifestSync) {
+    lastManifestCheck = Date.now();
+    manifestSync = doSyncImageManifest()
+      .catch(function(error) {
+        console.log('Image manifest sync failed:', error);
+      })
+      .then(function() {
+        manifestSync = null;
+      });
+  }
+  return manifestSync;
+}
+
+async function doSyncImageManifest() {
+  const manifestUrl = new URL(IMAGE_MANIFEST_URL, self.registration.scope).href;
+  const response = await fetch(manifestUrl, { cache: 'no-store' });
+  if (!response || response.status !== 200) {
+    return;
+  }
+  const next = await response.clone().json();
+
+  const cache = await caches.open(IMAGE_CACHE);
+  const stored = await cache.match(manifestUrl);
+  const prev = stored ? await stored.json() : { version: null, files: {} };
+  if (prev.version === next.version) {
+    return;
+  }
+
+  // 删除内容哈希已变化或已不存在的缓存图片
+  const scopePath = new URL(self.registration.scope).pathname;
+  const keys = await cache.keys();
+  await Promise.all(keys.map(function(key) {
+    const pathname = new URL(key.url).pathname;
+    if (key.url === manifestUrl || !pathname.startsWith(scopePath)) {
+      return null;
+    }
+    const path = decodeURIComponent(pathname.slice(scopePath.length));
+    if (prev.files[path] !== next.files[path]) {
+      return cache.delete(key);
+    }
+    return null;
+  }));
+
+  // 下载新增或有变化的预缓存图片
+  const pending = [];
+  for (const path of next.precache || []) {
+    const imageUrl = new URL(path, self.registration.scope).href;
+    if (prev.files[path] === next.files[path] && await cache.match(imageUrl)) {
+      continue;
+    }
+    pending.push(imageUrl);
+  }
+  for (let i = 0; i < pending.length; i += IMAGE_PRECACHE_CONCURRENCY) {
+    await Promise.all(pending.slice(i, i + IMAGE_PRECACHE_CONCURRENCY).map(async function(imageUrl) {
+      try {
+        const imageResponse = await fetch(imageUrl, { cache: 'reload' });
+        if (imageResponse && imageResponse.status === 200) {
+          await cache.put(imageUrl, imageResponse);
+        }
+      } catch (error) {
+        console.log('Image precache failed:', imageUrl, error);
+      }
+    }));
+  }
+
+  await cache.put(manifestUrl, response);
+  console.log('Image manifest updated:', next.version);
+}